@@ -1,26 +1,44 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import PlainTextResponse
 import psutil
 import time
 from typing import Dict, Any
 
+from src.utils.metrics import registry
+from src.utils.tracing import tracer
+
 router = APIRouter()
 
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+_process = psutil.Process()
+# Замеры CPU без интервала: значение считается от предыдущего scrape
+_process.cpu_percent(interval=None)
+registry.gauge('process_cpu_percent', 'Process CPU usage since the previous scrape',
+               lambda: _process.cpu_percent(interval=None))
+registry.gauge('process_resident_memory_bytes', 'Resident memory size', lambda: _process.memory_info().rss)
+
 class SystemMonitor:
     @staticmethod
     def get_system_stats() -> Dict[str, Any]:
         return {
-            'cpu_percent': psutil.cpu_percent(),
+            'cpu_percent': psutil.cpu_percent(interval=None),
             'memory_usage': psutil.virtual_memory().percent,
             'disk_usage': psutil.disk_usage('/').percent,
             'uptime': time.time() - psutil.boot_time()
         }
     
     @staticmethod
-    def get_bot_stats() -> Dict[str, Any]:
+    def get_bot_stats(bot) -> Dict[str, Any]:
+        if bot is None:
+            return {}
+        stats = bot.monitor.get_stats()
         return {
-            'active_users': 0,
-            'messages_processed': 0,
-            'errors_count': 0
+            'active_users': stats['active_users'],
+            'commands': stats['command_counts'],
+            'errors': stats['error_counts'],
+            'outbox': bot.outbox.stats(),
+            'cache': bot.notion.cache.stats()
         }
 
 @router.get('/health')
@@ -29,12 +47,45 @@ async def health_check():
 
 @router.get('/metrics')
 async def get_metrics():
+    """Prometheus scrape endpoint"""
+    return PlainTextResponse(registry.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+@router.get('/traces')
+async def get_traces(limit: int = 20):
+    """Recent slow request span trees, newest first"""
+    return {
+        'enabled': tracer.enabled,
+        'slow_threshold_ms': tracer.slow_threshold * 1000,
+        'recorded': tracer.recorded,
+        'traces': tracer.recent(limit)
+    }
+
+@router.get('/loop')
+async def get_loop_stats(request: Request, limit: int = 10):
+    """Event loop lag and stacks of recent blocking calls"""
+    bot = getattr(request.app.state, 'bot', None)
+    if bot is None:
+        raise HTTPException(status_code=503, detail="Bot is not running in this process")
+    if bot.watchdog is None:
+        raise HTTPException(status_code=404, detail="Loop watchdog is disabled (LOOP_WATCHDOG)")
+    return bot.watchdog.stats(limit)
+
+@router.get('/workers')
+async def get_workers(request: Request):
+    """Health of worker processes, served by the supervisor"""
+    supervisor = getattr(request.app.state, 'supervisor', None)
+    if supervisor is None:
+        raise HTTPException(status_code=503, detail="Supervisor is not running in this process")
+    return {'workers': supervisor.status()}
+
+@router.get('/stats')
+async def get_stats(request: Request):
     try:
         system_stats = SystemMonitor.get_system_stats()
-        bot_stats = SystemMonitor.get_bot_stats()
+        bot_stats = SystemMonitor.get_bot_stats(getattr(request.app.state, 'bot', None))
         return {
             'system': system_stats,
             'bot': bot_stats
         }
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
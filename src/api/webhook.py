@@ -0,0 +1,119 @@
+"""Telegram webhook ingress"""
+
+import asyncio
+import hmac
+import logging
+from typing import TYPE_CHECKING, Optional, Set
+
+from fastapi import APIRouter, Header, HTTPException, Request
+from telegram import Update
+from telegram.ext import Application
+
+if TYPE_CHECKING:
+    from src.services.supervisor import WorkerSupervisor
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+class WebhookIngress:
+    def __init__(self, application: Application, secret_token: str, queue_size: int = 1000):
+        """Bounded ingest queue feeding the application's update processor
+
+        Concurrency and per-chat ordering come from the update processor;
+        the dispatcher only takes new updates while it has free capacity.
+        """
+        self.application = application
+        self.secret_token = secret_token
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._slots = asyncio.Semaphore(application.update_processor.max_concurrent_updates)
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def start(self):
+        """Start update dispatcher"""
+        self._dispatcher = asyncio.create_task(self._dispatch())
+
+    async def stop(self):
+        """Stop dispatcher and wait for updates in progress"""
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            await asyncio.gather(self._dispatcher, return_exceptions=True)
+            self._dispatcher = None
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def verify(self, token: Optional[str]) -> bool:
+        """Constant-time check of X-Telegram-Bot-Api-Secret-Token"""
+        return verify_secret(token, self.secret_token)
+
+    def submit(self, data: dict) -> bool:
+        """Queue raw update, False when the queue is full"""
+        update = Update.de_json(data, self.application.bot)
+        try:
+            self._queue.put_nowait(update)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    async def put(self, data: dict):
+        """Queue raw update, waiting while the queue is full"""
+        await self._queue.put(Update.de_json(data, self.application.bot))
+
+    @property
+    def queue_depth(self) -> int:
+        """Updates waiting for the processor"""
+        return self._queue.qsize()
+
+    async def _dispatch(self):
+        while True:
+            update = await self._queue.get()
+            await self._slots.acquire()
+            task = asyncio.create_task(self._process(update))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _process(self, update: Update):
+        try:
+            await self.application.update_processor.process_update(
+                update, self.application.process_update(update)
+            )
+        except Exception as e:
+            logger.error(f"Failed to process update {update.update_id}: {e}")
+        finally:
+            self._slots.release()
+
+class ShardedIngress:
+    def __init__(self, supervisor: "WorkerSupervisor", secret_token: str):
+        """Supervisor ingress: routes updates to worker processes by chat"""
+        self.supervisor = supervisor
+        self.secret_token = secret_token
+
+    def verify(self, token: Optional[str]) -> bool:
+        return verify_secret(token, self.secret_token)
+
+    def submit(self, data: dict) -> bool:
+        return self.supervisor.submit(Update.de_json(data, None), data)
+
+def verify_secret(token: Optional[str], secret_token: str) -> bool:
+    """Constant-time check of X-Telegram-Bot-Api-Secret-Token"""
+    return token is not None and hmac.compare_digest(token, secret_token)
+
+@router.post('/webhook')
+async def telegram_webhook(
+    request: Request,
+    x_telegram_bot_api_secret_token: Optional[str] = Header(None)
+):
+    # В режиме нескольких процессов обновления принимает супервизор
+    ingress = getattr(request.app.state, 'ingress', None)
+    if ingress is None:
+        ingress = getattr(getattr(request.app.state, 'bot', None), 'ingress', None)
+    if ingress is None:
+        raise HTTPException(status_code=503, detail="Bot is not ready")
+    if not ingress.verify(x_telegram_bot_api_secret_token):
+        raise HTTPException(status_code=403, detail="Invalid secret token")
+
+    data = await request.json()
+    # Telegram повторит доставку, если ответить ошибкой
+    if not ingress.submit(data):
+        raise HTTPException(status_code=503, detail="Update queue is full")
+    return {'ok': True}
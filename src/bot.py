@@ -2,27 +2,57 @@
 
 import logging
 import asyncio
-from typing import Dict, Optional
-import time
+from typing import List, Optional, Tuple
 
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import Application, CommandHandler, CallbackQueryHandler, ContextTypes
-from cachetools import TTLCache
+from telegram import Message, Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.ext import Application, CommandHandler, CallbackQueryHandler, ContextTypes, MessageHandler, filters
 
-from src.config import BotConfig, UserManager
+from src.api.webhook import WebhookIngress
+from src.config import AssigneeMap, BotConfig, UserManager
+from src.handlers.task_view import TaskListView
+from src.handlers.update_processor import ChatOrderedUpdateProcessor
 from src.notion_service import NotionService
+from src.constants import MESSAGES
+from src.utils.rate_limiter import RateLimiter
+from src.models.task import Task
+from src.services.task_store import TaskStore
+from src.services.write_queue import WriteQueue
+from src.services.housekeeping import Housekeeper
+from src.services.member_directory import ASSIGN_PREFIX, MemberDirectory
+from src.services.admission import AdmissionController, Overloaded
+from src.services.outbox import NOTIFICATION, Outbox
+from src.services.state_backend import StateBackend
+from src.services.state_persistence import StatePersistence
+from src.services.supervisor import pump_updates
+from src.utils.loop_watchdog import LoopWatchdog
+from src.utils.metrics import registry
+from src.utils.monitoring import BotMonitor
+from src.utils.resource_monitor import ResourceMonitor
+from src.utils.tracing import traced, tracer
 
 logger = logging.getLogger(__name__)
 
 class NotionBot:
-    def __init__(self, config: BotConfig):
+    def __init__(
+        self,
+        config: BotConfig,
+        task_store: Optional[TaskStore] = None,
+        write_queue: Optional[WriteQueue] = None,
+        state_backend: Optional[StateBackend] = None,
+        schema_path: Optional[str] = None
+    ):
+        # Процессно-локальный backend ничего не даёт поверх in-memory структур
+        self.state_backend = state_backend if state_backend is not None and state_backend.shared else None
         try:
             if not config.notion_token or not config.database_id:
                 raise ValueError("Notion token and database ID must be provided")
                 
             self.notion = NotionService(
                 token=config.notion_token,
-                database_id=config.database_id
+                database_id=config.database_id,
+                state_backend=self.state_backend,
+                schema_path=schema_path,
+                workers=config.workers
             )
             logger.info("NotionService initialized successfully")
         except Exception as e:
@@ -31,45 +61,135 @@ class NotionBot:
             
         self.config = config
         self.user_manager = UserManager()
-        
-        # Initialize caches
-        self.user_caches: Dict[int, TTLCache] = {}
-        self._last_cache_cleanup = time.time()
+        self.assignees = AssigneeMap()
+        self.task_store = task_store
+        self.write_queue = write_queue
+        self.ingress: Optional[WebhookIngress] = None
+        self.task_view = TaskListView()
+        self.members = MemberDirectory(self.notion)
+        self.monitor = BotMonitor()
+        # Нагрузка хоста, задержка event loop и очередь к Notion определяют,
+        # какую работу можно отложить или упростить
+        self.watchdog: Optional[LoopWatchdog] = None
+        if config.loop_watchdog:
+            self.watchdog = LoopWatchdog(
+                threshold=config.loop_block_ms / 1000,
+                interval=config.loop_heartbeat_ms / 1000
+            )
+        self.admission = AdmissionController(ResourceMonitor(
+            check_interval=2,
+            queue_depth=lambda: self.notion.scheduler.pending,
+            loop_lag=self.watchdog.take_peak_lag if self.watchdog is not None else None
+        ))
+        self._admission_task: Optional[asyncio.Task] = None
+        self.update_processor = ChatOrderedUpdateProcessor(config.max_concurrent_updates, admission=self.admission)
+        # Все исходящие вызовы Bot API проходят через очередь с лимитами Telegram
+        self.outbox = Outbox(workers=config.workers, backend=self.state_backend)
+        # Очередь обновлений от супервизора, если бот работает воркером
+        self.update_source = None
+        self._pump: Optional[asyncio.Task] = None
         
         # Rate limiting
-        self.user_timestamps = {}
-        self._last_rate_limit_cleanup = time.time()
         self.rate_limit = 3
-        self.cleanup_interval = 3600
+        # Только входящий лимит на пользователя: темп исходящих сообщений
+        # (лимиты Telegram на чат и на бота) соблюдает Outbox
+        # Пользователь пишет и в личный чат, и в группы, которые могут достаться
+        # разным воркерам, поэтому бакет хранится в общем backend, если он есть
+        self.rate_limiter = RateLimiter(
+            max_requests=self.rate_limit,
+            time_window=1,
+            backend=self.state_backend,
+            namespace='rate_limit:user'
+        )
+        
+        # Фоновая очистка небольшими порциями вместо полного обхода на горячем пути
+        self.housekeeper = Housekeeper()
+        self._housekeeping: Optional[asyncio.Task] = None
+        self.housekeeper.register('rate_limiter', self._evict_idle_rate_limits, interval=60)
+        self.housekeeper.register('outbox', self._evict_idle_outbox_limits, interval=60)
+        self.housekeeper.register('query_cache', self.notion.cache.evict_expired, interval=60)
+        if self.state_backend is not None:
+            self.housekeeper.register(
+                'state_backend',
+                lambda limit: asyncio.to_thread(self.state_backend.purge_expired, limit),
+                interval=60
+            )
+        self._register_metrics()
         
+    def _register_metrics(self):
+        """Gauges read at scrape time from the live objects"""
+        cache = self.notion.cache
+        registry.gauge('notion_scheduler_pending', 'Notion calls waiting for a rate limit slot',
+                       lambda: self.notion.scheduler.pending)
+        registry.gauge('notion_concurrency_limit', 'Adaptive limit of concurrent Notion calls',
+                       lambda: self.notion.concurrency.limit)
+        registry.gauge('query_cache_hit_rate', 'Share of Notion queries served from cache',
+                       lambda: cache.stats()['hit_rate'])
+        registry.gauge('query_cache_entries', 'Entries in the Notion query cache', lambda: cache.stats()['entries'])
+        registry.gauge('query_cache_bytes', 'Encoded size of cached Notion responses', lambda: cache.stats()['bytes'])
+        registry.gauge('outbox_pending', 'Bot API calls waiting for a global slot', lambda: self.outbox.pending)
+        registry.gauge('ingress_queue_depth', 'Updates accepted but not yet dispatched',
+                       lambda: self.ingress.queue_depth if self.ingress is not None else 0)
+        registry.gauge('bot_active_chats', 'Chats with updates in processing',
+                       lambda: self.update_processor.active_chats)
+
     async def run(self):
         """Run the bot with error handling"""
         try:
-            self.application = Application.builder().token(self.config.telegram_token).build()
+            if self.watchdog is not None:
+                self.watchdog.start()
+            # Проверка подключения к Notion без блокировки event loop
+            await self.notion.initialize()
+            
+            builder = (
+                Application.builder()
+                .token(self.config.telegram_token)
+                .concurrent_updates(self.update_processor)
+                .rate_limiter(self.outbox)
+            )
+            if self.config.mode == 'webhook' or self.update_source is not None:
+                # Обновления приходят через FastAPI или от супервизора, updater не нужен
+                builder = builder.updater(None)
+            if self.state_backend is not None:
+                builder = builder.persistence(StatePersistence(self.state_backend))
+            self.application = builder.build()
             
             # Добавляем обработчики
             await self.setup_handlers()
             
-            logger.info("Starting bot polling...")
             await self.application.initialize()
             await self.application.start()
-            await self.application.updater.start_polling()
+            if self.update_source is not None:
+                await self._start_worker_ingress()
+            elif self.config.mode == 'webhook':
+                await self._start_webhook()
+            else:
+                logger.info("Starting bot polling...")
+                await self.application.updater.start_polling()
             
-            # Main loop with error handling
-            while True:
-                try:
-                    await asyncio.sleep(1)
-                    self._cleanup_old_entries()
-                except Exception as e:
-                    logger.error(f"Error in main loop: {e}")
-                    await asyncio.sleep(5)
+            # Ждём отмены; фоновые задачи спят до ближайшего дедлайна
+            self._housekeeping = asyncio.create_task(self.housekeeper.run())
+            self._admission_task = asyncio.create_task(self.admission.run())
+            await asyncio.Event().wait()
                     
         except asyncio.CancelledError:
             logger.info("Shutting down bot...")
             try:
-                await self.application.updater.stop()
+                if self._housekeeping is not None:
+                    self._housekeeping.cancel()
+                if self._admission_task is not None:
+                    self._admission_task.cancel()
+                if self._pump is not None:
+                    self._pump.cancel()
+                if self.ingress is not None:
+                    await self.ingress.stop()
+                if self.application.updater is not None:
+                    await self.application.updater.stop()
                 await self.application.stop()
                 await self.application.shutdown()
+                await self.notion.close()
+                if self.watchdog is not None:
+                    await self.watchdog.stop()
             except Exception as e:
                 logger.error(f"Error during shutdown: {e}")
             finally:
@@ -78,57 +198,72 @@ class NotionBot:
             logger.error(f"Fatal error: {e}")
             raise
 
-    def _cleanup_old_entries(self):
-        """Cleanup old cache and rate limit entries"""
-        now = time.time()
-        if now - self._last_cache_cleanup > self.cleanup_interval:
-            # Cleanup user caches
-            for user_id in list(self.user_caches.keys()):
-                if not self.user_caches[user_id]:
-                    del self.user_caches[user_id]
-            self._last_cache_cleanup = now
-            
-        if now - self._last_rate_limit_cleanup > self.cleanup_interval:
-            # Cleanup rate limit timestamps
-            cutoff = now - 3600  # 1 hour
-            self.user_timestamps = {
-                user_id: timestamp 
-                for user_id, timestamp in self.user_timestamps.items()
-                if timestamp > cutoff
-            }
-            self._last_rate_limit_cleanup = now
+    async def _start_webhook(self):
+        """Start update dispatcher and register webhook with Telegram"""
+        self.ingress = WebhookIngress(
+            self.application,
+            secret_token=self.config.webhook_secret,
+            queue_size=self.config.webhook_queue_size
+        )
+        await self.ingress.start()
+        await self.application.bot.set_webhook(
+            url=self.config.webhook_url,
+            secret_token=self.config.webhook_secret,
+            allowed_updates=Update.ALL_TYPES
+        )
+        logger.info(f"Webhook registered at {self.config.webhook_url}")
 
-    def get_user_cache(self, user_id: int) -> TTLCache:
-        """Get user cache with automatic cleanup"""
-        self._cleanup_old_entries()
-        if user_id not in self.user_caches:
-            self.user_caches[user_id] = TTLCache(maxsize=100, ttl=300)
-        return self.user_caches[user_id]
-        
+    async def _start_worker_ingress(self):
+        """Consume updates sharded to this worker by the supervisor"""
+        self.ingress = WebhookIngress(
+            self.application,
+            secret_token=self.config.webhook_secret or '',
+            queue_size=self.config.webhook_queue_size
+        )
+        await self.ingress.start()
+        self._pump = asyncio.create_task(pump_updates(self.update_source, self.ingress.put))
+        logger.info("Consuming updates from supervisor")
+
+    def _evict_idle_rate_limits(self, limit: int) -> int:
+        """Forget rate limit state of idle users"""
+        return self.rate_limiter.evict_idle(limit=limit)
+
+    async def send_notification(self, chat_id: int, text: str):
+        """Send a message behind interactive replies in the outbound queue"""
+        await self.application.bot.send_message(
+            chat_id, text, rate_limit_args={'priority': NOTIFICATION}
+        )
+
+    def _evict_idle_outbox_limits(self, limit: int) -> int:
+        """Forget pacing state of chats that have not been messaged recently"""
+        return (
+            self.outbox.chat_limiter.evict_idle(limit=limit)
+            + self.outbox.group_limiter.evict_idle(limit=limit)
+        )
+
+    @traced('access_check')
     async def check_access(self, update: Update) -> bool:
         """Check if user has access"""
         if not update.effective_user:
             return False
             
         user_id = update.effective_user.id
+        if update.message and update.message.text:
+            self.monitor.log_user_activity(user_id, update.message.text.split()[0].split('@')[0])
         if not self.user_manager.is_allowed(user_id):
             await update.message.reply_text(
                 "У вас нет доступа к этому боту. "
                 "Обратитесь к администратору."
             )
             return False
+        if not await self._rate_limit_check(update):
+            await update.message.reply_text(MESSAGES["rate_limit"])
+            return False
         return True
 
-    async def _rate_limit_check(self, user_id: int) -> bool:
-        """Per-user rate limiting with cleanup"""
-        self._cleanup_old_entries()
-        now = time.time()
-        if user_id in self.user_timestamps:
-            last_request = self.user_timestamps[user_id]
-            if now - last_request < 1/self.rate_limit:
-                return False
-        self.user_timestamps[user_id] = now
-        return True
+    async def _rate_limit_check(self, update: Update) -> bool:
+        """Per-user rate limiting of incoming commands and button presses"""
+        return await self.rate_limiter.allow(update.effective_user.id)
 
     async def start(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Start command handler"""
@@ -159,7 +294,10 @@ class NotionBot:
             
         command = update.message.text.split()
         if len(command) < 2:
-            await update.message.reply_text("Использование: /admin [add_user|remove_user] [user_id]")
+            await update.message.reply_text(
+                "Использование: /admin [add_user|remove_user] [user_id]\n"
+                "/admin link_assignee [user_id] [notion_user_id]"
+            )
             return
             
         action, *args = command[1:]
@@ -181,6 +319,15 @@ class NotionBot:
                 logger.info(f"Admin removed user {user_id}")
             except ValueError:
                 await update.message.reply_text("Неверный формат ID")
+                
+        elif action == "link_assignee" and len(args) >= 2:
+            try:
+                user_id = int(args[0])
+                self.assignees.link(args[1], user_id)
+                await update.message.reply_text(f"Уведомления по задачам {args[1]} будут приходить {user_id}")
+                logger.info(f"Admin linked Notion user {args[1]} to {user_id}")
+            except ValueError:
+                await update.message.reply_text("Неверный формат ID")
 
     async def setup_handlers(self):
         """Setup command handlers"""
@@ -188,6 +335,8 @@ class NotionBot:
         self.application.add_handler(CommandHandler("tasks", self.show_tasks_command))
         self.application.add_handler(CommandHandler("new_task", self.new_task_command))
         self.application.add_handler(CommandHandler("admin", self.admin_command))
+        # Текст во время выбора ответственного — поиск по началу имени
+        self.application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, self.search_assignee))
         
         # Добавляем обработчик кнопок
         self.application.add_handler(CallbackQueryHandler(self.button_handler))
@@ -198,34 +347,106 @@ class NotionBot:
     async def button_handler(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle button presses"""
         query = update.callback_query
+        user_id = query.from_user.id
+        self.monitor.log_user_activity(user_id, 'button')
+        with tracer.span('access_check'):
+            limited = self.user_manager.is_allowed(user_id) and not await self._rate_limit_check(update)
+        if limited:
+            await query.answer(MESSAGES["rate_limit"], show_alert=True)
+            return
         await query.answer()
         
-        user_id = query.from_user.id
         if not self.user_manager.is_allowed(user_id):
             await query.edit_message_text("У вас нет доступа к этому боту. Обратитесь к администратору.")
             return
         
+        page = self.task_view.parse_callback(query.data)
         if query.data == 'show_tasks':
             await self.show_tasks(update, context)
+        elif page is not None:
+            await self.show_tasks(update, context, page)
         elif query.data == 'new_task':
             await self.new_task(update, context)
+        elif query.data.startswith(ASSIGN_PREFIX) or query.data == 'skip_assignee':
+            await self.choose_assignee(update, context)
+        elif self.members.parse_page(query.data) is not None:
+            keyboard = await self.members.keyboard(self.members.parse_page(query.data))
+            await query.edit_message_reply_markup(reply_markup=keyboard)
+
+    async def _load_page(self, user_id: int, page: int, chat_data: dict) -> Tuple[List[Task], int, bool]:
+        """Read one page of tasks, returns (tasks, page, has_next)"""
+        per_page = self.task_view.per_page
+        if self.task_store is not None:
+            # Лишняя строка показывает, есть ли следующая страница; SQLite читается вне event loop
+            with tracer.span('task_store.list_tasks'):
+                tasks = await asyncio.to_thread(self._read_mirror, per_page + 1, page * per_page)
+            if tasks is not None:
+                return tasks[:per_page], page, len(tasks) > per_page
+
+        # Зеркало ещё не заполнено: листаем Notion по курсорам, сохранённым
+        # на сервере (в callback_data они не помещаются)
+        cursors = chat_data.setdefault('task_cursors', [None])
+        if page >= len(cursors):
+            page = 0
+        result = await self.notion.get_task_page(
+            user_id, per_page, cursors[page], cached_only=not self.admission.allow_live_reads()
+        )
+        if result is None:
+            self.admission.shed('live_read')
+            raise Overloaded()
+        del cursors[page + 1:]
+        if result.has_more and result.next_cursor:
+            cursors.append(result.next_cursor)
+        return list(result.tasks), page, len(cursors) > page + 1
+
+    def _read_mirror(self, limit: int, offset: int) -> Optional[List[Task]]:
+        """Tasks from the local mirror, None while it is not populated yet"""
+        if not self.task_store.populated:
+            return None
+        return self.task_store.list_tasks(limit=limit, offset=offset)
 
-    async def show_tasks(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Show user's tasks"""
+    async def show_tasks(self, update: Update, context: ContextTypes.DEFAULT_TYPE, page: int = 0):
+        """Show a page of user's tasks in place of the current message"""
+        query = update.callback_query
         try:
-            tasks = await self.notion.get_tasks()
-            if tasks:
-                await update.callback_query.edit_message_text("\n".join(tasks))
-            else:
-                await update.callback_query.edit_message_text("У вас пока нет задач")
+            tasks, page, has_next = await self._load_page(update.effective_user.id, page, context.chat_data)
+            if not tasks and page > 0:
+                # Задачи удалены, пока пользователь листал: возвращаемся в начало
+                tasks, page, has_next = await self._load_page(update.effective_user.id, 0, context.chat_data)
+            if not tasks:
+                await query.edit_message_text("У вас пока нет задач")
+                return
+            with tracer.span('render', tasks=len(tasks)):
+                chunks, markup, digest = self.task_view.render(tasks, page, has_next)
+            message_key = (query.message.chat_id, query.message.message_id) if query.message else None
+            # Содержимое не изменилось — лишний вызов Telegram не нужен
+            if message_key is not None and self.task_view.is_shown(message_key, digest):
+                return
+            await query.edit_message_text(chunks[0], reply_markup=markup if len(chunks) == 1 else None)
+            if len(chunks) > 1 and query.message:
+                # Кнопки переезжают в последнее сообщение страницы
+                message = await self._send_chunks(query.message.chat_id, chunks[1:], markup)
+                message_key = (message.chat_id, message.message_id)
+            if message_key is not None:
+                self.task_view.mark_shown(message_key, digest)
+        except Overloaded:
+            await update.callback_query.edit_message_text(MESSAGES["overloaded"])
         except Exception as e:
             logger.error(f"Failed to show tasks: {e}")
             await update.callback_query.edit_message_text("Ошибка при получении задач")
 
+    async def _send_chunks(self, chat_id: int, chunks: List[str], markup: InlineKeyboardMarkup) -> Message:
+        """Send a page split into several messages, the keyboard goes with the last one"""
+        for index, chunk in enumerate(chunks):
+            message = await self.application.bot.send_message(
+                chat_id, chunk, reply_markup=markup if index == len(chunks) - 1 else None
+            )
+        return message
+
     async def new_task(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Create new task"""
         try:
-            await update.callback_query.edit_message_text("Функция создания задачи пока не реализована")
+            await update.callback_query.edit_message_text("Отправьте команду: /new_task <название задачи>")
         except Exception as e:
             logger.error(f"Failed to create task: {e}")
             await update.callback_query.edit_message_text("Ошибка при создании задачи")
@@ -233,6 +454,8 @@ class NotionBot:
     async def error_handler(self, update: object, context: ContextTypes.DEFAULT_TYPE) -> None:
         """Log errors and send user-friendly message"""
         logger.error(f"Update {update} caused error {context.error}")
+        user = getattr(update, 'effective_user', None)
+        self.monitor.log_error(type(context.error).__name__, context.error, user.id if user else None)
         
         if update and hasattr(update, 'callback_query'):
             await update.callback_query.edit_message_text("Произошла ошибка. Попробуйте позже.")
@@ -245,11 +468,16 @@ class NotionBot:
             return
         
         try:
-            tasks = await self.notion.get_tasks()
-            if tasks:
-                await update.message.reply_text("\n".join(tasks))
-            else:
+            tasks, page, has_next = await self._load_page(update.effective_user.id, 0, context.chat_data)
+            if not tasks:
                 await update.message.reply_text("У вас пока нет задач")
+                return
+            with tracer.span('render', tasks=len(tasks)):
+                chunks, markup, digest = self.task_view.render(tasks, page, has_next)
+            message = await self._send_chunks(update.message.chat_id, chunks, markup)
+            self.task_view.mark_shown((message.chat_id, message.message_id), digest)
+        except Overloaded:
+            await update.message.reply_text(MESSAGES["overloaded"])
         except Exception as e:
             logger.error(f"Failed to show tasks: {e}")
             await update.message.reply_text("Ошибка при получении задач")
@@ -259,9 +487,59 @@ class NotionBot:
         if not await self.check_access(update):
             return
         
+        title = " ".join(context.args or []).strip()
+        if not title:
+            await update.message.reply_text("Использование: /new_task <название задачи>")
+            return
+        
+        try:
+            keyboard = await self.members.keyboard()
+        except Exception as e:
+            # Без списка участников задача создаётся без ответственного
+            logger.warning(f"Assignee picker unavailable: {e}")
+            await update.message.reply_text(await self._submit_task(update.effective_user.id, title))
+            return
+        context.user_data['new_task_title'] = title
+        await update.message.reply_text(
+            "👤 Выберите ответственного или отправьте начало имени для поиска:",
+            reply_markup=keyboard
+        )
+
+    async def search_assignee(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Handle assignee name prefix typed instead of a button press"""
+        if 'new_task_title' not in context.user_data or not await self.check_access(update):
+            return
+        
+        members = await self.members.search(update.message.text)
+        if not members:
+            await update.message.reply_text("Никого не найдено, попробуйте ещё раз")
+            return
+        await update.message.reply_text(
+            "👤 Выберите ответственного:",
+            reply_markup=self.members.keyboard_for(members)
+        )
+
+    async def choose_assignee(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Create the pending task with the picked assignee"""
+        query = update.callback_query
+        title = context.user_data.pop('new_task_title', None)
+        if title is None:
+            # Кнопка из старого сообщения: задача уже создана
+            await query.edit_message_reply_markup(reply_markup=None)
+            return
+        
+        assignee_id = query.data[len(ASSIGN_PREFIX):] if query.data.startswith(ASSIGN_PREFIX) else None
+        await query.edit_message_text(await self._submit_task(update.effective_user.id, title, assignee_id))
+
+    async def _submit_task(self, user_id: int, title: str, assignee_id: Optional[str] = None) -> str:
+        """Create task in Notion or through the write queue, returns the reply text"""
         try:
-            # Здесь будет логика создания задачи
-            await update.message.reply_text("Функция создания задачи пока не реализована")
+            if self.write_queue is not None:
+                # Подтверждаем сразу, в Notion задача уйдёт из очереди
+                local_id = self.write_queue.enqueue_task(user_id, title, assignee_id=assignee_id)
+                return f"✅ Задача принята (#{local_id}), сохраняю в Notion..."
+            await self.notion.create_task(user_id, title, assignee_id=assignee_id)
+            return MESSAGES["task_created"]
         except Exception as e:
             logger.error(f"Failed to create task: {e}")
-            await update.message.reply_text("Ошибка при создании задачи")
\ No newline at end of file
+            return "Ошибка при создании задачи"
\ No newline at end of file
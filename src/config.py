@@ -1,7 +1,8 @@
 """Configuration module with user management"""
 
+import json
 import os
-from typing import Set
+from typing import Dict, Optional, Set
 from dataclasses import dataclass
 
 @dataclass
@@ -10,10 +11,31 @@ class BotConfig:
     notion_token: str
     database_id: str
     admin_id: int
+    mode: str = 'polling'
+    webhook_url: Optional[str] = None
+    webhook_secret: Optional[str] = None
+    webhook_host: str = '0.0.0.0'
+    webhook_port: int = 8000
+    webhook_queue_size: int = 1000
+    monitoring_enabled: bool = False
+    monitoring_host: str = '127.0.0.1'
+    monitoring_port: int = 8001
+    max_concurrent_updates: int = 8
+    state_backend: str = 'memory'
+    state_db_path: Optional[str] = None
+    workers: int = 1
+    trace_enabled: bool = False
+    trace_slow_ms: int = 1000
+    loop_watchdog: bool = False
+    loop_heartbeat_ms: int = 1000
+    loop_block_ms: int = 100
 
     @classmethod
     def from_env(cls):
-        """Create config from environment variables"""
+        """Create config from environment variables (the only place they are validated)"""
+        if not os.getenv('TELEGRAM_TOKEN'):
+            raise ValueError("TELEGRAM_TOKEN must be set")
+            
         admin_id = int(os.getenv('ADMIN_ID', 0))
         if admin_id == 0:
             raise ValueError("ADMIN_ID must be set and valid")
@@ -22,48 +44,140 @@ class BotConfig:
         if not notion_token or not notion_token.startswith(('secret_', 'ntn_')):
             raise ValueError("Invalid Notion token format")
             
-        database_id = os.getenv('DATABASE_ID')
-        if not database_id or len(database_id) != 32:
+        # Notion принимает id и с дефисами (формат UUID)
+        database_id = (os.getenv('DATABASE_ID') or '').replace('-', '')
+        if len(database_id) != 32:
             raise ValueError("Invalid database ID format")
             
+        mode = os.getenv('BOT_MODE', 'polling')
+        if mode not in ('polling', 'webhook'):
+            raise ValueError("BOT_MODE must be 'polling' or 'webhook'")
+        if mode == 'webhook' and not (os.getenv('WEBHOOK_URL') and os.getenv('WEBHOOK_SECRET')):
+            raise ValueError("WEBHOOK_URL and WEBHOOK_SECRET must be set in webhook mode")
+            
+        state_backend = os.getenv('STATE_BACKEND', 'memory')
+        if state_backend not in ('memory', 'sqlite'):
+            raise ValueError("STATE_BACKEND must be 'memory' or 'sqlite'")
+            
+        workers = int(os.getenv('WORKERS', 1))
+        if workers < 1:
+            raise ValueError("WORKERS must be at least 1")
+        if workers > 1 and state_backend == 'memory':
+            raise ValueError("STATE_BACKEND=sqlite is required when WORKERS > 1")
+            
         return cls(
             telegram_token=os.getenv('TELEGRAM_TOKEN'),
             notion_token=notion_token,
             database_id=database_id,
-            admin_id=admin_id
+            admin_id=admin_id,
+            mode=mode,
+            webhook_url=os.getenv('WEBHOOK_URL'),
+            webhook_secret=os.getenv('WEBHOOK_SECRET'),
+            webhook_host=os.getenv('WEBHOOK_HOST', '0.0.0.0'),
+            webhook_port=int(os.getenv('WEBHOOK_PORT', 8000)),
+            webhook_queue_size=int(os.getenv('WEBHOOK_QUEUE_SIZE', 1000)),
+            monitoring_enabled=os.getenv('MONITORING_ENABLED', 'false').lower() in ('1', 'true', 'yes'),
+            monitoring_host=os.getenv('MONITORING_HOST', '127.0.0.1'),
+            monitoring_port=int(os.getenv('MONITORING_PORT', 8001)),
+            max_concurrent_updates=int(os.getenv('MAX_CONCURRENT_UPDATES', 8)),
+            state_backend=state_backend,
+            state_db_path=os.getenv('STATE_DB_PATH'),
+            workers=workers,
+            trace_enabled=os.getenv('TRACE_ENABLED', 'false').lower() in ('1', 'true', 'yes'),
+            trace_slow_ms=int(os.getenv('TRACE_SLOW_MS', 1000)),
+            loop_watchdog=os.getenv('LOOP_WATCHDOG', 'false').lower() in ('1', 'true', 'yes'),
+            loop_heartbeat_ms=int(os.getenv('LOOP_HEARTBEAT_MS', 1000)),
+            loop_block_ms=int(os.getenv('LOOP_BLOCK_MS', 100))
         )
 
+def _mtime(path: str) -> Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+def _write_atomic(path: str, text: str):
+    """Replace file contents so other workers never read a half-written file"""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
 class UserManager:
     def __init__(self, allowed_users_file: str = 'allowed_users.txt'):
         self.allowed_users_file = allowed_users_file
         self._allowed_users: Set[int] = set()
+        self._mtime: Optional[int] = None
         self.load_users()
     
     def load_users(self):
         """Load allowed users from file"""
         try:
+            self._mtime = _mtime(self.allowed_users_file)
             with open(self.allowed_users_file, 'r') as f:
-                self._allowed_users = set(int(line.strip()) for line in f)
+                self._allowed_users = set(int(line.strip()) for line in f if line.strip())
         except FileNotFoundError:
             with open(self.allowed_users_file, 'w') as f:
                 f.write('')
+            self._mtime = _mtime(self.allowed_users_file)
+
+    def _reload_if_changed(self):
+        # Файл общий для всех воркеров: список меняет тот, кто обработал команду админа
+        if _mtime(self.allowed_users_file) != self._mtime:
+            self.load_users()
     
     def is_allowed(self, user_id: int) -> bool:
         """Check if user is allowed"""
+        self._reload_if_changed()
         return user_id in self._allowed_users
 
     def add_user(self, user_id: int):
         """Add user to allowed list"""
+        self._reload_if_changed()
         self._allowed_users.add(user_id)
         self._save_users()
     
     def remove_user(self, user_id: int):
         """Remove user from allowed list"""
+        self._reload_if_changed()
         self._allowed_users.discard(user_id)
         self._save_users()
     
     def _save_users(self):
         """Save allowed users to file"""
-        with open(self.allowed_users_file, 'w') as f:
-            for user_id in self._allowed_users:
-                f.write(f"{user_id}\n")
\ No newline at end of file
+        _write_atomic(self.allowed_users_file, ''.join(f"{user_id}\n" for user_id in self._allowed_users))
+        self._mtime = _mtime(self.allowed_users_file)
+
+class AssigneeMap:
+    def __init__(self, assignees_file: str = 'assignees.json'):
+        """Notion user id -> Telegram chat id of task assignees"""
+        self.assignees_file = assignees_file
+        self._chats: Dict[str, int] = {}
+        self._mtime: Optional[int] = None
+        self.load()
+
+    def load(self):
+        """Load mapping from file"""
+        self._mtime = _mtime(self.assignees_file)
+        try:
+            with open(self.assignees_file, 'r') as f:
+                self._chats = {notion_id: int(chat_id) for notion_id, chat_id in json.load(f).items()}
+        except FileNotFoundError:
+            self._chats = {}
+
+    def _reload_if_changed(self):
+        # Привязки делает любой воркер, уведомления рассылает воркер 0
+        if _mtime(self.assignees_file) != self._mtime:
+            self.load()
+
+    def get(self, notion_user_id: str) -> Optional[int]:
+        """Telegram chat of a Notion user, None if not linked"""
+        self._reload_if_changed()
+        return self._chats.get(notion_user_id)
+
+    def link(self, notion_user_id: str, chat_id: int):
+        """Send notifications for this Notion user to chat_id"""
+        self._reload_if_changed()
+        self._chats[notion_user_id] = chat_id
+        _write_atomic(self.assignees_file, json.dumps(self._chats, indent=2))
+        self._mtime = _mtime(self.assignees_file)
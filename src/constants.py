@@ -18,11 +18,21 @@ TASK_PRIORITIES = {
     "HIGH_RU": "Высокий"
 }
 
+# Названия свойств в базе задач Notion
+TASK_PROPERTIES = {
+    "TITLE": "Title",
+    "STATUS": "Status",
+    "ASSIGNEE": "Assignee",
+    "DUE": "Due",
+    "PRIORITY": "Priority"
+}
+
 MESSAGES = {
     "welcome": "Добро пожаловать в систему управления задачами!",
     "task_created": "✅ Задача успешно создана",
     "task_updated": "✅ Задача обновлена",
     "error": "❌ Произошла ошибка: {error}",
     "rate_limit": "⚠️ Превышен лимит запросов к API.\nПожалуйста, подождите немного.",
-    "no_tasks": "📝 Список задач пуст"
+    "no_tasks": "📝 Список задач пуст",
+    "overloaded": "⏳ Сервер сейчас перегружен. Попробуйте через минуту."
 }
\ No newline at end of file
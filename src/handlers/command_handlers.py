@@ -4,15 +4,19 @@ from telegram_calendar_keyboard import CallbackData, create_calendar
 from datetime import datetime
 import os
 
+from typing import Optional
+
 from ..notion_service import NotionService
 from ..constants import MESSAGES, TASK_STATUSES
+from ..services.member_directory import ASSIGN_PREFIX, MemberDirectory
 
 # States for conversation handler
 TITLE, ASSIGNEE, DUE_DATE, STATUS, PRIORITY, CONFIRM = range(6)
 
 class CommandHandlers:
-    def __init__(self, notion_service: NotionService):
+    def __init__(self, notion_service: NotionService, members: Optional[MemberDirectory] = None):
         self.notion = notion_service
+        self.members = members or MemberDirectory(notion_service)
         self.calendar_callback = CallbackData("calendar", "action", "year", "month", "day")
 
     async def start(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -59,6 +63,8 @@ class CommandHandlers:
 
     async def start_new_task(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Start new task creation"""
+        # Участники загружаются, пока пользователь вводит название
+        self.members.warm_up()
         await update.message.reply_text("📝 Введите название задачи:")
         return TITLE
 
@@ -66,19 +72,10 @@ class CommandHandlers:
         """Handle task title input"""
         context.user_data['title'] = update.message.text
         
-        # Get workspace members
-        members = await self.notion.get_workspace_members()
-        keyboard = [
-            [InlineKeyboardButton(member['name'], callback_data=f"assign_{member['id']}")] 
-            for member in members
-            if member['type'] in ['member', 'guest']
-        ]
-        keyboard.append([InlineKeyboardButton("Пропустить", callback_data="skip_assignee")])
+        # Клавиатура собрана заранее, Notion опрашивается только в фоне
+        keyboard = await self.members.keyboard()
         
-        await update.message.reply_text(
-            "👤 Выберите ответственного:",
-            reply_markup=InlineKeyboardMarkup(keyboard)
-        )
+        await update.message.reply_text("👤 Выберите ответственного:", reply_markup=keyboard)
         return ASSIGNEE
 
     async def handle_assignee(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -87,7 +84,7 @@ class CommandHandlers:
         await query.answer()
         
         if query.data != "skip_assignee":
-            context.user_data['assignee_id'] = query.data.split('_')[1]
+            context.user_data['assignee_id'] = query.data[len(ASSIGN_PREFIX):]
             
         # Show calendar for due date
         calendar, step = create_calendar()
@@ -0,0 +1,106 @@
+"""Paginated task list view with memoized rendering"""
+
+import hashlib
+from collections import OrderedDict
+from typing import Hashable, List, Optional, Sequence, Tuple
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+from src.models.task import Task
+
+TASKS_PER_PAGE = 20
+MAX_MESSAGE_LENGTH = 4096  # лимит Telegram на текст сообщения
+RENDER_CACHE_SIZE = 256
+SHOWN_CACHE_SIZE = 1024
+CALLBACK_PREFIX = 'tasks:'
+
+class TaskListView:
+    def __init__(self, per_page: int = TASKS_PER_PAGE):
+        """Render pages of tasks with prev/next buttons
+
+        A page longer than one Telegram message is split into several
+        messages, the keyboard goes with the last one. Rendered pages are
+        memoized by a hash of their content, and the hash last shown in each
+        message is remembered, so an edit that would not change anything is
+        skipped.
+        """
+        self.per_page = per_page
+        self._rendered: "OrderedDict[str, Tuple[List[str], InlineKeyboardMarkup]]" = OrderedDict()
+        self._shown: "OrderedDict[Hashable, str]" = OrderedDict()
+
+    @staticmethod
+    def parse_callback(data: str) -> Optional[int]:
+        """Page number from callback data, None if it is not a pagination button"""
+        if not data.startswith(CALLBACK_PREFIX):
+            return None
+        try:
+            return max(0, int(data[len(CALLBACK_PREFIX):]))
+        except ValueError:
+            return None
+
+    @staticmethod
+    def format_task(task: Task) -> str:
+        """Format task as a single line"""
+        title = task.title or "Без названия"
+        return f"• {title} [{task.status}]" if task.status else f"• {title}"
+
+    def render(self, tasks: Sequence[Task], page: int, has_next: bool) -> Tuple[List[str], InlineKeyboardMarkup, str]:
+        """Message texts, keyboard and content hash of a page"""
+        digest = self._digest(tasks, page, has_next)
+        cached = self._rendered.get(digest)
+        if cached is not None:
+            self._rendered.move_to_end(digest)
+            return (*cached, digest)
+
+        chunks = split_message([self.format_task(task) for task in tasks])
+
+        buttons = []
+        if page > 0:
+            buttons.append(InlineKeyboardButton("◀️", callback_data=f"{CALLBACK_PREFIX}{page - 1}"))
+        buttons.append(InlineKeyboardButton(f"Стр. {page + 1}", callback_data=f"{CALLBACK_PREFIX}{page}"))
+        if has_next:
+            buttons.append(InlineKeyboardButton("▶️", callback_data=f"{CALLBACK_PREFIX}{page + 1}"))
+        markup = InlineKeyboardMarkup([buttons])
+
+        self._rendered[digest] = (chunks, markup)
+        if len(self._rendered) > RENDER_CACHE_SIZE:
+            self._rendered.popitem(last=False)
+        return chunks, markup, digest
+
+    @staticmethod
+    def _digest(tasks: Sequence[Task], page: int, has_next: bool) -> str:
+        content = repr((page, has_next, [(task.id, task.title, task.status) for task in tasks]))
+        return hashlib.blake2b(content.encode(), digest_size=16).hexdigest()
+
+    def is_shown(self, message_key: Hashable, digest: str) -> bool:
+        """Whether the message already displays this content"""
+        return self._shown.get(message_key) == digest
+
+    def mark_shown(self, message_key: Hashable, digest: str):
+        self._shown[message_key] = digest
+        self._shown.move_to_end(message_key)
+        if len(self._shown) > SHOWN_CACHE_SIZE:
+            self._shown.popitem(last=False)
+
+def split_message(lines: Sequence[str], limit: int = MAX_MESSAGE_LENGTH) -> List[str]:
+    """Join lines into as few texts of at most limit characters as possible
+
+    Lines are kept whole unless a single line is longer than limit.
+    """
+    chunks: List[str] = []
+    current = ""
+    for line in lines:
+        # Строка длиннее сообщения режется на куски
+        while len(line) > limit:
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(line[:limit])
+            line = line[limit:]
+        if current and len(current) + 1 + len(line) > limit:
+            chunks.append(current)
+            current = ""
+        current = f"{current}\n{line}" if current else line
+    if current or not chunks:
+        chunks.append(current)
+    return chunks
@@ -0,0 +1,146 @@
+"""Concurrent update processing with per-chat ordering"""
+
+import asyncio
+import logging
+from typing import TYPE_CHECKING, Any, Awaitable, Dict, List, Optional
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+from src.constants import MESSAGES
+from src.utils.logging_config import bind_log_context, log_context
+from src.utils.metrics import registry
+from src.utils.tracing import tracer
+
+if TYPE_CHECKING:
+    from src.services.admission import AdmissionController
+
+logger = logging.getLogger(__name__)
+
+HANDLER_SECONDS = registry.histogram('bot_handler_seconds', 'Time spent running update handlers')
+UPDATES_TOTAL = registry.counter('bot_updates_total', 'Updates processed')
+
+class ChatOrderedUpdateProcessor(BaseUpdateProcessor):
+    def __init__(
+        self,
+        max_workers: int = 8,
+        max_pending: Optional[int] = None,
+        admission: Optional["AdmissionController"] = None
+    ):
+        """Run updates of different chats concurrently, each chat strictly in order
+
+        Args:
+            max_workers: Updates executed at the same time
+            max_pending: Updates accepted by the processor, including those
+                waiting for an earlier update of the same chat
+            admission: Sheds updates that waited too long while overloaded;
+                their senders get MESSAGES["overloaded"] instead of silence
+        """
+        super().__init__(max_pending or max_workers * 16)
+        self.max_workers = max_workers
+        self.admission = admission
+        self._workers = asyncio.Semaphore(max_workers)
+        # chat_id -> [lock, число обновлений этого чата в обработке]
+        self._chats: Dict[int, List[Any]] = {}
+
+    @staticmethod
+    def _chat_key(update: object) -> Optional[int]:
+        if not isinstance(update, Update):
+            return None
+        if update.effective_chat:
+            return update.effective_chat.id
+        if update.effective_user:
+            return update.effective_user.id
+        return None
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        """Wait for earlier updates of the same chat, then for a free worker"""
+        key = self._chat_key(update)
+        token = bind_log_context(**_log_fields(update, key))
+        try:
+            await self._traced(update, key, coroutine)
+        finally:
+            log_context.reset(token)
+
+    async def _traced(self, update: object, key: Optional[int], coroutine: Awaitable[Any]):
+        # Корневой span охватывает и ожидание очереди: разрыв до 'handler' и есть ожидание
+        with tracer.span('update', chat=key, kind=_update_kind(update)):
+            await self._process_in_order(update, key, coroutine)
+
+    async def _process_in_order(self, update: object, key: Optional[int], coroutine: Awaitable[Any]):
+        if key is None:
+            await self._run(update, coroutine)
+            return
+
+        entry = self._chats.get(key)
+        if entry is None:
+            entry = self._chats[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            # Блокировка чата берётся до слота воркера: ожидающие своей очереди
+            # обновления одного чата не занимают слоты других чатов
+            async with entry[0]:
+                await self._run(update, coroutine)
+        except asyncio.CancelledError:
+            if asyncio.iscoroutine(coroutine):
+                coroutine.close()
+            raise
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._chats[key]
+
+    async def _run(self, update: object, coroutine: Awaitable[Any]):
+        async with self._workers:
+            # Решение принимается после ожидания в очереди, когда известна задержка
+            admitted = self.admission is None or self.admission.admit(update)
+            if admitted:
+                # Время ожидания очереди чата и слота в гистограмму не входит
+                with HANDLER_SECONDS.time(), tracer.span('handler'):
+                    await coroutine
+                UPDATES_TOTAL.inc()
+                return
+            if asyncio.iscoroutine(coroutine):
+                coroutine.close()
+        # Ответ отправляется уже без слота воркера
+        await self._reply_overloaded(update)
+
+    @staticmethod
+    async def _reply_overloaded(update: object):
+        """Tell the sender that a shed update will not be answered"""
+        message = update.effective_message if isinstance(update, Update) else None
+        if message is None:
+            return
+        try:
+            await message.reply_text(MESSAGES["overloaded"])
+        except Exception as e:
+            logger.warning(f"Failed to reply to shed update {update.update_id}: {e}")
+
+    @property
+    def active_chats(self) -> int:
+        """Chats with updates in progress or waiting"""
+        return len(self._chats)
+
+    async def initialize(self) -> None:
+        """Nothing to allocate"""
+
+    async def shutdown(self) -> None:
+        """Nothing to free"""
+
+def _log_fields(update: object, key: Optional[int]) -> Dict[str, Any]:
+    if not isinstance(update, Update):
+        return {}
+    return {
+        'update_id': update.update_id,
+        'user_id': update.effective_user.id if update.effective_user else None,
+        'chat_id': key
+    }
+
+def _update_kind(update: object) -> str:
+    if not isinstance(update, Update):
+        return type(update).__name__
+    if update.callback_query:
+        return f"callback:{update.callback_query.data}"
+    if update.message and update.message.text and update.message.text.startswith('/'):
+        return update.message.text.split()[0]
+    return 'message'
@@ -4,12 +4,25 @@ import logging
 import os
 import asyncio
 import signal
+from datetime import datetime
+import uvicorn
 from fastapi import FastAPI
+from telegram import Bot, Update
+from telegram.ext import Updater
 from src.config import BotConfig
 from src.bot import NotionBot
 from src.api.monitoring import router as monitoring_router
+from src.api.webhook import ShardedIngress, router as webhook_router
 from src.services.backup_service import BackupService
-from src.utils.logging_config import setup_logging
+from src.services.change_notifier import ChangeNotifier
+from src.services.task_store import TaskStore
+from src.services.state_backend import create_state_backend
+from src.services.supervisor import WorkerSupervisor, report_health
+from src.services.sync_service import TaskSyncService
+from src.services.write_queue import IDLE_TIMEOUT, SHARED_POLL_INTERVAL, WriteQueue
+from src.utils.logging_config import setup_logging, shutdown_logging
+from src.utils.metrics import registry
+from src.utils.tracing import tracer
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from dotenv import load_dotenv
 
@@ -18,29 +31,29 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 LOG_DIR = os.path.join(BASE_DIR, 'logs')
 BACKUP_DIR = os.path.join(BASE_DIR, 'backups')
 DB_PATH = os.path.join(BASE_DIR, 'bot.db')
+STATE_DB_PATH = os.path.join(BASE_DIR, 'state.db')
+SCHEMA_PATH = os.path.join(BASE_DIR, 'notion_schema.json')
 
 # Ensure directories exist
 os.makedirs(LOG_DIR, exist_ok=True)
 os.makedirs(BACKUP_DIR, exist_ok=True)
 
+# Load environment variables (LOG_LEVEL is read by setup_logging)
+load_dotenv()
+
 # Initialize logging after LOG_DIR is defined
 setup_logging(LOG_DIR)
 logger = logging.getLogger(__name__)
 
-# Initialize FastAPI
+# Initialize FastAPI: публичный приём webhook отдельно от мониторинга,
+# который раскрывает трейсы и стеки и слушает только localhost по умолчанию
 app = FastAPI()
+app.include_router(webhook_router, prefix="/telegram", tags=["telegram"])
 
-# Add monitoring router
-app.include_router(monitoring_router, prefix="/monitoring", tags=["monitoring"])
-
-# Load environment variables
-load_dotenv()
+monitoring_app = FastAPI()
+monitoring_app.include_router(monitoring_router, prefix="/monitoring", tags=["monitoring"])
 
-# Check required variables
-required_vars = ['TELEGRAM_TOKEN', 'NOTION_TOKEN', 'DATABASE_ID', 'ADMIN_ID']
-for var in required_vars:
-    if not os.getenv(var):
-        raise EnvironmentError(f"Missing required environment variable: {var}")
+SYNC_INTERVAL = int(os.getenv('SYNC_INTERVAL', 60))  # seconds
 
 async def shutdown(signal, loop):
     """Cleanup tasks tied to the service's shutdown."""
@@ -52,31 +65,171 @@ async def shutdown(signal, loop):
     await asyncio.gather(*tasks, return_exceptions=True)
     loop.stop()
 
-async def main():
-    """Main application entry point"""
-    config = BotConfig.from_env()
-    bot = NotionBot(config)
-    
-    # Setup signal handlers
+def http_server(http_app: FastAPI, host: str, port: int) -> uvicorn.Server:
+    return uvicorn.Server(uvicorn.Config(http_app, host=host, port=port, log_config=None))
+
+async def serve_monitoring(config: BotConfig, port: int):
+    """Serve the monitoring API; a failure to start must not stop the bot"""
+    try:
+        await http_server(monitoring_app, config.monitoring_host, port).serve()
+    except SystemExit:
+        # uvicorn завершает процесс через sys.exit, если порт занят
+        logger.error(f"Monitoring API could not listen on {config.monitoring_host}:{port}, running without it")
+
+async def serve_webhook(config: BotConfig):
+    """Serve the webhook endpoint, the bot receives no updates without it"""
+    try:
+        await http_server(app, config.webhook_host, config.webhook_port).serve()
+    except SystemExit:
+        message = f"Webhook server could not listen on {config.webhook_host}:{config.webhook_port}"
+        logger.error(message)
+        raise RuntimeError(message)
+
+def setup_signal_handlers():
     loop = asyncio.get_running_loop()
     for sig in (signal.SIGTERM, signal.SIGINT):
         loop.add_signal_handler(
             sig,
             lambda s=sig: asyncio.create_task(shutdown(s, loop))
         )
+
+async def main(worker_index: int = 0, update_source=None, health=None):
+    """Main application entry point
+
+    In multi-process mode this runs in each worker: updates come from the
+    supervisor and background jobs run only in worker 0.
+    """
+    config = BotConfig.from_env()
+    tracer.configure(config.trace_enabled, config.trace_slow_ms / 1000)
+    task_store = TaskStore(DB_PATH)
+    # Общее состояние (лимиты, кэш, диалоги) для нескольких процессов бота
+    state_backend = create_state_backend(config.state_backend, config.state_db_path or STATE_DB_PATH)
+    bot = NotionBot(config, task_store=task_store, state_backend=state_backend, schema_path=SCHEMA_PATH)
+    bot.update_source = update_source
+    write_queue = WriteQueue(
+        DB_PATH, bot.notion, task_store,
+        idle_timeout=SHARED_POLL_INTERVAL if config.workers > 1 else IDLE_TIMEOUT
+    )
+    bot.write_queue = write_queue
+    app.state.bot = bot
+    monitoring_app.state.bot = bot
+    
+    # Фоновая синхронизация локального зеркала задач и бэкапы
+    run_jobs = worker_index == 0
+    if run_jobs:
+        # Число недоставленных записей знает только процесс, который их доставляет
+        registry.gauge('write_queue_pending', 'Task writes waiting to be sent to Notion', lambda: write_queue.pending)
+    notifier = ChangeNotifier(bot.assignees, bot.send_notification, admission=bot.admission)
+    sync_service = TaskSyncService(bot.notion, task_store, notifier, admission=bot.admission)
+    backup_service = BackupService(DB_PATH, BACKUP_DIR)
+    scheduler = AsyncIOScheduler()
+    if run_jobs:
+        scheduler.add_job(
+            sync_service.sync, 'interval', seconds=SYNC_INTERVAL,
+            next_run_time=datetime.now(), max_instances=1, coalesce=True
+        )
+        scheduler.add_job(sync_service.full_sync, 'interval', hours=24, max_instances=1, coalesce=True)
+        scheduler.add_job(backup_service.create_backup, 'cron', hour=3)
     
+    setup_signal_handlers()
+    
+    # Очередь записей общая (SQLite), доставляет её только один процесс
+    write_queue_task = asyncio.create_task(write_queue.run()) if run_jobs else None
+    health_task = None
+    if health is not None:
+        health_task = asyncio.create_task(report_health(worker_index, health, lambda: {
+            'queue_depth': bot.ingress.queue_depth if bot.ingress else 0,
+            **({'pending_writes': write_queue.pending} if run_jobs else {})
+        }))
+    # Воркеры получают обновления от супервизора, webhook слушает только одиночный процесс
+    webhook_task = None
+    if config.mode == 'webhook' and update_source is None:
+        webhook_task = asyncio.create_task(serve_webhook(config))
+        # Без webhook бот не получает обновлений: останавливаемся
+        main_task = asyncio.current_task()
+        webhook_task.add_done_callback(lambda task: task.cancelled() or main_task.cancel())
+    # Мониторинг только по явному включению; воркер слушает свой порт после порта супервизора
+    monitoring_task = None
+    if config.monitoring_enabled:
+        monitoring_port = config.monitoring_port if update_source is None else config.monitoring_port + worker_index + 1
+        monitoring_task = asyncio.create_task(serve_monitoring(config, monitoring_port))
     try:
         logger.info("Starting NotionBot...")
+        scheduler.start()
         await bot.run()
     except asyncio.CancelledError:
         logger.info("Bot shutdown complete")
     except Exception as e:
         logger.error(f"Bot crashed: {e}")
         raise
+    finally:
+        scheduler.shutdown(wait=False)
+        for task in (write_queue_task, health_task, webhook_task, monitoring_task):
+            if task is not None:
+                task.cancel()
+        write_queue.close()
+        task_store.close()
+        state_backend.close()
+
+def run_worker(worker_index: int, update_source, health):
+    """Worker process entry point"""
+    # Импорт модуля в новом процессе уже настроил общие файлы, у воркера свои
+    shutdown_logging()
+    setup_logging(LOG_DIR, file_prefix=f'worker-{worker_index}.')
+    try:
+        asyncio.run(main(worker_index, update_source, health))
+    except KeyboardInterrupt:
+        pass
+
+async def supervise():
+    """Receive updates and shard them by chat between worker processes"""
+    config = BotConfig.from_env()
+    supervisor = WorkerSupervisor(run_worker, config.workers, queue_size=config.webhook_queue_size)
+    monitoring_app.state.supervisor = supervisor
+    setup_signal_handlers()
+    supervisor.start()
+    logger.info(f"Supervisor started {config.workers} workers")
+    
+    bot = Bot(config.telegram_token)
+    updater = None
+    monitoring_task = None
+    if config.monitoring_enabled:
+        monitoring_task = asyncio.create_task(serve_monitoring(config, config.monitoring_port))
+    try:
+        if config.mode == 'webhook':
+            app.state.ingress = ShardedIngress(supervisor, config.webhook_secret)
+            async with bot:
+                await bot.set_webhook(
+                    url=config.webhook_url,
+                    secret_token=config.webhook_secret,
+                    allowed_updates=Update.ALL_TYPES
+                )
+            await serve_webhook(config)
+        else:
+            # Ограниченная очередь притормаживает polling, если воркеры не успевают
+            updater = Updater(bot, asyncio.Queue(maxsize=config.webhook_queue_size))
+            await updater.initialize()
+            await updater.start_polling(allowed_updates=Update.ALL_TYPES)
+            while True:
+                update = await updater.update_queue.get()
+                await supervisor.put(update)
+    except asyncio.CancelledError:
+        logger.info("Supervisor shutting down...")
+    finally:
+        if monitoring_task is not None:
+            monitoring_task.cancel()
+        if updater is not None and updater.running:
+            await updater.stop()
+        if updater is not None:
+            await updater.shutdown()
+        await supervisor.stop()
 
 if __name__ == '__main__':
     try:
-        asyncio.run(main())
+        if int(os.getenv('WORKERS', 1)) > 1:
+            asyncio.run(supervise())
+        else:
+            asyncio.run(main())
     except KeyboardInterrupt:
         logger.info("Bot stopped by user")
     except Exception as e:
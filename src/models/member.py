@@ -0,0 +1,14 @@
+"""Workspace member model"""
+
+from dataclasses import dataclass
+from typing import Any, Dict
+
+@dataclass(frozen=True, slots=True)
+class Member:
+    id: str
+    name: str
+
+    @classmethod
+    def from_user(cls, user: Dict[str, Any]) -> "Member":
+        """Parse a Notion user object"""
+        return cls(id=user['id'], name=user.get('name') or user['id'])
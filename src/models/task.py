@@ -0,0 +1,101 @@
+"""Compact task model parsed from Notion database query results"""
+
+from dataclasses import dataclass, fields
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from src.constants import TASK_PROPERTIES
+
+@dataclass(frozen=True, slots=True)
+class Task:
+    """Only the task fields the bot uses, without Notion property metadata"""
+    id: str
+    title: str
+    status: Optional[str] = None
+    assignee: Optional[str] = None
+    assignee_name: Optional[str] = None
+    due: Optional[str] = None
+    priority: Optional[str] = None
+    url: Optional[str] = None
+    last_edited: str = ''
+
+    @classmethod
+    def from_page(cls, page: Dict[str, Any]) -> "Task":
+        """Parse a Notion page in one pass over its properties"""
+        values = {}
+        for name, prop in page.get('properties', {}).items():
+            field = _PROPERTY_FIELDS.get(name)
+            if field is None:
+                continue
+            data = prop.get(prop.get('type'))
+            if not data:
+                continue
+            if field == 'title':
+                values['title'] = "".join(part.get('plain_text', '') for part in data)
+            elif field == 'assignee':
+                values['assignee'] = data[0].get('id')
+                values['assignee_name'] = data[0].get('name')
+            elif field == 'due':
+                values['due'] = data.get('start')
+            else:  # status и select
+                values[field] = data.get('name')
+
+        return cls(
+            id=page['id'],
+            title=values.pop('title', ''),
+            url=page.get('url'),
+            last_edited=page.get('last_edited_time', ''),
+            **values
+        )
+
+    @classmethod
+    def from_row(cls, row: Any) -> "Task":
+        """Build from a task_store row or a tuple made by as_tuple"""
+        return cls(*(row[i] for i in range(len(COLUMNS))))
+
+    def as_tuple(self) -> Tuple:
+        """Field values in COLUMNS order (SQL parameters, JSON)"""
+        return tuple(getattr(self, name) for name in COLUMNS)
+
+COLUMNS = tuple(field.name for field in fields(Task))
+
+_PROPERTY_FIELDS = {
+    TASK_PROPERTIES["TITLE"]: 'title',
+    TASK_PROPERTIES["STATUS"]: 'status',
+    TASK_PROPERTIES["ASSIGNEE"]: 'assignee',
+    TASK_PROPERTIES["DUE"]: 'due',
+    TASK_PROPERTIES["PRIORITY"]: 'priority'
+}
+
+class TaskPage(NamedTuple):
+    """One page of databases.query results"""
+    tasks: Tuple[Task, ...]
+    next_cursor: Optional[str]
+    has_more: bool
+
+    @classmethod
+    def from_response(cls, response: Dict[str, Any]) -> "TaskPage":
+        return cls(
+            tuple(Task.from_page(page) for page in response.get('results', [])),
+            response.get('next_cursor'),
+            bool(response.get('has_more'))
+        )
+
+    def to_json(self) -> Dict[str, Any]:
+        """Plain JSON form for the cache size estimate and shared backend"""
+        return {
+            'tasks': [task.as_tuple() for task in self.tasks],
+            'next_cursor': self.next_cursor,
+            'has_more': self.has_more
+        }
+
+    @classmethod
+    def from_json(cls, data: Dict[str, Any]) -> "TaskPage":
+        return cls(
+            tuple(Task.from_row(row) for row in data['tasks']),
+            data['next_cursor'],
+            data['has_more']
+        )
+
+def parse_tasks(response: Dict[str, Any]) -> List[Task]:
+    """Tasks of a databases.query response"""
+    return list(TaskPage.from_response(response).tasks)
@@ -2,114 +2,336 @@
 
 import logging
 import asyncio
-from typing import Dict, List, Optional
-from notion_client import Client
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import httpx
+from notion_client import AsyncClient
+from notion_client.errors import HTTPResponseError
+
+from src.utils.adaptive_concurrency import AdaptiveConcurrencyLimiter
+from src.constants import TASK_PROPERTIES
+from src.models.task import Task, TaskPage, parse_tasks
+from src.services.schema_cache import SchemaCache
+from src.services.state_backend import StateBackend
+from src.utils.cache import QueryCache
+from src.utils.error_handlers import get_retry_after, handle_notion_error
+from src.utils.metrics import registry
+from src.utils.request_scheduler import RequestScheduler
+from src.utils.single_flight import SingleFlight
+from src.utils.tracing import traced, tracer
 
 logger = logging.getLogger(__name__)
 
+REQUEST_SECONDS = registry.histogram(
+    'notion_request_seconds', 'Notion API call time, without scheduler wait', labels=('method',)
+)
+REQUEST_ERRORS = registry.counter('notion_request_errors_total', 'Failed Notion API calls', labels=('status',))
+
+# Общий HTTP пул: keep-alive соединения переиспользуются всеми пользователями
+MAX_CONNECTIONS = 10
+MAX_KEEPALIVE_CONNECTIONS = 5
+KEEPALIVE_EXPIRY = 30.0
+MAX_CONCURRENT_REQUESTS = 3
+NOTION_RATE_LIMIT = 3.0  # лимит Notion действует на весь токен интеграции
+PAGE_SIZE = 100  # максимум, который Notion отдаёт за один запрос
+
 class NotionService:
-    def __init__(self, token: str, database_id: str):
+    def __init__(
+        self,
+        token: str,
+        database_id: str,
+        max_concurrency: int = MAX_CONCURRENT_REQUESTS,
+        state_backend: Optional[StateBackend] = None,
+        schema_path: Optional[str] = None,
+        workers: int = 1
+    ):
         self.token = token
         self.database_id = database_id
-        self.client = None
+        self.client: Optional[AsyncClient] = None
+        self._http: Optional[httpx.AsyncClient] = None
+        self.concurrency = AdaptiveConcurrencyLimiter(initial=max_concurrency)
+        # Лимит Notion на токен делится между процессами поровну
+        self.scheduler = RequestScheduler(rate=NOTION_RATE_LIMIT, workers=workers, backend=state_backend)
+        self.sync_watermark: Optional[str] = None
+        # В кэше только компактные TaskPage, а не JSON страниц Notion
+        self.cache = QueryCache(backend=state_backend, encode=TaskPage.to_json, decode=TaskPage.from_json)
+        self.single_flight = SingleFlight()
+        self.schema = SchemaCache(schema_path)
+        self._revalidation: Optional[asyncio.Task] = None
         self._initialize_client()
-        self._connection_pool = {}
-        self._min_request_interval = 0.34  # ~3 requests per second
         
     def _initialize_client(self):
-        """Initialize Notion client with error handling"""
-        try:
-            self.client = Client(auth=self.token)
-            # Test connection
-            self.client.users.me()
-            logger.info("Successfully connected to Notion API")
-        except Exception as e:
-            logger.error(f"Failed to initialize Notion client: {e}")
-            raise
-        
-    def _validate_database_id(self, database_id: str) -> str:
-        """Validates and formats database ID"""
-        formatted_id = database_id.replace('-', '')
-        if len(formatted_id) != 32:
-            raise ValueError(
-                "Invalid database ID format. ID should be 32 characters"
+        """Initialize async Notion client on top of a shared HTTP pool"""
+        self._http = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=MAX_CONNECTIONS,
+                max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=KEEPALIVE_EXPIRY
             )
-        return formatted_id
+        )
+        self.client = AsyncClient(auth=self.token, client=self._http)
 
-    async def _test_database_access(self):
-        """Test database access and schema"""
+    async def _request(self, method, *, requester: Optional[int] = None, **kwargs) -> Any:
+        """Run a Notion API call through the shared scheduler"""
+        name = _method_name(method)
+        with tracer.span('notion.rate_limit_wait'):
+            await self.scheduler.acquire(requester)
+        async with self.concurrency:
+            try:
+                with REQUEST_SECONDS.time(name), tracer.span(f"notion.{name}"):
+                    response = await method(**kwargs)
+            except HTTPResponseError as e:
+                REQUEST_ERRORS.inc(str(e.status))
+                if e.status == 429:
+                    self.concurrency.on_overload()
+                    # Retry-After действует на весь токен: приостанавливаем всех
+                    retry_after = get_retry_after(e)
+                    if retry_after:
+                        await self.scheduler.pause(retry_after)
+                elif e.status >= 500:
+                    self.concurrency.on_overload()
+                raise
+            except Exception:
+                REQUEST_ERRORS.inc('transport')
+                raise
+            self.concurrency.on_success()
+            return response
+        
+    @traced('notion.fetch_schema')
+    @handle_notion_error
+    async def _fetch_schema(self) -> Dict:
+        """Retrieve database schema, which also proves the token has access"""
         try:
-            # Query database to verify access
-            response = await self.client.databases.retrieve(database_id=self.database_id)
-            
-            # Verify required properties exist
-            properties = response.get('properties', {})
-            required_props = {'Title': 'title', 'Status': 'status'}
-            
-            for prop_name, prop_type in required_props.items():
-                if prop_name not in properties:
-                    raise ValueError(f"Missing required property: {prop_name}")
-                if properties[prop_name]['type'] != prop_type:
-                    raise ValueError(f"Invalid type for {prop_name}. Expected {prop_type}")
-            
-            logger.info(f"Successfully verified database schema")
-            return True
-            
+            return await self._request(
+                self.client.databases.retrieve,
+                database_id=self.database_id
+            )
         except Exception as e:
             logger.error(f"Database access test failed: {e}")
             raise
 
+    async def revalidate_schema(self):
+        """Compare cached schema with Notion and store it if it changed"""
+        if self.schema.update(await self._fetch_schema()):
+            logger.info("Database schema updated")
+
+    async def _revalidate_in_background(self):
+        try:
+            await self.revalidate_schema()
+        except Exception as e:
+            logger.error(f"Background schema revalidation failed: {e}")
+
     async def initialize(self):
-        """Full initialization with connection and schema validation"""
-        await self._test_database_access()
-        
-    async def get_user_connection(self, user_id: int) -> Dict:
-        """Get or create connection for user with rate limiting"""
-        if user_id not in self._connection_pool:
-            self._connection_pool[user_id] = {
-                'client': Client(auth=self.client.auth),
-                'last_request': 0,
-                'tasks_cache': {}
-            }
-        return self._connection_pool[user_id]
+        """Start from the cached schema and revalidate it in background
 
-    async def _wait_for_rate_limit(self, user_id: int):
-        """Per-user rate limiting"""
-        conn = await self.get_user_connection(user_id)
-        now = asyncio.get_event_loop().time()
-        time_since_last = now - conn['last_request']
-        
-        if time_since_last < self._min_request_interval:
-            await asyncio.sleep(self._min_request_interval - time_since_last)
-        conn['last_request'] = now
+        Only the very first start, without a cache, waits for Notion.
+        """
+        if self.schema.load(self.database_id):
+            logger.info("Using cached database schema")
+            self._revalidation = asyncio.create_task(self._revalidate_in_background())
+            return
+        await self.revalidate_schema()
+        logger.info("Successfully verified database schema")
 
-    async def create_task(self, user_id: int, title: str, status: str = "Not Started") -> Optional[Dict]:
-        """Create task with user isolation and proper error handling"""
+    async def close(self):
+        """Close the shared HTTP connection pool"""
+        if self._revalidation is not None:
+            self._revalidation.cancel()
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+        
+    @traced('notion.create_task')
+    @handle_notion_error(idempotent=False)
+    async def create_task(
+        self,
+        user_id: int,
+        title: str,
+        status: str = "Not Started",
+        assignee_id: Optional[str] = None
+    ) -> Optional[Dict]:
+        """Create task with fair scheduling and proper error handling"""
         try:
-            await self._wait_for_rate_limit(user_id)
-            conn = await self.get_user_connection(user_id)
-            
             # Validate inputs
             if not title:
                 raise ValueError("Task title cannot be empty")
                 
+            # Ключи — id свойств: переименование колонки в Notion их не меняет
             properties = {
-                "Title": {"title": [{"text": {"content": title}}]},
-                "Status": {"status": {"name": status}}
+                self.schema.property_id(TASK_PROPERTIES["TITLE"]): {"title": [{"text": {"content": title}}]},
+                self.schema.property_id(TASK_PROPERTIES["STATUS"]): {"status": {"name": status}}
             }
+            if assignee_id:
+                properties[self.schema.property_id(TASK_PROPERTIES["ASSIGNEE"])] = {"people": [{"id": assignee_id}]}
                 
-            response = await conn['client'].pages.create(
+            response = await self._request(
+                self.client.pages.create,
+                requester=user_id,
                 parent={"database_id": self.database_id},
                 properties=properties
             )
             
-            # Update user's cache
             if response:
-                conn['tasks_cache'][response['id']] = response
+                await self.cache.invalidate()
                 logger.info(f"Successfully created task: {title}")
                 
             return response
             
         except Exception as e:
             logger.error(f"Failed to create task for user {user_id}: {e}")
-            raise
\ No newline at end of file
+            raise
+
+    async def get_tasks(
+        self,
+        user_id: Optional[int] = None,
+        since: Optional[str] = None,
+        page_size: int = PAGE_SIZE,
+        filter: Optional[Dict] = None,
+        use_cache: bool = True
+    ) -> AsyncIterator[Task]:
+        """Stream tasks page by page as Notion returns them
+
+        Args:
+            user_id: Telegram user the request is made for (fair scheduling)
+            since: ISO timestamp, only tasks edited on or after it are returned
+            page_size: Number of tasks requested per round trip
+            filter: Additional Notion database filter
+            use_cache: Serve pages from the query cache; the sync passes need
+                live data and would only fill the cache with unread pages
+        """
+        filters = [filter] if filter else []
+        query = {'database_id': self.database_id, 'page_size': page_size}
+        if since:
+            filters.append({
+                'timestamp': 'last_edited_time',
+                'last_edited_time': {'on_or_after': since}
+            })
+            query['sorts'] = [{'timestamp': 'last_edited_time', 'direction': 'ascending'}]
+        if len(filters) == 1:
+            query['filter'] = filters[0]
+        elif filters:
+            query['filter'] = {'and': filters}
+
+        cursor = None
+        while True:
+            if cursor:
+                query['start_cursor'] = cursor
+            page = await self._query_page(dict(query), user_id, use_cache=use_cache and since is None)
+            for task in page.tasks:
+                yield task
+
+            cursor = page.next_cursor
+            if not page.has_more or not cursor:
+                break
+
+    @traced('notion.get_task_page')
+    async def get_task_page(
+        self,
+        user_id: Optional[int] = None,
+        page_size: int = PAGE_SIZE,
+        start_cursor: Optional[str] = None,
+        cached_only: bool = False
+    ) -> Optional[TaskPage]:
+        """Fetch a single page of tasks, continuing from a previous next_cursor
+
+        With cached_only the page is served from cache, even stale, and None
+        is returned instead of calling Notion.
+        """
+        query = {'database_id': self.database_id, 'page_size': page_size}
+        if start_cursor:
+            query['start_cursor'] = start_cursor
+        if cached_only:
+            return await self.cache.peek(self.cache.make_key(**query))
+        return await self._query_page(query, user_id)
+
+    @traced('notion.get_workspace_members')
+    async def get_workspace_members(self) -> List[Dict]:
+        """All workspace users, following users.list pagination"""
+        members: List[Dict] = []
+        cursor = None
+        while True:
+            response = await self._list_users(cursor)
+            members.extend(response.get('results', []))
+            cursor = response.get('next_cursor')
+            if not response.get('has_more') or not cursor:
+                return members
+
+    @handle_notion_error
+    async def _list_users(self, start_cursor: Optional[str] = None) -> Dict:
+        """One page of users.list with retries"""
+        kwargs = {'page_size': PAGE_SIZE}
+        if start_cursor:
+            kwargs['start_cursor'] = start_cursor
+        return await self._request(self.client.users.list, **kwargs)
+
+    async def get_changed_tasks(self) -> AsyncIterator[Task]:
+        """Stream tasks edited since the previous sync and advance the watermark"""
+        # Notion округляет last_edited_time до минуты, поэтому граница
+        # запрашивается повторно (on_or_after) и повторы допустимы
+        async for task in self.get_tasks(since=self.sync_watermark, use_cache=False):
+            edited = task.last_edited
+            if edited and (self.sync_watermark is None or edited > self.sync_watermark):
+                self.sync_watermark = edited
+            yield task
+
+    @traced('notion.query_page')
+    async def _query_page(self, query: Dict, user_id: Optional[int], use_cache: bool = True) -> TaskPage:
+        """Fetch one page of database query results, shared across users"""
+        key = self.cache.make_key(**query)
+
+        def load():
+            # Одновременные одинаковые запросы ждут один общий вызов Notion
+            return self.single_flight.do(key, lambda: self._query_database(query, user_id))
+
+        if not use_cache:
+            return await load()
+        return await self.cache.get_or_load(key, load)
+
+    @handle_notion_error
+    async def _query_database(self, query: Dict, user_id: Optional[int]) -> TaskPage:
+        """Run databases.query with retries and parse the results"""
+        response = await self._request(self.client.databases.query, requester=user_id, **query)
+        with tracer.span('parse', results=len(response.get('results', []))):
+            return TaskPage.from_response(response)
+
+    @traced('notion.find_task')
+    @handle_notion_error
+    async def find_task(self, title: str, since: float) -> Optional[Task]:
+        """Find a task with exactly this title created after a UNIX timestamp"""
+        # created_time в Notion округляется до минуты
+        created_after = datetime.fromtimestamp(since - 60, timezone.utc).isoformat()
+        response = await self._request(
+            self.client.databases.query,
+            database_id=self.database_id,
+            page_size=1,
+            filter={'and': [
+                {'property': self.schema.property_id(TASK_PROPERTIES["TITLE"]), 'title': {'equals': title}},
+                {'timestamp': 'created_time', 'created_time': {'on_or_after': created_after}}
+            ]}
+        )
+        tasks = parse_tasks(response)
+        return tasks[0] if tasks else None
+
+    @traced('notion.update_task_status')
+    @handle_notion_error
+    async def update_task_status(self, user_id: int, task_id: str, status: str) -> Dict:
+        """Change task status and invalidate cached queries"""
+        try:
+            response = await self._request(
+                self.client.pages.update,
+                requester=user_id,
+                page_id=task_id,
+                properties={self.schema.property_id(TASK_PROPERTIES["STATUS"]): {"status": {"name": status}}}
+            )
+            await self.cache.invalidate()
+            logger.info(f"Task {task_id} moved to status {status}")
+            return response
+        except Exception as e:
+            logger.error(f"Failed to update task {task_id} for user {user_id}: {e}")
+            raise
+
+def _method_name(method) -> str:
+    """'databases.query' for a bound endpoint method of the Notion client"""
+    endpoint = type(getattr(method, '__self__', None)).__name__.replace('Endpoint', '').lower()
+    return f"{endpoint}.{method.__name__}"
@@ -0,0 +1,93 @@
+"""Admission control: shed background work first when the host is saturated"""
+
+import logging
+import time
+from typing import Dict, Optional
+
+from telegram import Update
+
+from src.utils.metrics import registry
+from src.utils.resource_monitor import ResourceMonitor
+
+logger = logging.getLogger(__name__)
+
+# Уровни нагрузки: на каждом следующем отключается ещё часть работы
+NORMAL = 0
+ELEVATED = 1  # откладываем уведомления, отклоняем массовые операции
+OVERLOADED = 2  # списки задач только из кэша, устаревшие обновления отбрасываются
+
+# Давление (ResourceMonitor.pressure), с которого начинается уровень
+THRESHOLDS = {ELEVATED: 1.0, OVERLOADED: 1.5}
+RECOVERY_RATIO = 0.8  # гистерезис: уровень снижается с запасом ниже порога
+CHECK_INTERVAL = 2  # секунд между замерами
+MAX_UPDATE_AGE = 30  # секунд; пользователь уже не ждёт ответа на такое сообщение
+
+LEVEL_NAMES = {NORMAL: 'normal', ELEVATED: 'elevated', OVERLOADED: 'overloaded'}
+
+SHED_TOTAL = registry.counter('admission_shed_total', 'Work skipped or degraded under load', labels=('reason',))
+
+class Overloaded(Exception):
+    """Live data cannot be served right now"""
+
+class AdmissionController:
+    def __init__(self, monitor: Optional[ResourceMonitor] = None, max_update_age: float = MAX_UPDATE_AGE):
+        """Turn ResourceMonitor samples into a load level
+
+        Args:
+            monitor: Source of CPU, memory, loop lag and queue depth samples
+            max_update_age: Oldest message still processed when overloaded
+        """
+        self.monitor = monitor or ResourceMonitor(check_interval=CHECK_INTERVAL)
+        self.max_update_age = max_update_age
+        self.level = NORMAL
+        registry.gauge('admission_level', 'Load level: 0 normal, 1 elevated, 2 overloaded', lambda: self.level)
+
+    async def run(self):
+        """Sample resources until cancelled"""
+        try:
+            await self.monitor.start_monitoring(self._on_check)
+        finally:
+            self.monitor.stop_monitoring()
+
+    def _on_check(self, status: Dict):
+        self.update(self.monitor.pressure())
+
+    def update(self, pressure: float):
+        """Move between levels, going down only well below the threshold"""
+        level = self.level
+        while level < OVERLOADED and pressure >= THRESHOLDS[level + 1]:
+            level += 1
+        while level > NORMAL and pressure < THRESHOLDS[level] * RECOVERY_RATIO:
+            level -= 1
+        if level != self.level:
+            log = logger.warning if level > self.level else logger.info
+            log(f"Load level {LEVEL_NAMES[self.level]} -> {LEVEL_NAMES[level]} (pressure {pressure:.2f})")
+            self.level = level
+
+    def admit(self, update: object) -> bool:
+        """Whether an update is still worth processing"""
+        if self.level < OVERLOADED or not isinstance(update, Update):
+            return True
+        message = update.effective_message
+        # Нажатия кнопок и сообщения без даты всегда интерактивны
+        if update.callback_query or message is None or message.date is None:
+            return True
+        if time.time() - message.date.timestamp() <= self.max_update_age:
+            return True
+        SHED_TOTAL.inc('stale_update')
+        return False
+
+    def allow_live_reads(self) -> bool:
+        """False when task lists must come from cache"""
+        return self.level < OVERLOADED
+
+    def allow_notifications(self) -> bool:
+        return self.level < ELEVATED
+
+    def allow_bulk(self) -> bool:
+        """Full resyncs and similar long operations"""
+        return self.level < ELEVATED
+
+    def shed(self, reason: str):
+        """Count work skipped because of load"""
+        SHED_TOTAL.inc(reason)
@@ -1,5 +1,6 @@
 import shutil
 import os
+import sqlite3
 from datetime import datetime
 import json
 import logging
@@ -16,7 +17,7 @@ class BackupService:
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
             backup_path = os.path.join(self.backup_dir, f'backup_{timestamp}')
             os.makedirs(backup_path, exist_ok=True)
-            shutil.copy2(self.db_path, backup_path)
+            self._copy_database(os.path.join(backup_path, os.path.basename(self.db_path)))
             metadata = {
                 'timestamp': timestamp,
                 'db_version': '1.0',
@@ -30,6 +31,17 @@ class BackupService:
             self.logger.error(f'Backup creation failed: {str(e)}')
             raise
 
+    def _copy_database(self, target_path: str):
+        """Copy a consistent snapshot of the live SQLite database (WAL included)"""
+        source = sqlite3.connect(self.db_path)
+        target = sqlite3.connect(target_path)
+        try:
+            with target:
+                source.backup(target)
+        finally:
+            target.close()
+            source.close()
+
     def restore_from_backup(self, backup_path: str) -> bool:
         try:
             metadata_path = os.path.join(backup_path, 'metadata.json')
@@ -0,0 +1,105 @@
+"""Task change detection and batched assignee notifications"""
+
+import asyncio
+import logging
+from typing import TYPE_CHECKING, Awaitable, Callable, Dict, Iterable, List, NamedTuple, Optional
+
+from src.config import AssigneeMap
+from src.models.task import Task
+
+if TYPE_CHECKING:
+    from src.services.admission import AdmissionController
+
+logger = logging.getLogger(__name__)
+
+MAX_CHANGES_PER_MESSAGE = 30  # остальные сворачиваются в «и ещё N»
+MAX_TITLE_LENGTH = 100  # чтобы сообщение не превысило лимит Telegram
+
+class TaskChange(NamedTuple):
+    task: Task
+    previous: Optional[Task]
+
+    def describe(self) -> str:
+        title = self.task.title or "Без названия"
+        if len(title) > MAX_TITLE_LENGTH:
+            title = title[:MAX_TITLE_LENGTH - 1] + "…"
+        if self.previous is None or self.previous.assignee != self.task.assignee:
+            status = f" [{self.task.status}]" if self.task.status else ""
+            return f"• {title}{status} — назначена вам"
+        return f"• {title}: {self.previous.status or '—'} → {self.task.status or '—'}"
+
+def diff_tasks(previous: Dict[str, Task], current: Iterable[Task]) -> List[TaskChange]:
+    """Changes that matter to the assignee: new assignment or status transition"""
+    changes = []
+    for task in current:
+        if task.assignee is None:
+            continue
+        old = previous.get(task.id)
+        if old is None or old.assignee != task.assignee or old.status != task.status:
+            changes.append(TaskChange(task, old))
+    return changes
+
+class ChangeNotifier:
+    def __init__(
+        self,
+        assignees: AssigneeMap,
+        send: Callable[[int, str], Awaitable],
+        admission: Optional["AdmissionController"] = None
+    ):
+        """Group changes by assignee and send one message per chat
+
+        Args:
+            assignees: Notion user id -> Telegram chat mapping
+            send: Coroutine sending a low-priority message to a chat
+            admission: Postpones sending while the bot is under load
+        """
+        self.assignees = assignees
+        self.send = send
+        self.admission = admission
+        self.sent = 0
+        # Изменения, отложенные под нагрузкой до следующего прохода
+        self.deferred: Dict[str, TaskChange] = {}
+
+    async def notify(self, changes: List[TaskChange]):
+        """Fan out one sync pass worth of changes, plus the postponed ones"""
+        # Задача могла попасть в проход дважды: берём последнее состояние
+        # относительно самого раннего снимка
+        merged, self.deferred = self.deferred, {}
+        for change in changes:
+            first = merged.get(change.task.id)
+            merged[change.task.id] = change if first is None else TaskChange(change.task, first.previous)
+        if not merged:
+            return
+        if self.admission is not None and not self.admission.allow_notifications():
+            self.deferred = merged
+            self.admission.shed('notification')
+            logger.info(f"Postponed notifications about {len(merged)} task changes")
+            return
+
+        by_chat: Dict[int, List[TaskChange]] = {}
+        for change in merged.values():
+            chat_id = self.assignees.get(change.task.assignee)
+            if chat_id is not None:
+                by_chat.setdefault(chat_id, []).append(change)
+        if not by_chat:
+            return
+
+        # Темп отправки обеспечивает исходящая очередь бота
+        results = await asyncio.gather(
+            *(self.send(chat_id, self._format(chat_changes)) for chat_id, chat_changes in by_chat.items()),
+            return_exceptions=True
+        )
+        for chat_id, result in zip(by_chat, results):
+            if isinstance(result, Exception):
+                logger.warning(f"Failed to notify chat {chat_id}: {result}")
+            else:
+                self.sent += 1
+        logger.info(f"Notified {len(by_chat)} assignees about {len(merged)} task changes")
+
+    @staticmethod
+    def _format(changes: List[TaskChange]) -> str:
+        lines = ["🔔 Изменения в ваших задачах:"]
+        lines.extend(change.describe() for change in changes[:MAX_CHANGES_PER_MESSAGE])
+        if len(changes) > MAX_CHANGES_PER_MESSAGE:
+            lines.append(f"…и ещё {len(changes) - MAX_CHANGES_PER_MESSAGE}")
+        return "\n".join(lines)
@@ -0,0 +1,82 @@
+"""Event-driven housekeeping with heap-scheduled incremental sweeps"""
+
+import asyncio
+import heapq
+import inspect
+import itertools
+import logging
+import time
+from typing import Awaitable, Callable, List, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+class _Job:
+    __slots__ = ('name', 'sweep', 'interval', 'batch', 'busy_delay')
+
+    def __init__(self, name: str, sweep: Callable[[int], Union[int, Awaitable[int]]], interval: float, batch: int, busy_delay: float):
+        self.name = name
+        self.sweep = sweep
+        self.interval = interval
+        self.batch = batch
+        self.busy_delay = busy_delay
+
+class Housekeeper:
+    def __init__(self):
+        self._heap: List[Tuple[float, int, _Job]] = []
+        self._counter = itertools.count()
+        self._wakeup = asyncio.Event()
+
+    def register(
+        self,
+        name: str,
+        sweep: Callable[[int], Union[int, Awaitable[int]]],
+        interval: float = 60,
+        batch: int = 100,
+        busy_delay: float = 0.05
+    ):
+        """Schedule a cleanup job
+
+        Args:
+            name: Job name for logs
+            sweep: Function removing at most N stale entries, returns how many it removed;
+                may return an awaitable for work done off the event loop
+            interval: Seconds between sweeps when nothing is left to clean
+            batch: Maximum entries removed per slice
+            busy_delay: Pause before the next slice while a backlog remains
+        """
+        job = _Job(name, sweep, interval, batch, busy_delay)
+        self._push(time.monotonic() + interval, job)
+
+    def _push(self, deadline: float, job: _Job):
+        heapq.heappush(self._heap, (deadline, next(self._counter), job))
+        self._wakeup.set()
+
+    async def run(self):
+        """Sleep until the nearest deadline and run one slice per wakeup"""
+        while True:
+            self._wakeup.clear()
+            if not self._heap:
+                await self._wakeup.wait()
+                continue
+
+            deadline, _, job = self._heap[0]
+            delay = deadline - time.monotonic()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            heapq.heappop(self._heap)
+            try:
+                removed = job.sweep(job.batch)
+                if inspect.isawaitable(removed):
+                    removed = await removed
+            except Exception as e:
+                logger.error(f"Housekeeping job {job.name} failed: {e}")
+                removed = 0
+            # Полный слайс — вероятно, осталось ещё: продолжаем вскоре,
+            # но отдаём event loop обработке запросов между слайсами
+            next_delay = job.busy_delay if removed >= job.batch else job.interval
+            self._push(time.monotonic() + next_delay, job)
@@ -0,0 +1,137 @@
+"""Cached directory of Notion workspace members for the assignee picker"""
+
+import asyncio
+import bisect
+import logging
+import time
+from typing import Dict, List, Optional, Tuple
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+from src.models.member import Member
+from src.notion_service import NotionService
+
+logger = logging.getLogger(__name__)
+
+MEMBERS_TTL = 3600  # секунд до фонового обновления списка
+MEMBERS_PER_PAGE = 20  # кнопок на странице выбора, остальные — листанием или поиском
+SEARCH_LIMIT = 10
+ASSIGN_PREFIX = 'assign_'
+PAGE_PREFIX = 'assignees:'
+SKIP_BUTTON = [InlineKeyboardButton("Пропустить", callback_data="skip_assignee")]
+
+class MemberDirectory:
+    def __init__(self, notion: NotionService, ttl: float = MEMBERS_TTL):
+        """Members loaded once and refreshed in background after ttl
+
+        Stale data is served while the refresh runs, so the picker never
+        waits on Notion after the first load.
+        """
+        self.notion = notion
+        self.ttl = ttl
+        self._members: List[Member] = []
+        self._by_id: Dict[str, Member] = {}
+        # Отсортированные (слово имени, индекс участника) для поиска по префиксу
+        self._words: List[Tuple[str, int]] = []
+        self._pages: List[InlineKeyboardMarkup] = []
+        self._loaded_at: Optional[float] = None
+        self._refresh: Optional[asyncio.Task] = None
+
+    async def refresh(self):
+        """Reload members from Notion, one refresh at a time"""
+        if self._refresh is None or self._refresh.done():
+            self._refresh = asyncio.create_task(self._load())
+        await asyncio.shield(self._refresh)
+
+    async def _load(self):
+        users = await self.notion.get_workspace_members()
+        members = sorted(
+            (Member.from_user(user) for user in users if user.get('type') == 'person'),
+            key=lambda member: member.name.casefold()
+        )
+        words = sorted(
+            (word, index)
+            for index, member in enumerate(members)
+            for word in member.name.casefold().split()
+        )
+        page_count = max(1, -(-len(members) // MEMBERS_PER_PAGE))
+        pages = [
+            _page_keyboard(members[page * MEMBERS_PER_PAGE:(page + 1) * MEMBERS_PER_PAGE], page, page_count)
+            for page in range(page_count)
+        ]
+
+        self._members = members
+        self._by_id = {member.id: member for member in members}
+        self._words = words
+        self._pages = pages
+        self._loaded_at = time.monotonic()
+        logger.info(f"Loaded {len(members)} workspace members")
+
+    def warm_up(self):
+        """Start loading members in background if they are missing or old"""
+        if self._loaded_at is not None and time.monotonic() - self._loaded_at <= self.ttl:
+            return
+        if self._refresh is None or self._refresh.done():
+            self._refresh = asyncio.create_task(self._load())
+            self._refresh.add_done_callback(_log_refresh_error)
+
+    async def _ensure_fresh(self):
+        if self._loaded_at is None:
+            await self.refresh()
+        else:
+            self.warm_up()
+
+    async def keyboard(self, page: int = 0) -> InlineKeyboardMarkup:
+        """Prebuilt assignee keyboard page, out of range pages show the first one"""
+        await self._ensure_fresh()
+        return self._pages[page] if 0 <= page < len(self._pages) else self._pages[0]
+
+    @staticmethod
+    def parse_page(data: str) -> Optional[int]:
+        """Page number from a picker navigation callback"""
+        if data.startswith(PAGE_PREFIX) and data[len(PAGE_PREFIX):].isdigit():
+            return int(data[len(PAGE_PREFIX):])
+        return None
+
+    async def search(self, prefix: str, limit: int = SEARCH_LIMIT) -> List[Member]:
+        """Members with a name word starting with prefix, in name order"""
+        await self._ensure_fresh()
+        prefix = prefix.strip().casefold()
+        if not prefix:
+            return []
+        found = set()
+        start = bisect.bisect_left(self._words, (prefix,))
+        for word, index in self._words[start:]:
+            if not word.startswith(prefix):
+                break
+            found.add(index)
+        return [self._members[index] for index in sorted(found)[:limit]]
+
+    @staticmethod
+    def keyboard_for(members: List[Member]) -> InlineKeyboardMarkup:
+        """Assignee keyboard for search results"""
+        return InlineKeyboardMarkup([*_member_buttons(members), SKIP_BUTTON])
+
+    def get(self, member_id: str) -> Optional[Member]:
+        return self._by_id.get(member_id)
+
+def _member_buttons(members: List[Member]) -> List[List[InlineKeyboardButton]]:
+    return [
+        [InlineKeyboardButton(member.name, callback_data=f"{ASSIGN_PREFIX}{member.id}")]
+        for member in members
+    ]
+
+def _page_keyboard(members: List[Member], page: int, page_count: int) -> InlineKeyboardMarkup:
+    rows = _member_buttons(members)
+    nav = []
+    if page > 0:
+        nav.append(InlineKeyboardButton("◀️", callback_data=f"{PAGE_PREFIX}{page - 1}"))
+    if page + 1 < page_count:
+        nav.append(InlineKeyboardButton("▶️", callback_data=f"{PAGE_PREFIX}{page + 1}"))
+    if nav:
+        rows.append(nav)
+    return InlineKeyboardMarkup([*rows, SKIP_BUTTON])
+
+def _log_refresh_error(task: asyncio.Task):
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning(f"Background member refresh failed: {task.exception()}")
@@ -0,0 +1,240 @@
+"""Outbound Telegram queue: priorities, flood limits, edit merging"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+from datetime import timedelta
+from typing import TYPE_CHECKING, Any, Callable, Coroutine, Dict, Hashable, List, Optional, Tuple, Union
+
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+from src.utils.rate_limiter import RateLimiter
+from src.utils.tracing import tracer
+
+if TYPE_CHECKING:
+    from src.services.state_backend import StateBackend
+
+logger = logging.getLogger(__name__)
+
+# Приоритеты: меньше — раньше
+INTERACTIVE = 0
+NOTIFICATION = 10
+
+GLOBAL_RATE = 30  # сообщений в секунду на бота
+CHAT_RATE = 1  # сообщений в секунду в личный чат
+GROUP_RATE = 20  # сообщений в минуту в группу
+MAX_RETRIES = 3
+
+# Повторные правки одного сообщения можно схлопнуть в последнюю
+MERGEABLE_ENDPOINTS = ('editMessageText', 'editMessageReplyMarkup', 'editMessageCaption')
+
+JSONResult = Union[bool, Dict[str, Any], List[Dict[str, Any]]]
+
+class _PendingEdit:
+    __slots__ = ('args', 'kwargs', 'future')
+
+    def __init__(self, args: Any, kwargs: Dict[str, Any], future: asyncio.Future):
+        self.args = args
+        self.kwargs = kwargs
+        self.future = future
+
+class Outbox(BaseRateLimiter[Dict[str, Any]]):
+    """Rate limiter for all Bot API calls of the application
+
+    Pass rate_limit_args={'priority': NOTIFICATION} to send behind
+    interactive replies.
+    """
+
+    def __init__(
+        self,
+        global_rate: int = GLOBAL_RATE,
+        chat_rate: int = CHAT_RATE,
+        group_rate: int = GROUP_RATE,
+        max_retries: int = MAX_RETRIES,
+        workers: int = 1,
+        backend: Optional["StateBackend"] = None
+    ):
+        """Initialize outbound limits
+
+        Args:
+            global_rate: Messages per second for the whole bot
+            chat_rate: Messages per second to a private chat
+            group_rate: Messages per minute to a group
+            max_retries: Resends after RetryAfter before giving up
+            workers: Processes sending with the same token; each one gets an
+                equal share of the global rate
+            backend: Shared state backend; RetryAfter blocks of a chat reach
+                every worker through it
+        """
+        self.max_retries = max_retries
+        # Доля общего лимита считается локально: без синхронизации процессов на каждом сообщении
+        self.global_limiter = RateLimiter(max_requests=max(1, global_rate // workers), time_window=1)
+        # Темп чата считается локально: чат обслуживает свой процесс. Но уведомления
+        # шлёт и воркер задач, поэтому блокировки RetryAfter общие
+        self.chat_limiter = RateLimiter(
+            max_requests=chat_rate, time_window=1, backend=backend, namespace='outbox:chat'
+        )
+        self.group_limiter = RateLimiter(
+            max_requests=group_rate, time_window=60, burst=1, backend=backend, namespace='outbox:group'
+        )
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._counter = itertools.count()
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._chats: Dict[Hashable, Tuple[asyncio.Lock, int]] = {}
+        self._edits: Dict[Tuple, _PendingEdit] = {}
+
+        self.sent = 0
+        self.merged = 0
+        self.retried = 0
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            await asyncio.gather(self._dispatcher, return_exceptions=True)
+            self._dispatcher = None
+
+    async def process_request(
+        self,
+        callback: Callable[..., Coroutine[Any, Any, JSONResult]],
+        args: Any,
+        kwargs: Dict[str, Any],
+        endpoint: str,
+        data: Dict[str, Any],
+        rate_limit_args: Optional[Dict[str, Any]]
+    ) -> JSONResult:
+        with tracer.span(f"telegram.{endpoint}"):
+            return await self._process(callback, args, kwargs, endpoint, data, rate_limit_args)
+
+    async def _process(
+        self,
+        callback: Callable[..., Coroutine[Any, Any, JSONResult]],
+        args: Any,
+        kwargs: Dict[str, Any],
+        endpoint: str,
+        data: Dict[str, Any],
+        rate_limit_args: Optional[Dict[str, Any]]
+    ) -> JSONResult:
+        chat_id = data.get('chat_id')
+        if chat_id is None:
+            # answerCallbackQuery, setWebhook и т.п. не ограничиваются по чатам
+            return await callback(*args, **kwargs)
+
+        priority = (rate_limit_args or {}).get('priority', INTERACTIVE)
+        edit_key = None
+        if endpoint in MERGEABLE_ENDPOINTS and 'message_id' in data:
+            edit_key = (endpoint, chat_id, data['message_id'])
+            pending = self._edits.get(edit_key)
+            if pending is not None:
+                # Ещё не отправленная правка получает новое содержимое,
+                # оба вызова разделяют один запрос к Telegram
+                pending.args, pending.kwargs = args, kwargs
+                self.merged += 1
+                return await asyncio.shield(pending.future)
+
+        pending = _PendingEdit(args, kwargs, asyncio.get_running_loop().create_future())
+        if edit_key is not None:
+            self._edits[edit_key] = pending
+        try:
+            result = await self._send(chat_id, priority, callback, pending, edit_key)
+        except asyncio.CancelledError:
+            pending.future.cancel()
+            raise
+        except Exception as e:
+            pending.future.set_exception(e)
+            # Исключение уже получил этот вызов, объединённые правки — через future
+            pending.future.exception()
+            raise
+        pending.future.set_result(result)
+        return result
+
+    async def _send(
+        self,
+        chat_id: Union[int, str],
+        priority: int,
+        callback: Callable[..., Coroutine[Any, Any, JSONResult]],
+        pending: _PendingEdit,
+        edit_key: Optional[Tuple]
+    ) -> JSONResult:
+        """Send in per-chat order, pacing the chat and the whole bot"""
+        chat_limiter = self.group_limiter if str(chat_id).startswith('-') else self.chat_limiter
+        lock = self._lock_chat(chat_id)
+        try:
+            async with lock:
+                for attempt in range(self.max_retries + 1):
+                    with tracer.span('telegram.rate_limit_wait'):
+                        await chat_limiter.sync_blocks()
+                        await chat_limiter.acquire(chat_id)
+                        await self._acquire_global(priority)
+                    if edit_key is not None and self._edits.get(edit_key) is pending:
+                        # Дальнейшие правки пойдут отдельным запросом
+                        del self._edits[edit_key]
+                    try:
+                        result = await callback(*pending.args, **pending.kwargs)
+                        self.sent += 1
+                        return result
+                    except RetryAfter as e:
+                        if attempt >= self.max_retries:
+                            raise
+                        delay = _seconds(e.retry_after)
+                        logger.warning(f"Flood limit for chat {chat_id}, retrying in {delay}s")
+                        self.retried += 1
+                        await chat_limiter.block_shared(chat_id, delay)
+        finally:
+            self._unlock_chat(chat_id)
+
+    def _lock_chat(self, chat_id: Hashable) -> asyncio.Lock:
+        lock, users = self._chats.get(chat_id, (None, 0))
+        if lock is None:
+            lock = asyncio.Lock()
+        self._chats[chat_id] = (lock, users + 1)
+        return lock
+
+    def _unlock_chat(self, chat_id: Hashable):
+        lock, users = self._chats[chat_id]
+        if users <= 1:
+            del self._chats[chat_id]
+        else:
+            self._chats[chat_id] = (lock, users - 1)
+
+    async def _acquire_global(self, priority: int):
+        """Wait for a global slot, higher priority first"""
+        if not self._waiters and self.global_limiter.can_make_request():
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._counter), future))
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        await future
+
+    async def _dispatch(self):
+        while self._waiters:
+            if self._waiters[0][2].cancelled():
+                heapq.heappop(self._waiters)
+                continue
+            if not self.global_limiter.can_make_request():
+                await asyncio.sleep(max(self.global_limiter.delay(), 0.01))
+                continue
+            heapq.heappop(self._waiters)[2].set_result(None)
+
+    @property
+    def pending(self) -> int:
+        """Requests waiting for a global slot"""
+        return len(self._waiters)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'sent': self.sent,
+            'merged': self.merged,
+            'retried': self.retried,
+            'pending': self.pending
+        }
+
+def _seconds(retry_after: Union[int, float, timedelta]) -> float:
+    if isinstance(retry_after, timedelta):
+        return retry_after.total_seconds()
+    return float(retry_after)
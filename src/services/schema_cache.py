@@ -0,0 +1,108 @@
+"""On-disk cache of the Notion task database schema"""
+
+import json
+import logging
+import os
+import tempfile
+from typing import Any, Dict, List, Optional
+
+from src.constants import TASK_PRIORITIES, TASK_PROPERTIES, TASK_STATUSES
+
+logger = logging.getLogger(__name__)
+
+REQUIRED_PROPERTIES = {TASK_PROPERTIES["TITLE"]: 'title', TASK_PROPERTIES["STATUS"]: 'status'}
+
+def parse_schema(database: Dict[str, Any]) -> Dict[str, Any]:
+    """Keep property ids, types and option names of a databases.retrieve response"""
+    properties = {}
+    for name, prop in database.get('properties', {}).items():
+        kind = prop.get('type')
+        options = (prop.get(kind) or {}).get('options') if kind in ('status', 'select', 'multi_select') else None
+        properties[name] = {
+            'id': prop.get('id'),
+            'type': kind,
+            'options': [option['name'] for option in options] if options else []
+        }
+    return {
+        'database_id': database.get('id'),
+        'last_edited_time': database.get('last_edited_time'),
+        'properties': properties
+    }
+
+def validate_schema(schema: Dict[str, Any]):
+    """Raise ValueError if required properties are missing, warn on unknown options"""
+    properties = schema['properties']
+    for name, kind in REQUIRED_PROPERTIES.items():
+        if name not in properties:
+            raise ValueError(f"Missing required property: {name}")
+        if properties[name]['type'] != kind:
+            raise ValueError(f"Invalid type for {name}. Expected {kind}")
+
+    for name, expected in (
+        (TASK_PROPERTIES["STATUS"], TASK_STATUSES.values()),
+        (TASK_PROPERTIES["PRIORITY"], TASK_PRIORITIES.values())
+    ):
+        options = properties.get(name, {}).get('options')
+        missing = [option for option in expected if options and option not in options]
+        if missing:
+            logger.warning(f"Options of {name} not found in Notion: {', '.join(missing)}")
+
+class SchemaCache:
+    def __init__(self, path: Optional[str] = None):
+        """Database schema persisted between restarts
+
+        Args:
+            path: JSON file; without it the schema lives only in memory
+        """
+        self.path = path
+        self.schema: Optional[Dict[str, Any]] = None
+
+    def load(self, database_id: str) -> bool:
+        """Read cached schema, False if there is none for this database"""
+        if not self.path:
+            return False
+        try:
+            with open(self.path, 'r') as f:
+                schema = json.load(f)
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable schema cache: {e}")
+            return False
+        if (schema.get('database_id') or '').replace('-', '') != database_id.replace('-', ''):
+            return False
+        self.schema = schema
+        return True
+
+    def update(self, database: Dict[str, Any]) -> bool:
+        """Apply a databases.retrieve response, True if the schema changed"""
+        schema = parse_schema(database)
+        if self.schema is not None and self.schema.get('last_edited_time') == schema['last_edited_time']:
+            return False
+        validate_schema(schema)
+        self.schema = schema
+        self._save()
+        return True
+
+    def _save(self):
+        if not self.path:
+            return
+        # Атомарная замена: файл читают и другие процессы бота
+        directory = os.path.dirname(os.path.abspath(self.path))
+        with tempfile.NamedTemporaryFile('w', dir=directory, delete=False, suffix='.tmp') as f:
+            json.dump(self.schema, f, ensure_ascii=False, indent=2)
+        os.replace(f.name, self.path)
+
+    def property_id(self, name: str) -> str:
+        """Stable property id for payloads, the name until the schema is known"""
+        if self.schema is not None:
+            prop = self.schema['properties'].get(name)
+            if prop and prop.get('id'):
+                return prop['id']
+        return name
+
+    def options(self, name: str) -> List[str]:
+        """Option names of a status/select property"""
+        if self.schema is None:
+            return []
+        return self.schema['properties'].get(name, {}).get('options', [])
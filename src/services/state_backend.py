@@ -0,0 +1,217 @@
+"""Pluggable shared state backends (rate limits, caches, conversation state)"""
+
+import json
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+
+TTL = Optional[Union[float, Callable[[Any], float]]]
+
+class StateBackend(ABC):
+    """Namespaced key-value store with optional TTL
+
+    Values must be JSON serializable, so any backend can be shared
+    between worker processes.
+    """
+
+    # True, если состояние видят другие процессы (иначе воркеры держат его сами)
+    shared: bool = False
+
+    @abstractmethod
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        """Get value or None if missing or expired"""
+
+    @abstractmethod
+    def set(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None):
+        """Store value, expiring after ttl seconds if given"""
+
+    @abstractmethod
+    def delete(self, namespace: str, key: str):
+        """Remove value"""
+
+    @abstractmethod
+    def items(self, namespace: str) -> Dict[str, Any]:
+        """All live values of a namespace"""
+
+    @abstractmethod
+    def clear(self, namespace: str):
+        """Remove all values of a namespace"""
+
+    @abstractmethod
+    def update(
+        self,
+        namespace: str,
+        key: str,
+        fn: Callable[[Optional[Any]], Any],
+        ttl: TTL = None
+    ) -> Any:
+        """Atomically replace value with fn(current) and return the new value
+
+        ttl may be a function of the new value.
+        """
+
+    @abstractmethod
+    def purge_expired(self, limit: int = 100) -> int:
+        """Remove up to limit expired values, returns how many were removed"""
+
+    def close(self):
+        """Release resources"""
+
+class MemoryStateBackend(StateBackend):
+    """Process-local backend, the default for a single worker"""
+
+    shared = False
+
+    def __init__(self):
+        self._data: Dict[str, Dict[str, Tuple[Any, Optional[float]]]] = {}
+
+    def _live(self, namespace: str, key: str) -> Optional[Tuple[Any, Optional[float]]]:
+        entry = self._data.get(namespace, {}).get(key)
+        if entry is not None and entry[1] is not None and entry[1] <= time.time():
+            del self._data[namespace][key]
+            return None
+        return entry
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        entry = self._live(namespace, key)
+        return entry[0] if entry else None
+
+    def set(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None):
+        expires_at = time.time() + ttl if ttl is not None else None
+        self._data.setdefault(namespace, {})[key] = (value, expires_at)
+
+    def delete(self, namespace: str, key: str):
+        self._data.get(namespace, {}).pop(key, None)
+
+    def items(self, namespace: str) -> Dict[str, Any]:
+        now = time.time()
+        return {
+            key: value
+            for key, (value, expires_at) in self._data.get(namespace, {}).items()
+            if expires_at is None or expires_at > now
+        }
+
+    def clear(self, namespace: str):
+        self._data.pop(namespace, None)
+
+    def update(self, namespace, key, fn, ttl=None):
+        value = fn(self.get(namespace, key))
+        self.set(namespace, key, value, ttl(value) if callable(ttl) else ttl)
+        return value
+
+    def purge_expired(self, limit: int = 100) -> int:
+        now = time.time()
+        removed = 0
+        for entries in self._data.values():
+            for key, (_, expires_at) in list(entries.items()):
+                if removed >= limit:
+                    return removed
+                if expires_at is not None and expires_at <= now:
+                    del entries[key]
+                    removed += 1
+        return removed
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS state (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    expires_at REAL,
+    PRIMARY KEY (namespace, key)
+);
+CREATE INDEX IF NOT EXISTS idx_state_expires ON state(expires_at) WHERE expires_at IS NOT NULL;
+"""
+
+class SQLiteStateBackend(StateBackend):
+    """Backend shared by worker processes on one host through a WAL database"""
+
+    shared = True
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    def close(self):
+        self._conn.close()
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM state WHERE namespace = ? AND key = ? "
+                "AND (expires_at IS NULL OR expires_at > ?)",
+                (namespace, key, time.time())
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _write(self, namespace: str, key: str, value: Any, ttl: Optional[float]):
+        expires_at = time.time() + ttl if ttl is not None else None
+        self._conn.execute(
+            "INSERT INTO state (namespace, key, value, expires_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(namespace, key) DO UPDATE SET value=excluded.value, expires_at=excluded.expires_at",
+            (namespace, key, json.dumps(value, ensure_ascii=False), expires_at)
+        )
+
+    def set(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None):
+        with self._lock:
+            self._write(namespace, key, value, ttl)
+
+    def delete(self, namespace: str, key: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM state WHERE namespace = ? AND key = ?", (namespace, key))
+
+    def items(self, namespace: str) -> Dict[str, Any]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, value FROM state WHERE namespace = ? "
+                "AND (expires_at IS NULL OR expires_at > ?)",
+                (namespace, time.time())
+            ).fetchall()
+        return {key: json.loads(value) for key, value in rows}
+
+    def clear(self, namespace: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM state WHERE namespace = ?", (namespace,))
+
+    def update(self, namespace, key, fn, ttl=None):
+        with self._lock:
+            # BEGIN IMMEDIATE берёт блокировку записи сразу: другие процессы
+            # не смогут прочитать-изменить-записать тот же ключ одновременно
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT value FROM state WHERE namespace = ? AND key = ? "
+                    "AND (expires_at IS NULL OR expires_at > ?)",
+                    (namespace, key, time.time())
+                ).fetchone()
+                value = fn(json.loads(row[0]) if row else None)
+                self._write(namespace, key, value, ttl(value) if callable(ttl) else ttl)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return value
+
+    def purge_expired(self, limit: int = 100) -> int:
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM state WHERE rowid IN ("
+                "SELECT rowid FROM state WHERE expires_at IS NOT NULL AND expires_at <= ? LIMIT ?)",
+                (time.time(), limit)
+            )
+        return cursor.rowcount
+
+def create_state_backend(kind: str, db_path: Optional[str] = None) -> StateBackend:
+    """Build backend by name: 'memory' or 'sqlite'"""
+    if kind == 'memory':
+        return MemoryStateBackend()
+    if kind == 'sqlite':
+        if not db_path:
+            raise ValueError("db_path is required for the sqlite state backend")
+        return SQLiteStateBackend(db_path)
+    raise ValueError(f"Unknown state backend: {kind}")
@@ -0,0 +1,119 @@
+"""PTB persistence on top of a state backend"""
+
+import asyncio
+import json
+from copy import deepcopy
+from typing import Any, Dict, Optional, Tuple
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+from src.services.state_backend import StateBackend
+
+UPDATE_INTERVAL = 5  # секунд между сбросами на диск
+
+class StatePersistence(BasePersistence):
+    """Keep user, chat, bot data and conversation states in a StateBackend
+
+    Values must be JSON serializable. Backend I/O runs in a thread, off
+    the event loop. Chat data and conversations belong to the one worker
+    that handles the chat. User and bot data may be changed by several
+    workers: they are reloaded before each update unless they hold changes
+    not flushed yet, and concurrent writes are last-writer-wins.
+    """
+
+    def __init__(self, backend: StateBackend, update_interval: float = UPDATE_INTERVAL):
+        super().__init__(
+            store_data=PersistenceInput(callback_data=False),
+            update_interval=update_interval
+        )
+        self.backend = backend
+        # Последнее сохранённое состояние user/bot data: отличие от него
+        # означает локальные изменения, которые refresh не должен затереть
+        self._synced: Dict[Tuple[str, str], Dict[Any, Any]] = {}
+
+    async def _call(self, fn, *args):
+        return await asyncio.to_thread(fn, *args)
+
+    async def _load(self, namespace: str) -> Dict[int, Any]:
+        items = await self._call(self.backend.items, namespace)
+        return {int(key): value for key, value in items.items()}
+
+    async def get_user_data(self) -> Dict[int, Dict[Any, Any]]:
+        data = await self._load('user_data')
+        for user_id, value in data.items():
+            self._synced[('user_data', str(user_id))] = deepcopy(value)
+        return data
+
+    async def get_chat_data(self) -> Dict[int, Dict[Any, Any]]:
+        return await self._load('chat_data')
+
+    async def get_bot_data(self) -> Dict[Any, Any]:
+        data = await self._call(self.backend.get, 'bot_data', 'bot_data') or {}
+        self._synced[('bot_data', 'bot_data')] = deepcopy(data)
+        return data
+
+    async def get_callback_data(self) -> Optional[Any]:
+        return None
+
+    async def get_conversations(self, name: str) -> Dict[Tuple[int, ...], object]:
+        namespace = f'conversation:{name}'
+        items = await self._call(self.backend.items, namespace)
+        return {tuple(json.loads(key)): state for key, state in items.items()}
+
+    async def update_conversation(self, name: str, key: Tuple[int, ...], new_state: Optional[object]):
+        namespace = f'conversation:{name}'
+        if new_state is None:
+            await self._call(self.backend.delete, namespace, json.dumps(list(key)))
+        else:
+            await self._call(self.backend.set, namespace, json.dumps(list(key)), new_state)
+
+    async def update_user_data(self, user_id: int, data: Dict[Any, Any]):
+        await self._save('user_data', str(user_id), data)
+
+    async def update_chat_data(self, chat_id: int, data: Dict[Any, Any]):
+        await self._call(self.backend.set, 'chat_data', str(chat_id), deepcopy(data))
+
+    async def update_bot_data(self, data: Dict[Any, Any]):
+        await self._save('bot_data', 'bot_data', data)
+
+    async def update_callback_data(self, data: Any):
+        pass
+
+    async def drop_chat_data(self, chat_id: int):
+        await self._call(self.backend.delete, 'chat_data', str(chat_id))
+
+    async def drop_user_data(self, user_id: int):
+        self._synced.pop(('user_data', str(user_id)), None)
+        await self._call(self.backend.delete, 'user_data', str(user_id))
+
+    async def _save(self, namespace: str, key: str, data: Dict[Any, Any]):
+        data = deepcopy(data)
+        self._synced[(namespace, key)] = data
+        await self._call(self.backend.set, namespace, key, data)
+
+    async def _refresh(self, namespace: str, key: str, current: Dict[Any, Any]):
+        """Replace current with the stored value if it has no unsaved changes"""
+        if current != self._synced.get((namespace, key), {}):
+            return
+        stored = await self._call(self.backend.get, namespace, key)
+        # Изменения могли появиться, пока шло чтение
+        if stored is None or current != self._synced.get((namespace, key), {}):
+            return
+        self._synced[(namespace, key)] = deepcopy(stored)
+        # PTB держит ссылку на словарь, поэтому он обновляется на месте
+        current.clear()
+        current.update(stored)
+
+    async def refresh_user_data(self, user_id: int, user_data: Dict[Any, Any]):
+        """Pick up changes made by the worker that handled another chat of the user"""
+        await self._refresh('user_data', str(user_id), user_data)
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: Dict[Any, Any]):
+        # Чат всегда обрабатывает один воркер, его данные не устаревают
+        pass
+
+    async def refresh_bot_data(self, bot_data: Dict[Any, Any]):
+        await self._refresh('bot_data', 'bot_data', bot_data)
+
+    async def flush(self):
+        pass
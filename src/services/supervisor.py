@@ -0,0 +1,200 @@
+"""Multi-process mode: supervisor sharding updates between bot workers"""
+
+import asyncio
+import logging
+import multiprocessing
+import queue
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from telegram import Update
+
+logger = logging.getLogger(__name__)
+
+HEALTH_INTERVAL = 5  # секунд между heartbeat воркера
+HEALTH_TIMEOUT = 30  # без heartbeat дольше — воркер считается зависшим
+MONITOR_INTERVAL = 1
+RESTART_BACKOFF_CAP = 30
+
+def jump_hash(key: int, buckets: int) -> int:
+    """Jump consistent hash (Lamping & Veach): key -> bucket in [0, buckets)"""
+    key &= 0xFFFFFFFFFFFFFFFF
+    b, j = -1, 0
+    while j < buckets:
+        b = j
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        j = int((b + 1) * (float(1 << 31) / float((key >> 33) + 1)))
+    return b
+
+def shard_key(update: Update) -> int:
+    """Chat id of the update, so a chat is always served by one worker"""
+    if update.effective_chat is not None:
+        return update.effective_chat.id
+    if update.effective_user is not None:
+        return update.effective_user.id
+    return update.update_id
+
+class _Worker:
+    __slots__ = ('index', 'updates', 'process', 'restarts', 'start_after', 'health')
+
+    def __init__(self, index: int, updates: multiprocessing.Queue):
+        self.index = index
+        self.updates = updates
+        self.process: Optional[multiprocessing.Process] = None
+        self.restarts = 0
+        self.start_after = 0.0
+        self.health: Dict[str, Any] = {}
+
+class WorkerSupervisor:
+    def __init__(
+        self,
+        target: Callable[[int, Any, Any], None],
+        workers: int,
+        queue_size: int = 1000
+    ):
+        """Start, watch and restart worker processes
+
+        Args:
+            target: Worker entry point called as target(index, updates, health)
+            workers: Number of worker processes
+            queue_size: Updates buffered per worker
+        """
+        self.target = target
+        self._ctx = multiprocessing.get_context('spawn')
+        self._health = self._ctx.Queue()
+        self._workers: List[_Worker] = [
+            _Worker(index, self._ctx.Queue(maxsize=queue_size)) for index in range(workers)
+        ]
+        self._monitor: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start all workers and the health monitor"""
+        for worker in self._workers:
+            self._spawn(worker)
+        self._monitor = asyncio.create_task(self._watch())
+
+    async def stop(self, timeout: float = 10):
+        """Ask workers to shut down, kill those that do not exit in time"""
+        if self._monitor is not None:
+            self._monitor.cancel()
+            await asyncio.gather(self._monitor, return_exceptions=True)
+        for worker in self._workers:
+            if worker.process is not None and worker.process.is_alive():
+                worker.process.terminate()
+        deadline = time.monotonic() + timeout
+        for worker in self._workers:
+            if worker.process is None:
+                continue
+            await asyncio.to_thread(worker.process.join, max(0.0, deadline - time.monotonic()))
+            if worker.process.is_alive():
+                logger.warning(f"Worker {worker.index} did not stop, killing it")
+                worker.process.kill()
+
+    def _spawn(self, worker: _Worker):
+        worker.process = self._ctx.Process(
+            target=self.target,
+            args=(worker.index, worker.updates, self._health),
+            name=f"bot-worker-{worker.index}",
+            daemon=False
+        )
+        worker.process.start()
+        worker.health = {'started': time.time()}
+        logger.info(f"Worker {worker.index} started (pid {worker.process.pid})")
+
+    def submit(self, update: Update, data: Optional[dict] = None) -> bool:
+        """Route update to its chat's worker, False when that worker is backlogged
+
+        data is the raw update if the caller already has it.
+        """
+        worker = self._workers[jump_hash(shard_key(update), len(self._workers))]
+        try:
+            worker.updates.put_nowait(data if data is not None else update.to_dict())
+            return True
+        except queue.Full:
+            return False
+
+    async def put(self, update: Update):
+        """Route update, waiting while the worker is backlogged"""
+        data = update.to_dict()
+        while not self.submit(update, data):
+            await asyncio.sleep(0.05)
+
+    async def _watch(self):
+        while True:
+            self._collect_health()
+            now = time.time()
+            for worker in self._workers:
+                process = worker.process
+                if process.is_alive():
+                    last_seen = worker.health.get('time', worker.health['started'])
+                    if now - last_seen < HEALTH_TIMEOUT:
+                        continue
+                    logger.error(f"Worker {worker.index} missed heartbeats, restarting")
+                    process.kill()
+                    await asyncio.to_thread(process.join)
+                elif not worker.start_after:
+                    logger.error(f"Worker {worker.index} exited with code {process.exitcode}")
+
+                # Воркер в цикле падений перезапускается с растущей паузой
+                if not worker.start_after:
+                    worker.start_after = now + min(2 ** worker.restarts, RESTART_BACKOFF_CAP)
+                    worker.restarts += 1
+                elif now >= worker.start_after:
+                    worker.start_after = 0.0
+                    self._spawn(worker)
+            await asyncio.sleep(MONITOR_INTERVAL)
+
+    def _collect_health(self):
+        while True:
+            try:
+                report = self._health.get_nowait()
+            except queue.Empty:
+                return
+            worker = self._workers[report['worker']]
+            worker.health.update(report)
+            # Стабильный heartbeat сбрасывает счётчик падений
+            if report['time'] - worker.health['started'] > HEALTH_TIMEOUT:
+                worker.restarts = 0
+
+    def status(self) -> List[Dict[str, Any]]:
+        """Health of each worker"""
+        return [
+            {
+                'worker': worker.index,
+                'pid': worker.process.pid if worker.process else None,
+                'alive': bool(worker.process and worker.process.is_alive()),
+                'restarts': worker.restarts,
+                'queued': _qsize(worker.updates),
+                **worker.health
+            }
+            for worker in self._workers
+        ]
+
+def _qsize(updates: multiprocessing.Queue) -> Optional[int]:
+    try:
+        return updates.qsize()
+    except NotImplementedError:  # macOS
+        return None
+
+async def pump_updates(updates: multiprocessing.Queue, put: Callable[[dict], Any]):
+    """Worker side: move updates from the supervisor queue into the bot"""
+    while True:
+        # Короткий таймаут, чтобы поток executor'а не держал завершение процесса
+        data = await asyncio.to_thread(_get, updates, 1.0)
+        if data is not None:
+            await put(data)
+
+def _get(updates: multiprocessing.Queue, timeout: float) -> Optional[dict]:
+    try:
+        return updates.get(timeout=timeout)
+    except queue.Empty:
+        return None
+
+async def report_health(index: int, health: multiprocessing.Queue, stats: Callable[[], Dict[str, Any]]):
+    """Worker side: send heartbeats with a few load counters
+
+    A blocked event loop stops heartbeats, so the supervisor restarts the worker.
+    """
+    while True:
+        health.put({'worker': index, 'time': time.time(), **stats()})
+        await asyncio.sleep(HEALTH_INTERVAL)
@@ -0,0 +1,110 @@
+"""Background synchronization of the local task mirror"""
+
+import logging
+import time
+from typing import TYPE_CHECKING, List, Optional
+
+from src.models.task import Task
+from src.notion_service import NotionService
+from src.services.change_notifier import ChangeNotifier, TaskChange, diff_tasks
+from src.services.task_store import TaskStore
+
+if TYPE_CHECKING:
+    from src.services.admission import AdmissionController
+
+logger = logging.getLogger(__name__)
+
+WATERMARK_KEY = 'last_edited_watermark'
+BATCH_SIZE = 100
+
+class TaskSyncService:
+    def __init__(
+        self,
+        notion: NotionService,
+        store: TaskStore,
+        notifier: Optional[ChangeNotifier] = None,
+        admission: Optional["AdmissionController"] = None
+    ):
+        self.notion = notion
+        self.store = store
+        self.notifier = notifier
+        self.admission = admission
+        self.notion.sync_watermark = store.get_state(WATERMARK_KEY)
+
+    def _store_batch(self, batch: List[Task], changes: Optional[List[TaskChange]]) -> int:
+        """Upsert tasks, collecting changes against the mirrored snapshot first"""
+        if changes is not None:
+            changes.extend(diff_tasks(self.store.get_many([task.id for task in batch]), batch))
+        return self.store.upsert_tasks(batch)
+
+    async def _notify(self, changes: Optional[List[TaskChange]]):
+        # Пустой проход тоже отправляет изменения, отложенные под нагрузкой
+        if changes is not None and (changes or self.notifier.deferred):
+            try:
+                await self.notifier.notify(changes)
+            except Exception as e:
+                logger.error(f"Change notification failed: {e}")
+
+    async def sync(self):
+        """Delta sync: fetch tasks edited since the stored watermark"""
+        if self.notion.sync_watermark is None:
+            await self.full_sync()
+            return
+
+        try:
+            synced = 0
+            batch: List[Task] = []
+            # Один общий запрос изменений вместо опроса Notion каждым пользователем
+            changes = [] if self.notifier is not None else None
+            async for task in self.notion.get_changed_tasks():
+                batch.append(task)
+                if len(batch) >= BATCH_SIZE:
+                    synced += self._store_batch(batch, changes)
+                    batch = []
+            synced += self._store_batch(batch, changes)
+            self._save_watermark()
+            if synced:
+                logger.info(f"Delta sync updated {synced} tasks")
+            await self._notify(changes)
+        except Exception as e:
+            logger.error(f"Delta sync failed: {e}")
+
+    async def full_sync(self):
+        """Full sync: reload all tasks and drop the ones removed in Notion"""
+        # Под нагрузкой пропускаем плановую перезагрузку; первичное заполнение
+        # зеркала нужно всегда, иначе списки пойдут напрямую в Notion
+        if self.admission is not None and not self.admission.allow_bulk() and self.store.populated:
+            self.admission.shed('full_sync')
+            logger.warning("Full sync skipped: bot is under load")
+            return
+        try:
+            started_at = int(time.time())
+            synced = 0
+            batch: List[Task] = []
+            watermark = None
+            # Первичная загрузка зеркала — не повод уведомлять обо всех задачах
+            changes = [] if self.notifier is not None and self.store.populated else None
+            # Страницы из кэша могут быть устаревшими: delete_stale сохранил бы удалённые задачи
+            async for task in self.notion.get_tasks(use_cache=False):
+                batch.append(task)
+                edited = task.last_edited
+                if edited and (watermark is None or edited > watermark):
+                    watermark = edited
+                if len(batch) >= BATCH_SIZE:
+                    synced += self._store_batch(batch, changes)
+                    batch = []
+            synced += self._store_batch(batch, changes)
+            removed = self.store.delete_stale(started_at)
+
+            if watermark and (self.notion.sync_watermark is None or watermark > self.notion.sync_watermark):
+                self.notion.sync_watermark = watermark
+            self._save_watermark()
+            logger.info(f"Full sync loaded {synced} tasks, removed {removed}")
+            await self._notify(changes)
+        except Exception as e:
+            logger.error(f"Full sync failed: {e}")
+
+    def _save_watermark(self):
+        """Persist watermark so restarts continue with a delta sync"""
+        if self.notion.sync_watermark:
+            self.store.set_state(WATERMARK_KEY, self.notion.sync_watermark)
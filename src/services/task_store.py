@@ -0,0 +1,150 @@
+"""Local SQLite mirror of the Notion task database"""
+
+import logging
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+from src.models.task import COLUMNS, Task
+
+logger = logging.getLogger(__name__)
+
+POPULATED_CHECK_INTERVAL = 5.0  # секунд между проверками пустого зеркала
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    status TEXT,
+    assignee TEXT,
+    assignee_name TEXT,
+    due TEXT,
+    priority TEXT,
+    url TEXT,
+    last_edited TEXT NOT NULL,
+    synced_at INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks(status);
+CREATE INDEX IF NOT EXISTS idx_tasks_assignee ON tasks(assignee);
+CREATE INDEX IF NOT EXISTS idx_tasks_due ON tasks(due);
+CREATE INDEX IF NOT EXISTS idx_tasks_last_edited ON tasks(last_edited);
+CREATE TABLE IF NOT EXISTS sync_state (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+class TaskStore:
+    def __init__(self, db_path: str):
+        """Open the mirror database
+
+        Reads may run in worker threads (asyncio.to_thread), so every
+        statement holds the connection lock.
+        """
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._populated = False
+        self._populated_checked_at = float('-inf')
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    def close(self):
+        """Close database connection"""
+        self._conn.close()
+
+    def upsert_tasks(self, tasks: Iterable[Task]) -> int:
+        """Insert or update tasks in one transaction"""
+        synced_at = int(time.time())
+        rows = [(*task.as_tuple(), synced_at) for task in tasks]
+        if not rows:
+            return 0
+        with self._lock, self._conn:
+            self._conn.executemany(
+                f"INSERT INTO tasks ({', '.join(COLUMNS)}, synced_at) "
+                f"VALUES ({', '.join('?' * (len(COLUMNS) + 1))}) "
+                f"ON CONFLICT(id) DO UPDATE SET "
+                + ", ".join(f"{column}=excluded.{column}" for column in COLUMNS[1:])
+                + ", synced_at=excluded.synced_at",
+                rows
+            )
+        self._populated = True
+        return len(rows)
+
+    def delete_stale(self, started_at: int) -> int:
+        """Remove tasks not seen since a full sync started"""
+        with self._lock, self._conn:
+            cursor = self._conn.execute("DELETE FROM tasks WHERE synced_at < ?", (started_at,))
+        return cursor.rowcount
+
+    def list_tasks(
+        self,
+        limit: int = 20,
+        offset: int = 0,
+        status: Optional[str] = None,
+        assignee: Optional[str] = None
+    ) -> List[Task]:
+        """Read tasks from the local index, most recently edited first"""
+        conditions, params = [], []
+        if status:
+            conditions.append("status = ?")
+            params.append(status)
+        if assignee:
+            conditions.append("assignee = ?")
+            params.append(assignee)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM tasks {where} ORDER BY last_edited DESC LIMIT ? OFFSET ?",
+                (*params, limit, offset)
+            ).fetchall()
+        return [Task.from_row(row) for row in rows]
+
+    def get_many(self, ids: List[str]) -> Dict[str, Task]:
+        """Mirrored tasks by id"""
+        if not ids:
+            return {}
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM tasks WHERE id IN ({', '.join('?' * len(ids))})",
+                ids
+            ).fetchall()
+        return {row['id']: Task.from_row(row) for row in rows}
+
+    def count(self) -> int:
+        """Number of mirrored tasks"""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM tasks").fetchone()[0]
+
+    @property
+    def populated(self) -> bool:
+        """Whether the mirror has been filled, without counting rows on every call
+
+        Once true it stays true. While the mirror is empty the table is
+        checked at most every POPULATED_CHECK_INTERVAL seconds, so another
+        process filling the shared database is noticed.
+        """
+        if not self._populated and time.monotonic() - self._populated_checked_at >= POPULATED_CHECK_INTERVAL:
+            self._populated_checked_at = time.monotonic()
+            with self._lock:
+                self._populated = self._conn.execute("SELECT 1 FROM tasks LIMIT 1").fetchone() is not None
+        return self._populated
+
+    def get_state(self, key: str) -> Optional[str]:
+        """Read sync state value"""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM sync_state WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_state(self, key: str, value: str):
+        """Persist sync state value"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO sync_state (key, value) VALUES (?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value=excluded.value",
+                (key, value)
+            )
@@ -0,0 +1,219 @@
+"""Durable write-behind queue for Notion writes"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import sqlite3
+import time
+from typing import Dict, List, Optional, Set
+
+from src.models.task import Task
+from src.notion_service import NotionService
+from src.services.task_store import TaskStore
+from src.utils.error_handlers import backoff_delay
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pending_writes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    dedup_key TEXT UNIQUE,
+    user_id INTEGER NOT NULL,
+    operation TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL DEFAULT 0,
+    notion_id TEXT,
+    error TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_pending_writes_due ON pending_writes(status, next_attempt);
+"""
+
+BATCH_SIZE = 10
+MAX_ATTEMPTS = 8
+IDLE_TIMEOUT = 30.0  # seconds
+# Записи других воркеров не будят очередь воркера 0, поэтому она опрашивает базу
+SHARED_POLL_INTERVAL = 1.0  # seconds
+
+class WriteQueue:
+    def __init__(
+        self,
+        db_path: str,
+        notion: NotionService,
+        task_store: Optional[TaskStore] = None,
+        idle_timeout: float = IDLE_TIMEOUT
+    ):
+        """Open the queue
+
+        Args:
+            db_path: SQLite database shared with TaskStore
+            notion: Service the writes are delivered through
+            task_store: Local mirror updated with delivered tasks
+            idle_timeout: Longest sleep between checks for new writes; keep it
+                short when other processes enqueue into the same database
+        """
+        self.notion = notion
+        self.task_store = task_store
+        self.idle_timeout = idle_timeout
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+        self._wakeup = asyncio.Event()
+        # id недоставленных записей; ведёт только доставляющий процесс (run)
+        self._pending: Optional[Set[int]] = None
+
+    def close(self):
+        """Close database connection"""
+        self._conn.close()
+
+    def enqueue_task(
+        self,
+        user_id: int,
+        title: str,
+        status: str = "Not Started",
+        assignee_id: Optional[str] = None
+    ) -> int:
+        """Persist task creation and return its local ID
+
+        Repeated submissions of the same task by the same user collapse into
+        one entry while it is still pending.
+        """
+        if not title:
+            raise ValueError("Task title cannot be empty")
+
+        fields = {'title': title, 'status': status}
+        if assignee_id:
+            fields['assignee_id'] = assignee_id
+        payload = json.dumps(fields, ensure_ascii=False)
+        dedup_key = f"{user_id}:" + hashlib.sha1(payload.encode()).hexdigest()
+        with self._conn:
+            self._conn.execute(
+                "INSERT INTO pending_writes (dedup_key, user_id, operation, payload, created_at) "
+                "VALUES (?, ?, 'create_task', ?, ?) ON CONFLICT(dedup_key) DO NOTHING",
+                (dedup_key, user_id, payload, time.time())
+            )
+            local_id = self._conn.execute(
+                "SELECT id FROM pending_writes WHERE dedup_key = ?", (dedup_key,)
+            ).fetchone()[0]
+        if self._pending is not None:
+            self._pending.add(local_id)
+        self._wakeup.set()
+        return local_id
+
+    @property
+    def pending(self) -> int:
+        """Number of writes not yet delivered, known in the process running the queue"""
+        return len(self._pending) if self._pending is not None else 0
+
+    def _load_pending(self):
+        self._pending = {
+            row[0] for row in self._conn.execute("SELECT id FROM pending_writes WHERE status = 'pending'")
+        }
+
+    def _due_batch(self) -> List[sqlite3.Row]:
+        rows = self._conn.execute(
+            "SELECT * FROM pending_writes WHERE status = 'pending' AND next_attempt <= ? "
+            "ORDER BY id LIMIT ?",
+            (time.time(), BATCH_SIZE)
+        ).fetchall()
+        # Записи других воркеров становятся известны, когда подходит их очередь
+        self._pending.update(row['id'] for row in rows)
+        return rows
+
+    def _next_due_in(self) -> float:
+        row = self._conn.execute(
+            "SELECT MIN(next_attempt) FROM pending_writes WHERE status = 'pending'"
+        ).fetchone()
+        if row[0] is None:
+            return self.idle_timeout
+        return min(self.idle_timeout, max(0.0, row[0] - time.time()))
+
+    async def run(self):
+        """Drain the queue to Notion until cancelled"""
+        self._load_pending()
+        logger.info(f"Write queue started, {self.pending} pending writes")
+        while True:
+            try:
+                batch = self._due_batch()
+                if batch:
+                    # Скорость отправки ограничивает общий планировщик NotionService
+                    await asyncio.gather(*(self._deliver(row) for row in batch))
+                    continue
+
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self._next_due_in())
+                except asyncio.TimeoutError:
+                    pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Write queue error: {e}")
+                await asyncio.sleep(5)
+
+    async def _deliver(self, row: sqlite3.Row):
+        """Send one queued write to Notion"""
+        payload = json.loads(row['payload'])
+        attempts = row['attempts'] + 1
+        # Попытка фиксируется до отправки: после рестарта станет видно,
+        # что запись могла уже дойти до Notion
+        with self._conn:
+            self._conn.execute(
+                "UPDATE pending_writes SET attempts = ? WHERE id = ?", (attempts, row['id'])
+            )
+
+        try:
+            task = None
+            if row['attempts'] > 0:
+                task = await self.notion.find_task(payload['title'], since=row['created_at'])
+            if task is None:
+                task = Task.from_page(await self.notion.create_task(
+                    row['user_id'], payload['title'], payload['status'], payload.get('assignee_id')
+                ))
+        except Exception as e:
+            self._reschedule(row['id'], attempts, e)
+            return
+
+        with self._conn:
+            self._conn.execute(
+                "UPDATE pending_writes SET status = 'done', dedup_key = NULL, notion_id = ?, error = NULL "
+                "WHERE id = ?",
+                (task.id, row['id'])
+            )
+        self._pending.discard(row['id'])
+        if self.task_store is not None:
+            self.task_store.upsert_tasks([task])
+        logger.info(f"Delivered queued write #{row['id']} as {task.id}")
+
+    def _reschedule(self, write_id: int, attempts: int, error: Exception):
+        """Retry later with backoff or give up after MAX_ATTEMPTS"""
+        if attempts >= MAX_ATTEMPTS:
+            with self._conn:
+                self._conn.execute(
+                    "UPDATE pending_writes SET status = 'failed', dedup_key = NULL, error = ? WHERE id = ?",
+                    (str(error), write_id)
+                )
+            self._pending.discard(write_id)
+            logger.error(f"Queued write #{write_id} failed permanently: {error}")
+            return
+
+        delay = 1.0 + backoff_delay(attempts)
+        with self._conn:
+            self._conn.execute(
+                "UPDATE pending_writes SET next_attempt = ?, error = ? WHERE id = ?",
+                (time.time() + delay, str(error), write_id)
+            )
+        logger.warning(f"Queued write #{write_id} failed ({error}), retry in {delay:.1f}s")
+
+    def get_status(self, local_id: int) -> Optional[Dict]:
+        """Get delivery state of a queued write"""
+        row = self._conn.execute(
+            "SELECT id, status, attempts, notion_id, error FROM pending_writes WHERE id = ?",
+            (local_id,)
+        ).fetchone()
+        return dict(row) if row else None
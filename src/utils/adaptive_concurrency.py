@@ -0,0 +1,82 @@
+"""AIMD concurrency limiter for outgoing API calls"""
+
+import asyncio
+import logging
+from collections import deque
+from typing import Deque
+
+logger = logging.getLogger(__name__)
+
+class AdaptiveConcurrencyLimiter:
+    def __init__(
+        self,
+        initial: float = 3,
+        min_limit: float = 1,
+        max_limit: float = 10,
+        increase: float = 1.0,
+        decrease: float = 0.5
+    ):
+        """Initialize limiter
+
+        Args:
+            initial: Starting concurrency ceiling
+            min_limit: Lowest ceiling after repeated overloads
+            max_limit: Highest ceiling reachable by additive increase
+            increase: Ceiling growth per full window of successful calls
+            decrease: Multiplier applied to the ceiling on overload (429/5xx)
+        """
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.increase = increase
+        self.decrease = decrease
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.release()
+
+    async def acquire(self):
+        """Wait until a slot under the current ceiling is free"""
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self.in_flight += 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            # Слот уже выдан, но ожидающий отменён: возвращаем его
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def release(self):
+        """Free a slot and wake waiters that now fit under the ceiling"""
+        self.in_flight -= 1
+        self._wake()
+
+    def _wake(self):
+        while self._waiters and self.in_flight < int(self.limit):
+            future = self._waiters.popleft()
+            if not future.done():
+                self.in_flight += 1
+                future.set_result(None)
+
+    def on_success(self):
+        """Additive increase: about +1 after a full window of successful calls"""
+        if self.limit < self.max_limit:
+            self.limit = min(self.max_limit, self.limit + self.increase / self.limit)
+            self._wake()
+
+    def on_overload(self):
+        """Multiplicative decrease after 429 or 5xx"""
+        previous = self.limit
+        self.limit = max(self.min_limit, self.limit * self.decrease)
+        if int(previous) != int(self.limit):
+            logger.warning(f"Notion overloaded, concurrency limit {previous:.1f} -> {self.limit:.1f}")
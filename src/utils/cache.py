@@ -0,0 +1,247 @@
+"""Process-wide query cache with byte budget, LRU+TTL eviction and stale-while-revalidate"""
+
+import asyncio
+import itertools
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, Optional, Set
+
+if TYPE_CHECKING:
+    from src.services.state_backend import StateBackend
+
+logger = logging.getLogger(__name__)
+
+GENERATION_CHECK_INTERVAL = 1.0  # секунд между чтениями общего счётчика поколений
+
+class _Entry:
+    __slots__ = ('value', 'size', 'created')
+
+    def __init__(self, value: Any, size: int, created: float):
+        self.value = value
+        self.size = size
+        self.created = created
+
+def estimate_size(value: Any) -> int:
+    """Approximate memory cost of a cached value by its JSON length"""
+    return len(json.dumps(value, default=str, ensure_ascii=False))
+
+class QueryCache:
+    def __init__(
+        self,
+        max_bytes: int = 8 * 1024 * 1024,
+        ttl: float = 300,
+        stale_ttl: float = 60,
+        sizeof: Callable[[Any], int] = estimate_size,
+        backend: Optional["StateBackend"] = None,
+        namespace: str = 'query_cache',
+        encode: Callable[[Any], Any] = lambda value: value,
+        decode: Callable[[Any], Any] = lambda data: data
+    ):
+        """Initialize cache
+
+        Args:
+            max_bytes: Global memory budget for cached values
+            ttl: Seconds an entry is served as fresh
+            stale_ttl: Extra seconds an expired entry is served while it is refreshed
+            sizeof: Function estimating the size of a value in bytes
+            backend: Shared second-level store, so workers reuse each other's results;
+                its generation counter makes an invalidation in one worker drop
+                the local entries of all of them (within GENERATION_CHECK_INTERVAL)
+            namespace: Backend namespace for cached values
+            encode: Converts a value to plain JSON data (size estimate, backend)
+            decode: Restores a value from encode output
+        """
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.sizeof = sizeof
+        self.backend = backend
+        self.namespace = namespace
+        self._generation_namespace = f'{namespace}:generation'
+        self.encode = encode
+        self.decode = decode
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._size = 0
+        self._generation = 0
+        self._generation_checked_at = float('-inf')
+        self._refreshing: Set[str] = set()
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.shared_hits = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(**query) -> str:
+        """Normalize query parameters (filter, sorts, cursor...) into a cache key"""
+        return json.dumps(query, sort_keys=True, default=str, ensure_ascii=False)
+
+    async def _backend_call(self, fn: Callable, *args, **kwargs) -> Any:
+        """Run blocking backend I/O in a thread, off the event loop"""
+        return await asyncio.to_thread(fn, *args, **kwargs)
+
+    async def _sync_generation(self, force: bool = False):
+        """Drop local entries if another worker has invalidated the cache
+
+        The shared counter is read at most once per GENERATION_CHECK_INTERVAL
+        unless force is set, so cache hits do not wait on the backend.
+        """
+        if self.backend is None:
+            return
+        now = time.monotonic()
+        if not force and now - self._generation_checked_at < GENERATION_CHECK_INTERVAL:
+            return
+        self._generation_checked_at = now
+        generation = await self._backend_call(self.backend.get, self._generation_namespace, 'generation') or 0
+        if generation != self._generation:
+            self._clear()
+            self._generation = generation
+
+    async def _load_shared(self, key: str) -> Optional[Any]:
+        """Value from the backend if it was stored under the current generation"""
+        if self.backend is None:
+            return None
+        record = await self._backend_call(self.backend.get, self.namespace, key)
+        if record is None or record.get('generation') != self._generation:
+            return None
+        self.shared_hits += 1
+        value = self.decode(record['data'])
+        self._store(key, value, record['data'])
+        return value
+
+    async def get_or_load(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """Return cached value, serving stale data while it is refreshed in background"""
+        await self._sync_generation()
+        entry = self._entries.get(key)
+        if entry is not None:
+            age = time.monotonic() - entry.created
+            if age < self.ttl:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return entry.value
+            if age < self.ttl + self.stale_ttl:
+                self.stale_hits += 1
+                self._entries.move_to_end(key)
+                if key not in self._refreshing:
+                    self._refreshing.add(key)
+                    asyncio.create_task(self._refresh(key, loader))
+                return entry.value
+            self._remove(key)
+
+        value = await self._load_shared(key)
+        if value is not None:
+            return value
+
+        self.misses += 1
+        generation = self._generation
+        value = await loader()
+        await self.set(key, value, generation)
+        return value
+
+    async def peek(self, key: str) -> Optional[Any]:
+        """Cached value even if stale, without loading or refreshing it"""
+        await self._sync_generation()
+        entry = self._entries.get(key)
+        if entry is not None and time.monotonic() - entry.created < self.ttl + self.stale_ttl:
+            self.stale_hits += 1
+            return entry.value
+        return await self._load_shared(key)
+
+    async def _refresh(self, key: str, loader: Callable[[], Awaitable[Any]]):
+        """Reload an expired entry in background"""
+        generation = self._generation
+        try:
+            value = await loader()
+            await self.set(key, value, generation)
+        except Exception as e:
+            logger.warning(f"Background cache refresh failed: {e}")
+        finally:
+            self._refreshing.discard(key)
+
+    async def set(self, key: str, value: Any, generation: Optional[int] = None):
+        """Store value locally and in the shared backend
+
+        Args:
+            key: Cache key
+            value: Value to store
+            generation: Generation the value was loaded under; the value is
+                discarded if the cache has been invalidated since
+        """
+        if generation is None:
+            generation = self._generation
+        # Не записываем результат, если кэш был сброшен записью во время загрузки
+        await self._sync_generation(force=True)
+        if generation != self._generation:
+            return
+        data = self.encode(value)
+        self._store(key, value, data)
+        if self.backend is not None:
+            await self._backend_call(
+                self.backend.set, self.namespace, key,
+                {'generation': generation, 'data': data}, ttl=self.ttl
+            )
+
+    def _store(self, key: str, value: Any, data: Any):
+        """Store value and evict least recently used entries over the budget"""
+        size = self.sizeof(data)
+        if size > self.max_bytes:
+            return
+        self._remove(key)
+        self._entries[key] = _Entry(value, size, time.monotonic())
+        self._size += size
+        while self._size > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= entry.size
+
+    def evict_expired(self, limit: int = 100) -> int:
+        """Remove up to limit entries past their stale window, least recently used first"""
+        cutoff = time.monotonic() - self.ttl - self.stale_ttl
+        expired = [
+            key for key, entry in itertools.islice(self._entries.items(), limit)
+            if entry.created < cutoff
+        ]
+        for key in expired:
+            self._remove(key)
+        return len(expired)
+
+    def _clear(self):
+        self._entries.clear()
+        self._size = 0
+
+    async def invalidate(self):
+        """Drop all entries after a write to the database, in every worker"""
+        self._clear()
+        if self.backend is None:
+            self._generation += 1
+            return
+        # Общий счётчик: остальные воркеры сбросят свой L1 при следующем обращении
+        self._generation = await self._backend_call(
+            self.backend.update, self._generation_namespace, 'generation',
+            lambda generation: (generation or 0) + 1
+        )
+        self._generation_checked_at = time.monotonic()
+        await self._backend_call(self.backend.clear, self.namespace)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get cache counters"""
+        lookups = self.hits + self.stale_hits + self.shared_hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'bytes': self._size,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'stale_hits': self.stale_hits,
+            'shared_hits': self.shared_hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': (self.hits + self.stale_hits + self.shared_hits) / lookups if lookups else 0.0
+        }
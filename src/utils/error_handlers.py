@@ -1,14 +1,22 @@
 """Error handling utilities"""
 
 import logging
+import asyncio
 import functools
-from typing import Callable, Any
+import random
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from typing import Callable, Any, Optional
+import httpx
 from telegram import Update
 from telegram.ext import ContextTypes
-from notion_client.errors import APIResponseError
+from notion_client.errors import APIResponseError, HTTPResponseError, RequestTimeoutError
 
 logger = logging.getLogger(__name__)
 
+BACKOFF_BASE = 0.5  # seconds
+BACKOFF_CAP = 30.0  # seconds
+
 def handle_telegram_error(func: Callable) -> Callable:
     """Decorator for handling Telegram API errors"""
     @functools.wraps(func)
@@ -33,28 +41,79 @@ def handle_telegram_error(func: Callable) -> Callable:
                 
     return wrapper
 
-def handle_notion_error(func: Callable) -> Callable:
-    """Decorator for handling Notion API errors"""
-    @functools.wraps(func)
-    async def wrapper(*args, **kwargs) -> Any:
-        try:
-            return await func(*args, **kwargs)
-        except APIResponseError as e:
-            if e.code == 'unauthorized':
-                logger.error("Notion API unauthorized. Check your token.")
-                raise
-            elif e.code == 'rate_limited':
-                logger.warning("Notion API rate limit reached. Waiting...")
-                # Можно добавить здесь логику ожидания
-                raise
-            else:
-                logger.error(f"Notion API error: {e}")
-                raise
-        except Exception as e:
-            logger.error(f"Error in {func.__name__}: {e}", exc_info=True)
-            raise
-            
-    return wrapper
+def get_retry_after(error: Exception) -> Optional[float]:
+    """Read Retry-After header (seconds or HTTP date) from a Notion error"""
+    headers = getattr(error, 'headers', None)
+    value = headers.get('retry-after') if headers else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+def backoff_delay(attempt: int) -> float:
+    """Exponential backoff with full jitter"""
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+
+def is_server_error(error: Exception) -> bool:
+    """Transient Notion failures: 5xx, timeouts and transport errors"""
+    if isinstance(error, HTTPResponseError):
+        return error.status >= 500
+    return isinstance(error, (RequestTimeoutError, httpx.TransportError))
+
+def handle_notion_error(func: Optional[Callable] = None, *, retries: int = 3, idempotent: bool = True) -> Callable:
+    """Decorator for handling Notion API errors
+
+    Rate limited calls are retried after Retry-After (Notion rejected them, so
+    this is safe for any call). Server errors and timeouts are retried with
+    jittered exponential backoff only for idempotent calls.
+    """
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs) -> Any:
+            attempt = 0
+            while True:
+                try:
+                    return await func(*args, **kwargs)
+                except APIResponseError as e:
+                    if e.code == 'unauthorized':
+                        logger.error("Notion API unauthorized. Check your token.")
+                        raise
+                    elif e.code == 'rate_limited':
+                        if attempt >= retries:
+                            logger.warning("Notion API rate limit reached. Giving up.")
+                            raise
+                        delay = get_retry_after(e) or backoff_delay(attempt)
+                        # Джиттер, чтобы повторы не совпали с другими ожидающими
+                        delay += random.uniform(0, BACKOFF_BASE)
+                        logger.warning(f"Notion API rate limit reached. Retrying in {delay:.1f}s")
+                    elif is_server_error(e) and idempotent and attempt < retries:
+                        delay = backoff_delay(attempt)
+                        logger.warning(f"Notion API error {e.status}, retrying in {delay:.1f}s")
+                    else:
+                        logger.error(f"Notion API error: {e}")
+                        raise
+                except Exception as e:
+                    if is_server_error(e) and idempotent and attempt < retries:
+                        delay = backoff_delay(attempt)
+                        logger.warning(f"Notion request failed ({e}), retrying in {delay:.1f}s")
+                    else:
+                        logger.error(f"Error in {func.__name__}: {e}", exc_info=True)
+                        raise
+                attempt += 1
+                await asyncio.sleep(delay)
+
+        return wrapper
+
+    if func is not None:
+        return decorator(func)
+    return decorator
 
 def setup_error_handling(application):
     """Setup global error handlers for the application"""
@@ -1,37 +1,14 @@
 """Logging configuration for the bot"""
 
 import logging
-import os
-from datetime import datetime
+
+from src.utils import logging_config
 
 def setup_logging(log_dir: str = 'logs'):
-    """Setup logging with file and console handlers"""
-    # Create logs directory if not exists
-    if not os.path.exists(log_dir):
-        os.makedirs(log_dir)
-    
-    # Create formatter
-    formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    )
-    
-    # File handler with daily rotation
-    log_file = os.path.join(
-        log_dir,
-        f'bot_{datetime.now().strftime("%Y%m%d")}.log'
-    )
-    file_handler = logging.FileHandler(log_file)
-    file_handler.setFormatter(formatter)
-    
-    # Console handler
-    console_handler = logging.StreamHandler()
-    console_handler.setFormatter(formatter)
-    
-    # Configure root logger
+    """Setup the shared non-blocking logging pipeline"""
+    # Единственная настройка обработчиков — в logging_config, повторный вызов безопасен
+    logging_config.setup_logging(log_dir)
     root_logger = logging.getLogger()
-    root_logger.setLevel(logging.INFO)
-    root_logger.addHandler(file_handler)
-    root_logger.addHandler(console_handler)
     
     # Create special loggers
     access_logger = logging.getLogger('access')
@@ -1,34 +1,177 @@
+"""Non-blocking logging: records are queued and written by a background thread"""
+
+import atexit
+import copy
+import json
 import logging
 import os
-from logging.handlers import RotatingFileHandler
+import queue
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Any, Dict, Optional
+
+from src.utils.metrics import registry
+from src.utils.tracing import current_span
+
+QUEUE_SIZE = 10000  # записей; при переполнении новые отбрасываются, а не ждут
+DEBUG_SAMPLE_RATE = 10  # пишется каждая N-я debug-запись логгера
+CONTEXT_FIELDS = ('update_id', 'user_id', 'chat_id')
+
+# Поля текущего обновления, которые попадают в каждую запись
+log_context: ContextVar[Dict[str, Any]] = ContextVar('log_context', default={})
+
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional["_NonBlockingQueueHandler"] = None
+
+def bind_log_context(**fields):
+    """Attach fields to log records of the current task, returns a reset token"""
+    return log_context.set({**log_context.get(), **fields})
+
+class ContextFilter(logging.Filter):
+    """Copy request and span ids onto the record in the calling thread"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        for key, value in log_context.get().items():
+            setattr(record, key, value)
+        span = current_span()
+        if span is not None:
+            record.trace_id = span.trace_id
+            record.span_id = span.span_id
+        return True
+
+class DebugSampler(logging.Filter):
+    """Pass every rate-th DEBUG record per logger, other levels unchanged"""
+
+    def __init__(self, rate: int = DEBUG_SAMPLE_RATE):
+        super().__init__()
+        self.rate = rate
+        self._seen: Dict[str, int] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG or self.rate <= 1:
+            return True
+        seen = self._seen.get(record.name, 0)
+        self._seen[record.name] = seen + 1
+        return seen % self.rate == 0
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage()
+        }
+        for key in (*CONTEXT_FIELDS, 'trace_id', 'span_id'):
+            value = getattr(record, key, None)
+            if value is not None:
+                data[key] = value
+        if record.exc_text:
+            data['exc'] = record.exc_text
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+class _NonBlockingQueueHandler(QueueHandler):
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Форматируется только сообщение; JSON и запись на диск — в потоке записи
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+def setup_logging(
+    log_dir: str,
+    level: Optional[str] = None,
+    debug_sample_rate: int = DEBUG_SAMPLE_RATE,
+    file_prefix: str = ''
+):
+    """Route all logging through a queue to a background writer thread
+
+    Repeated calls keep the existing pipeline, so handlers are never doubled;
+    call shutdown_logging first to switch to other files.
+
+    Args:
+        log_dir: Directory for bot.log (JSON lines) and slow.log
+        level: Root level name, LOG_LEVEL or INFO by default
+        debug_sample_rate: Keep every N-th DEBUG record of a logger
+        file_prefix: Prepended to file names; processes must not share a
+            rotating file, so each worker writes its own
+    """
+    global _listener, _queue_handler
+    root_logger = logging.getLogger()
+    root_logger.setLevel((level or os.getenv('LOG_LEVEL') or 'INFO').upper())
+    if _listener is not None:
+        return
 
-def setup_logging(log_dir: str):
-    """Setup logging with file and console output"""
     # Create logs directory if it doesn't exist
     os.makedirs(log_dir, exist_ok=True)
-    
-    # Log file path
-    log_file = os.path.join(log_dir, 'bot.log')
-    
-    # Format for logs
-    formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    )
-    
-    # File handler with rotation
+
+    # File handler with rotation, machine-readable
     file_handler = RotatingFileHandler(
-        log_file,
+        os.path.join(log_dir, f'{file_prefix}bot.log'),
         maxBytes=10*1024*1024,  # 10MB
         backupCount=5
     )
-    file_handler.setFormatter(formatter)
-    
-    # Console handler
+    file_handler.setFormatter(JsonFormatter())
+
+    # Console handler for humans
     console_handler = logging.StreamHandler()
-    console_handler.setFormatter(formatter)
-    
-    # Configure root logger
-    root_logger = logging.getLogger()
-    root_logger.setLevel(logging.INFO)
-    root_logger.addHandler(file_handler)
-    root_logger.addHandler(console_handler)
+    console_handler.setFormatter(logging.Formatter(
+        '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    ))
+
+    # Деревья медленных запросов дополнительно пишутся в отдельный файл
+    slow_handler = RotatingFileHandler(
+        os.path.join(log_dir, f'{file_prefix}slow.log'),
+        maxBytes=10*1024*1024,  # 10MB
+        backupCount=2
+    )
+    slow_handler.setFormatter(JsonFormatter())
+    slow_handler.addFilter(logging.Filter('slow_requests'))
+
+    _queue_handler = _NonBlockingQueueHandler(queue.Queue(QUEUE_SIZE))
+    _queue_handler.addFilter(DebugSampler(debug_sample_rate))
+    _queue_handler.addFilter(ContextFilter())
+    # Обработчики, добавленные раньше (basicConfig, прежняя настройка), писали бы синхронно
+    for handler in root_logger.handlers[:]:
+        root_logger.removeHandler(handler)
+    root_logger.addHandler(_queue_handler)
+
+    _listener = QueueListener(
+        _queue_handler.queue, file_handler, console_handler, slow_handler,
+        respect_handler_level=True
+    )
+    _listener.start()
+    atexit.register(shutdown_logging)
+    registry.gauge('log_records_dropped', 'Log records dropped on a full queue', dropped_records)
+
+def shutdown_logging():
+    """Flush queued records and stop the writer thread"""
+    global _listener, _queue_handler
+    if _listener is None:
+        return
+    _listener.stop()
+    logging.getLogger().removeHandler(_queue_handler)
+    for handler in _listener.handlers:
+        handler.close()
+    _listener = None
+    _queue_handler = None
+
+def dropped_records() -> int:
+    """Records lost because the queue was full"""
+    return _queue_handler.dropped if _queue_handler is not None else 0
@@ -0,0 +1,138 @@
+"""Event loop lag monitor with stack capture of blocking calls"""
+
+import asyncio
+import logging
+import sys
+import threading
+import traceback
+from collections import deque
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional
+
+from src.utils.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+BLOCK_THRESHOLD = 0.1  # секунд без хода event loop считаются блокировкой
+HEARTBEAT_INTERVAL = 1.0  # редкий heartbeat: сторож просыпается раз в интервал
+MAX_REPORTS = 50
+MAX_STACK_FRAMES = 25
+
+LOOP_LAG_SECONDS = registry.histogram(
+    'event_loop_lag_seconds', 'Delay of event loop wake-ups',
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+)
+
+class LoopWatchdog:
+    def __init__(
+        self,
+        threshold: float = BLOCK_THRESHOLD,
+        interval: float = HEARTBEAT_INTERVAL,
+        max_reports: int = MAX_REPORTS
+    ):
+        """Measure loop lag from a heartbeat task and catch stalls from a thread
+
+        A daemon thread sleeps until the next heartbeat is due. Only when a
+        heartbeat is late by more than threshold does it record the stack
+        the loop thread is stuck in. A block shorter than the time left to
+        the next heartbeat is not seen; the coarse period keeps the cost
+        of watching to one wake-up per interval.
+
+        Args:
+            threshold: Seconds without a heartbeat reported as a block
+            interval: Heartbeat period in seconds
+            max_reports: Block reports kept for the monitoring API
+        """
+        self.threshold = threshold
+        self.interval = interval
+        self.reports: Deque[Dict[str, Any]] = deque(maxlen=max_reports)
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self._peak_lag = 0.0
+        self.blocks = 0
+        self._loop_thread: Optional[int] = None
+        self._pending: Optional[Dict[str, Any]] = None
+        self._heartbeat: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self._beaten = threading.Event()
+        # blocks меняет поток-сторож, поэтому значение читается при scrape
+        registry.gauge('event_loop_blocks', 'Event loop stalls longer than the threshold', lambda: self.blocks)
+
+    def start(self):
+        """Start watching the running loop"""
+        self._loop_thread = threading.get_ident()
+        self._stopped.clear()
+        self._beaten.clear()
+        self._heartbeat = asyncio.create_task(self._run_heartbeat())
+        self._thread = threading.Thread(target=self._watch, name='loop-watchdog', daemon=True)
+        self._thread.start()
+
+    async def stop(self):
+        self._stopped.set()
+        self._beaten.set()
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+            await asyncio.gather(self._heartbeat, return_exceptions=True)
+            self._heartbeat = None
+
+    async def _run_heartbeat(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - expected)
+            self._beaten.set()
+            self.last_lag = lag
+            self.max_lag = max(self.max_lag, lag)
+            self._peak_lag = max(self._peak_lag, lag)
+            LOOP_LAG_SECONDS.observe(lag)
+            pending = self._pending
+            if pending is not None:
+                # Поток зафиксировал стек, длительность известна только теперь
+                self._pending = None
+                pending['duration_ms'] = round(lag * 1000, 1)
+                logger.warning(
+                    f"Event loop was blocked for {lag * 1000:.0f} ms at:\n" + "".join(pending['stack'])
+                )
+
+    def _watch(self):
+        """Watchdog thread: capture the loop thread's stack during a stall"""
+        while not self._stopped.is_set():
+            # Просыпаемся на каждом heartbeat или когда он опоздал больше чем на threshold
+            if self._beaten.wait(self.interval + self.threshold):
+                self._beaten.clear()
+                continue
+            if self._stopped.is_set():
+                return
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is None:
+                continue
+            stack = traceback.format_list(traceback.extract_stack(frame)[-MAX_STACK_FRAMES:])
+            report = {
+                'time': datetime.now().isoformat(timespec='seconds'),
+                'duration_ms': None,
+                'stack': stack
+            }
+            self.blocks += 1
+            self.reports.append(report)
+            self._pending = report
+            # Один отчёт на одну остановку: следующий отчёт только после нового heartbeat
+            self._beaten.wait()
+            self._beaten.clear()
+
+    def take_peak_lag(self) -> float:
+        """Highest lag since the previous call, for periodic load checks"""
+        lag, self._peak_lag = self._peak_lag, 0.0
+        return lag
+
+    def stats(self, limit: int = 10) -> Dict[str, Any]:
+        """Lag figures and recent blocking stacks, newest first"""
+        reports: List[Dict[str, Any]] = list(self.reports)[::-1][:limit]
+        return {
+            'threshold_ms': self.threshold * 1000,
+            'last_lag_ms': round(self.last_lag * 1000, 2),
+            'max_lag_ms': round(self.max_lag * 1000, 2),
+            'blocks': self.blocks,
+            'recent_blocks': reports
+        }
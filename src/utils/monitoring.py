@@ -5,21 +5,30 @@ import logging
 from datetime import datetime
 from typing import Dict, Optional
 
+from src.utils.metrics import registry
+
 logger = logging.getLogger(__name__)
 
+COMMANDS_TOTAL = registry.counter('bot_commands_total', 'Commands and button presses', labels=('command',))
+ERRORS_TOTAL = registry.counter('bot_errors_total', 'Errors raised by handlers', labels=('type',))
+
 class SystemMonitor:
     def __init__(self, cpu_threshold: float = 80.0, memory_threshold: float = 80.0):
         self.cpu_threshold = cpu_threshold
         self.memory_threshold = memory_threshold
         self.last_check = None
         self.process = psutil.Process()
+        # Первый неблокирующий замер задаёт точку отсчёта для следующих
+        psutil.cpu_percent(interval=None)
+        self.process.cpu_percent(interval=None)
         
     def check_system(self) -> Dict[str, float]:
         """Check system resources"""
         try:
-            cpu_percent = psutil.cpu_percent(interval=1)
+            # Загрузка с прошлого вызова, без ожидания в потоке event loop
+            cpu_percent = psutil.cpu_percent(interval=None)
             memory_percent = psutil.virtual_memory().percent
-            process_cpu = self.process.cpu_percent()
+            process_cpu = self.process.cpu_percent(interval=None)
             process_memory = self.process.memory_percent()
             
             self.last_check = datetime.now()
@@ -69,6 +78,7 @@ class BotMonitor:
         self.command_counts = {}
         self.error_counts = {}
         self.last_errors = {}
+        registry.gauge('bot_active_users', 'Users seen since start', lambda: len(self.active_users))
         
     def log_user_activity(self, user_id: int, command: str):
         """Log user command execution"""
@@ -76,12 +86,14 @@ class BotMonitor:
         if command not in self.command_counts:
             self.command_counts[command] = 0
         self.command_counts[command] += 1
+        COMMANDS_TOTAL.inc(command)
         
     def log_error(self, error_type: str, error: Exception, user_id: Optional[int] = None):
         """Log error occurrence"""
         if error_type not in self.error_counts:
             self.error_counts[error_type] = 0
         self.error_counts[error_type] += 1
+        ERRORS_TOTAL.inc(error_type)
         
         self.last_errors[error_type] = {
             'time': datetime.now(),
@@ -1,38 +1,219 @@
-"""Rate limiting implementation"""
+"""Rate limiting implementation (GCRA)"""
 
-from datetime import datetime, timedelta
-from collections import deque
-from typing import Dict, Deque
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Dict, Hashable, Optional, Tuple
+
+if TYPE_CHECKING:
+    from src.services.state_backend import StateBackend
+
+EVICT_BATCH = 8  # idle keys removed per call
+BLOCK_SYNC_INTERVAL = 1.0  # секунд между чтениями блокировок других процессов
+# TAT накапливает ошибку округления при сложении interval с большим значением часов
+EPSILON = 1e-9
 
 class RateLimiter:
-    def __init__(self, max_requests: int = 30, time_window: int = 60):
+    def __init__(
+        self,
+        max_requests: int = 30,
+        time_window: float = 60,
+        burst: Optional[int] = None,
+        backend: Optional["StateBackend"] = None,
+        namespace: str = 'rate_limit'
+    ):
         """Initialize rate limiter
-        
+
+        Generic cell rate algorithm: each key stores a single float, the
+        theoretical arrival time (TAT) of its next request.
+
         Args:
             max_requests: Maximum requests per time window
             time_window: Time window in seconds
+            burst: Requests allowed back to back (defaults to max_requests)
+            backend: Shared state backend for allow() and for Retry-After
+                blocks, so worker processes see each other's state
+            namespace: Backend namespace for this limiter's keys
+
+        The synchronous methods work on process memory only. allow(),
+        block_shared() and sync_blocks() also use the backend; its I/O runs
+        in a thread, off the event loop.
         """
         self.max_requests = max_requests
         self.time_window = time_window
-        self.requests: Dict[int, Deque[datetime]] = {}
-        
-    def can_make_request(self, user_id: int) -> bool:
-        """Check if user can make a request"""
-        now = datetime.now()
-        
-        # Initialize user's request history
-        if user_id not in self.requests:
-            self.requests[user_id] = deque()
-            
-        # Remove old requests
-        while self.requests[user_id] and \
-            (now - self.requests[user_id][0]) > timedelta(seconds=self.time_window):
-            self.requests[user_id].popleft()
-            
-        # Check limit
-        if len(self.requests[user_id]) >= self.max_requests:
+        self.interval = time_window / max_requests
+        self.burst = burst or max_requests
+        self.tolerance = self.interval * (self.burst - 1)
+        self._tat: "OrderedDict[Hashable, float]" = OrderedDict()
+        self.backend = backend
+        self.namespace = namespace
+        self._blocks_synced_at = float('-inf')
+
+    def _set_tat(self, key: Hashable, update):
+        """Apply update(tat, now) to the stored TAT"""
+        now = time.monotonic()
+        self._tat[key] = update(self._tat.get(key), now)
+        self._tat.move_to_end(key)
+
+    def delay(self, key: Hashable = None, now: Optional[float] = None) -> float:
+        """Seconds until key may make a request (0 if allowed now)"""
+        if now is None:
+            now = time.monotonic()
+        wait = self._tat.get(key, now) - now - self.tolerance
+        return wait if wait > EPSILON else 0.0
+
+    def commit(self, key: Hashable = None):
+        """Account one request for key"""
+        self._set_tat(key, lambda tat, now: max(now if tat is None else tat, now) + self.interval)
+        self.evict_idle()
+
+    def block(self, key: Hashable, seconds: float):
+        """Deny requests for key during the given time"""
+        self._set_tat(key, lambda tat, now: max(now if tat is None else tat, now + self.tolerance + seconds))
+
+    def _gcra(self, tat: Optional[float], now: float) -> Tuple[bool, float]:
+        """Decide one request: (allowed, new TAT)"""
+        tat = max(now if tat is None else tat, now)
+        if tat - now - self.tolerance > EPSILON:
+            return False, tat
+        return True, tat + self.interval
+
+    def can_make_request(self, key: Hashable = None) -> bool:
+        """Check if key can make a request and account it if so"""
+        allowed = False
+
+        def update(tat, now):
+            nonlocal allowed
+            allowed, tat = self._gcra(tat, now)
+            return tat
+
+        self._set_tat(key, update)
+        self.evict_idle()
+        return allowed
+
+    async def allow(self, key: Hashable = None) -> bool:
+        """can_make_request, shared by all processes using the backend"""
+        if self.backend is None:
+            return self.can_make_request(key)
+        return await asyncio.to_thread(self._allow_shared, _encode(key))
+
+    def _allow_shared(self, key: str) -> bool:
+        allowed = False
+
+        def update(tat):
+            nonlocal allowed
+            # Разные процессы сравнимы только по wall clock
+            allowed, tat = self._gcra(tat, time.time())
+            return tat
+
+        # Проверка и учёт в одной транзакции; запись живёт, пока бакет не восстановится
+        self.backend.update(self.namespace, key, update, ttl=lambda tat: max(0.001, tat - time.time()))
+        return allowed
+
+    async def block_shared(self, key: Hashable, seconds: float):
+        """block() here and, through the backend, in every other process"""
+        self.block(key, seconds)
+        if self.backend is None:
+            return
+        until = time.time() + seconds
+
+        def update(blocks: Optional[Dict[str, float]]) -> Dict[str, float]:
+            now = time.time()
+            blocks = {name: end for name, end in (blocks or {}).items() if end > now}
+            blocks[_encode(key)] = max(blocks.get(_encode(key), 0.0), until)
+            return blocks
+
+        await asyncio.to_thread(
+            self.backend.update, f'{self.namespace}:blocks', 'blocks', update,
+            ttl=lambda blocks: max(blocks.values()) - time.time()
+        )
+
+    async def sync_blocks(self):
+        """Apply blocks set by other processes, reading them at most once per BLOCK_SYNC_INTERVAL"""
+        if self.backend is None or time.monotonic() - self._blocks_synced_at < BLOCK_SYNC_INTERVAL:
+            return
+        self._blocks_synced_at = time.monotonic()
+        blocks = await asyncio.to_thread(self.backend.get, f'{self.namespace}:blocks', 'blocks')
+        now = time.time()
+        for name, end in (blocks or {}).items():
+            if end > now:
+                self.block(json.loads(name), end - now)
+
+    async def acquire(self, key: Hashable = None):
+        """Wait until key can make a request"""
+        while True:
+            wait = self.delay(key)
+            if wait <= 0:
+                self.commit(key)
+                return
+            await asyncio.sleep(wait)
+
+    def evict_idle(self, now: Optional[float] = None, limit: int = EVICT_BATCH) -> int:
+        """Forget keys whose bucket has fully refilled
+
+        Keys are kept in update order, so idle ones are found at the front.
+        Each call inspects at most limit keys; a key still in use (e.g.
+        blocked after Retry-After) is moved to the back instead of holding
+        up the idle keys behind it.
+        """
+        if now is None:
+            now = time.monotonic()
+        evicted = 0
+        for _ in range(min(limit, len(self._tat))):
+            key, tat = next(iter(self._tat.items()))
+            if tat > now:
+                self._tat.move_to_end(key)
+            else:
+                del self._tat[key]
+                evicted += 1
+        return evicted
+
+    def __len__(self) -> int:
+        return len(self._tat)
+
+def _encode(key: Hashable) -> str:
+    """Backend key for a limiter key (user or chat id, None for a single bucket)"""
+    return json.dumps(key)
+
+class HierarchicalRateLimiter:
+    def __init__(self, levels: Dict[str, RateLimiter]):
+        """Combine limiters, e.g. {'user': ..., 'chat': ..., 'global': ...}
+
+        A request passes only if every level allows it and is then accounted
+        on all of them; a denied request consumes nothing. Levels without a
+        key in the call share a single bucket.
+        """
+        self.levels = levels
+
+    def delay(self, **keys: Hashable) -> float:
+        """Seconds until the request is allowed on every level"""
+        now = time.monotonic()
+        return max(
+            limiter.delay(keys.get(name), now) for name, limiter in self.levels.items()
+        )
+
+    def _commit(self, keys: Dict[str, Hashable]):
+        for name, limiter in self.levels.items():
+            limiter.commit(keys.get(name))
+
+    def can_make_request(self, **keys: Hashable) -> bool:
+        """Check all levels and account the request only if all allow it"""
+        # Без await между проверкой и учётом: другие задачи не вклиниваются
+        if self.delay(**keys) > 0:
             return False
-            
-        # Add new request
-        self.requests[user_id].append(now)
-        return True
\ No newline at end of file
+        self._commit(keys)
+        return True
+
+    async def acquire(self, **keys: Hashable):
+        """Wait until every level allows the request"""
+        while True:
+            wait = self.delay(**keys)
+            if wait <= 0:
+                self._commit(keys)
+                return
+            await asyncio.sleep(wait)
+
+    def evict_idle(self, limit: int = EVICT_BATCH) -> int:
+        """Forget idle keys on every level"""
+        return sum(limiter.evict_idle(limit=limit) for limiter in self.levels.values())
@@ -0,0 +1,87 @@
+"""Global request scheduler for the Notion integration"""
+
+import asyncio
+from collections import deque
+from typing import TYPE_CHECKING, Deque, Dict, Hashable, Optional
+
+from src.utils.rate_limiter import RateLimiter
+
+if TYPE_CHECKING:
+    from src.services.state_backend import StateBackend
+
+class RequestScheduler:
+    def __init__(
+        self,
+        rate: float = 3.0,
+        burst: int = 3,
+        workers: int = 1,
+        backend: Optional["StateBackend"] = None
+    ):
+        """Initialize rate limit shared by all users
+
+        Args:
+            rate: Requests per second (Notion allows ~3 req/s per integration)
+            burst: Requests allowed back to back
+            workers: Processes sharing the integration token; each one gets
+                an equal share of rate and burst
+            backend: Shared state backend; Retry-After pauses reach every worker through it
+        """
+        self.rate = rate / workers
+        self.burst = max(1, burst // workers)
+        self.limiter = RateLimiter(
+            max_requests=self.burst,
+            time_window=self.burst / self.rate,
+            backend=backend,
+            namespace='notion'
+        )
+        # Очереди ожидающих запросов по пользователям и порядок обхода round-robin
+        self._queues: Dict[Hashable, Deque[asyncio.Future]] = {}
+        self._order: Deque[Hashable] = deque()
+        self._dispatcher: Optional[asyncio.Task] = None
+
+    async def acquire(self, key: Hashable = None):
+        """Wait for a request slot, served fairly across keys"""
+        await self.limiter.sync_blocks()
+        if not self._queues and self.limiter.can_make_request():
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        queue = self._queues.get(key)
+        if queue is None:
+            queue = self._queues[key] = deque()
+            self._order.append(key)
+        queue.append(future)
+
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        await future
+
+    async def _dispatch(self):
+        """Hand out request slots one key at a time"""
+        while self._order:
+            key = self._order[0]
+            queue = self._queues[key]
+
+            # Отменённые ожидания не расходуют лимит
+            if not queue[0].cancelled():
+                await self.limiter.sync_blocks()
+                if not self.limiter.can_make_request():
+                    await asyncio.sleep(max(self.limiter.delay(), 0.01))
+                    continue
+                queue[0].set_result(None)
+
+            self._order.popleft()
+            queue.popleft()
+            if queue:
+                self._order.append(key)
+            else:
+                del self._queues[key]
+
+    async def pause(self, seconds: float):
+        """Stop handing out slots in every worker for the given time (Retry-After)"""
+        await self.limiter.block_shared(None, seconds)
+
+    @property
+    def pending(self) -> int:
+        """Number of requests waiting for a slot"""
+        return sum(len(queue) for queue in self._queues.values())
@@ -3,30 +3,50 @@
 import psutil
 import logging
 import asyncio
-from typing import Dict, Optional
+from typing import Callable, Dict, Optional
 
 class ResourceMonitor:
     def __init__(
         self,
         cpu_threshold: int = 80,  # 80% CPU max
         memory_threshold: int = 400 * 1024 * 1024,  # 400MB memory max
-        check_interval: int = 30  # Check every 30 seconds
+        check_interval: int = 30,  # Check every 30 seconds
+        max_loop_lag: float = 0.5,  # seconds of event loop delay
+        max_queue_depth: int = 20,  # Notion calls waiting for a slot
+        queue_depth: Optional[Callable[[], int]] = None,
+        loop_lag: Optional[Callable[[], float]] = None  # e.g. LoopWatchdog.take_peak_lag
     ):
         self.cpu_threshold = cpu_threshold
         self.memory_threshold = memory_threshold
         self.check_interval = check_interval
+        self.max_loop_lag = max_loop_lag
+        self.max_queue_depth = max_queue_depth
+        self.queue_depth = queue_depth
+        self.loop_lag = loop_lag
         self._running = False
         self._last_check: Optional[Dict] = None
+        self.process = psutil.Process()
+        # Первый вызов без интервала задаёт точку отсчёта
+        self.process.cpu_percent(interval=None)
         
-    async def start_monitoring(self):
-        """Start resource monitoring"""
+    async def start_monitoring(self, on_check: Optional[Callable[[Dict], None]] = None):
+        """Start resource monitoring
+        
+        Args:
+            on_check: Called with every new status
+        """
         self._running = True
         while self._running:
             try:
-                await self.check_resources()
+                status = await self.check_resources()
+                if on_check is not None and status:
+                    on_check(status)
                 await asyncio.sleep(self.check_interval)
+            except asyncio.CancelledError:
+                raise
             except Exception as e:
                 logging.error(f"Monitoring error: {e}")
+                await asyncio.sleep(self.check_interval)
                 
     def stop_monitoring(self):
         """Stop resource monitoring"""
@@ -35,19 +55,20 @@ class ResourceMonitor:
     async def check_resources(self) -> Dict:
         """Check system resources"""
         try:
-            process = psutil.Process()
-            
-            # Get CPU usage (as percentage)
-            cpu_percent = process.cpu_percent(interval=1)
+            # Get CPU usage since the previous check (as percentage), without blocking
+            cpu_percent = self.process.cpu_percent(interval=None)
             
             # Get memory usage (in bytes)
-            memory_info = process.memory_info()
+            memory_info = self.process.memory_info()
             memory_usage = memory_info.rss
             
+            loop_lag = self.loop_lag() if self.loop_lag is not None else 0.0
             status = {
                 "cpu_percent": cpu_percent,
                 "memory_usage": memory_usage,
-                "memory_percent": memory_usage / psutil.virtual_memory().total * 100
+                "memory_percent": memory_usage / psutil.virtual_memory().total * 100,
+                "loop_lag": loop_lag,
+                "queue_depth": self.queue_depth() if self.queue_depth is not None else 0
             }
             
             # Log if exceeding thresholds
@@ -59,6 +80,9 @@ class ResourceMonitor:
                     f"High memory usage: {memory_usage / 1024 / 1024:.1f} MB"
                 )
                 
+            if loop_lag > self.max_loop_lag:
+                logging.warning(f"Event loop lag: {loop_lag * 1000:.0f} ms")
+                
             self._last_check = status
             return status
             
@@ -71,7 +95,16 @@ class ResourceMonitor:
         if not self._last_check:
             return False
             
-        return (
-            self._last_check["cpu_percent"] > self.cpu_threshold or
-            self._last_check["memory_usage"] > self.memory_threshold
+        return self.pressure() > 1.0
+        
+    def pressure(self) -> float:
+        """Load relative to thresholds: the highest of the four ratios, 1.0 is at the limit"""
+        if not self._last_check:
+            return 0.0
+            
+        return max(
+            self._last_check["cpu_percent"] / self.cpu_threshold,
+            self._last_check["memory_usage"] / self.memory_threshold,
+            self._last_check["loop_lag"] / self.max_loop_lag,
+            self._last_check["queue_depth"] / self.max_queue_depth
         )
\ No newline at end of file
@@ -0,0 +1,35 @@
+"""Request coalescing for concurrent identical calls"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+class SingleFlight:
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+        self.shared = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run fn once per key; concurrent callers await the same result"""
+        future = self._calls.get(key)
+        if future is not None:
+            self.shared += 1
+            # shield: отмена одного ожидающего не отменяет общий запрос
+            return await asyncio.shield(future)
+
+        future = asyncio.ensure_future(fn())
+        self._calls[key] = future
+        future.add_done_callback(lambda done: self._finish(key, done))
+        return await asyncio.shield(future)
+
+    def _finish(self, key: Hashable, future: asyncio.Future):
+        """Forget completed call"""
+        if self._calls.get(key) is future:
+            del self._calls[key]
+        # Забираем исключение, даже если все ожидающие были отменены
+        if not future.cancelled():
+            future.exception()
+
+    @property
+    def in_flight(self) -> int:
+        """Number of distinct calls currently running"""
+        return len(self._calls)
@@ -0,0 +1,145 @@
+"""Lightweight request tracing with a slow-request log
+
+Spans nest through a ContextVar, so a trace follows the awaits of one
+update, including tasks created inside it. Disabled tracing costs a single
+attribute check per span.
+"""
+
+import functools
+import itertools
+import logging
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+# Отдельный логгер, чтобы медленные запросы можно было писать в свой файл
+slow_logger = logging.getLogger('slow_requests')
+
+SLOW_THRESHOLD = 1.0  # секунд
+BUFFER_SIZE = 100
+MAX_CHILDREN = 200  # длинная синхронизация не должна раздувать дерево
+
+_NOOP = nullcontext()
+_ids = itertools.count(1)
+
+class Span:
+    __slots__ = ('name', 'attrs', 'span_id', 'trace_id', 'start', 'duration', 'error', 'children')
+
+    def __init__(self, name: str, attrs: Dict[str, Any], parent: Optional['Span'] = None):
+        self.name = name
+        self.attrs = attrs
+        self.span_id = next(_ids)
+        # Id корневого span связывает строки логов с деревом в /monitoring/traces
+        self.trace_id = parent.trace_id if parent is not None else self.span_id
+        self.start = time.perf_counter()
+        self.duration: Optional[float] = None
+        self.error: Optional[str] = None
+        self.children: List['Span'] = []
+
+    def to_dict(self, origin: float) -> Dict[str, Any]:
+        data = {
+            'name': self.name,
+            'span_id': self.span_id,
+            'offset_ms': round((self.start - origin) * 1000, 2),
+            'duration_ms': round(self.duration * 1000, 2) if self.duration is not None else None
+        }
+        if self.attrs:
+            data['attrs'] = {key: str(value) for key, value in self.attrs.items()}
+        if self.error:
+            data['error'] = self.error
+        if self.children:
+            data['children'] = [child.to_dict(origin) for child in self.children]
+        return data
+
+    def format(self, origin: float, depth: int = 0) -> Iterator[str]:
+        duration = f"{self.duration * 1000:.1f}ms" if self.duration is not None else "unfinished"
+        attrs = ''.join(f" {key}={value}" for key, value in self.attrs.items())
+        error = f" error={self.error}" if self.error else ''
+        yield f"{'  ' * depth}{self.name} +{(self.start - origin) * 1000:.1f}ms {duration}{attrs}{error}"
+        for child in self.children:
+            yield from child.format(origin, depth + 1)
+
+_current: ContextVar[Optional[Span]] = ContextVar('trace_span', default=None)
+
+def current_span() -> Optional[Span]:
+    """Innermost open span of the running context"""
+    return _current.get()
+
+class Tracer:
+    def __init__(self, enabled: bool = False, slow_threshold: float = SLOW_THRESHOLD, buffer_size: int = BUFFER_SIZE):
+        """Collect span trees and keep the slow ones
+
+        Args:
+            enabled: Whether spans are recorded at all
+            slow_threshold: Root span duration in seconds that makes a trace slow
+            buffer_size: Slow traces kept for /monitoring/traces
+        """
+        self.enabled = enabled
+        self.slow_threshold = slow_threshold
+        self.traces: Deque[Dict[str, Any]] = deque(maxlen=buffer_size)
+        self.recorded = 0
+
+    def configure(self, enabled: bool, slow_threshold: Optional[float] = None):
+        self.enabled = enabled
+        if slow_threshold is not None:
+            self.slow_threshold = slow_threshold
+
+    def span(self, name: str, **attrs):
+        """Context manager timing a block as a child of the current span"""
+        if not self.enabled:
+            return _NOOP
+        return self._span(name, attrs)
+
+    @contextmanager
+    def _span(self, name: str, attrs: Dict[str, Any]):
+        parent = _current.get()
+        span = Span(name, attrs, parent)
+        if parent is not None and len(parent.children) < MAX_CHILDREN:
+            parent.children.append(span)
+        token = _current.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = type(e).__name__
+            raise
+        finally:
+            span.duration = time.perf_counter() - span.start
+            _current.reset(token)
+            # Корневой span без родителя завершает трассу
+            if parent is None and span.duration >= self.slow_threshold:
+                self._record(span)
+
+    def _record(self, root: Span):
+        self.recorded += 1
+        self.traces.append({
+            'time': datetime.now().isoformat(timespec='seconds'),
+            'trace_id': root.trace_id,
+            **root.to_dict(root.start)
+        })
+        slow_logger.warning(
+            f"Slow {root.name} took {root.duration * 1000:.1f}ms\n" + "\n".join(root.format(root.start))
+        )
+
+    def recent(self, limit: int = BUFFER_SIZE) -> List[Dict[str, Any]]:
+        """Slow traces, newest first"""
+        return list(self.traces)[::-1][:limit]
+
+def traced(name: Optional[str] = None) -> Callable:
+    """Decorator wrapping a coroutine function in a span"""
+    def decorator(func: Callable) -> Callable:
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return await func(*args, **kwargs)
+            with tracer._span(span_name, {}):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+tracer = Tracer()
@@ -0,0 +1,3 @@
+# test_connection.py — ручная проверка доступа к Notion (python -m tests.test_connection),
+# ей нужны настоящий токен и сеть
+collect_ignore = ['test_connection.py']
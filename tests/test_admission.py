@@ -0,0 +1,79 @@
+"""AdmissionController: load levels with hysteresis and what each level sheds"""
+
+import time
+
+from telegram import Update
+
+from src.services.admission import ELEVATED, NORMAL, OVERLOADED, AdmissionController
+from src.utils.resource_monitor import ResourceMonitor
+
+def controller() -> AdmissionController:
+    return AdmissionController(ResourceMonitor(check_interval=1), max_update_age=30)
+
+def message_update(age: float, callback: bool = False) -> Update:
+    message = {
+        'message_id': 1,
+        'date': int(time.time() - age),
+        'chat': {'id': 1, 'type': 'private'},
+        'from': {'id': 1, 'is_bot': False, 'first_name': 'User'},
+        'text': 'hi'
+    }
+    if callback:
+        return Update.de_json({'update_id': 1, 'callback_query': {
+            'id': '1', 'from': message['from'], 'chat_instance': '1', 'data': 'show_tasks', 'message': message
+        }}, None)
+    return Update.de_json({'update_id': 1, 'message': message}, None)
+
+def test_levels_rise_with_pressure():
+    admission = controller()
+    admission.update(0.9)
+    assert admission.level == NORMAL
+    admission.update(1.0)
+    assert admission.level == ELEVATED
+    admission.update(1.5)
+    assert admission.level == OVERLOADED
+
+def test_level_jumps_straight_to_overloaded():
+    admission = controller()
+    admission.update(2.0)
+    assert admission.level == OVERLOADED
+
+def test_level_drops_only_well_below_the_threshold():
+    admission = controller()
+    admission.update(1.6)
+    # Колебания около порога не переключают уровень туда-обратно
+    for pressure in (1.45, 1.3, 1.25, 1.49):
+        admission.update(pressure)
+        assert admission.level == OVERLOADED
+    admission.update(1.19)
+    assert admission.level == ELEVATED
+    admission.update(0.85)
+    assert admission.level == ELEVATED
+    admission.update(0.79)
+    assert admission.level == NORMAL
+
+def test_level_falls_through_several_steps_at_once():
+    admission = controller()
+    admission.update(2.0)
+    admission.update(0.1)
+    assert admission.level == NORMAL
+
+def test_background_work_is_shed_first():
+    admission = controller()
+    assert admission.allow_notifications() and admission.allow_bulk() and admission.allow_live_reads()
+    admission.update(1.0)
+    assert not admission.allow_notifications()
+    assert not admission.allow_bulk()
+    assert admission.allow_live_reads()
+    admission.update(1.5)
+    assert not admission.allow_live_reads()
+
+def test_stale_messages_are_dropped_only_when_overloaded():
+    admission = controller()
+    stale, fresh = message_update(age=60), message_update(age=5)
+    assert admission.admit(stale)
+    admission.update(1.5)
+    assert not admission.admit(stale)
+    assert admission.admit(fresh)
+    # Нажатие кнопки ждёт ответа при любом возрасте сообщения
+    assert admission.admit(message_update(age=60, callback=True))
@@ -0,0 +1,174 @@
+"""QueryCache: TTL, stale-while-revalidate and generation invalidation"""
+
+import asyncio
+
+import pytest
+
+from src.services.state_backend import MemoryStateBackend
+from src.utils import cache as cache_module
+from src.utils.cache import QueryCache
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(cache_module, 'time', clock)
+    return clock
+
+class Loader:
+    """Returns 1, 2, 3... and counts calls"""
+
+    def __init__(self, delay: float = 0):
+        self.calls = 0
+        self.delay = delay
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return {'version': self.calls}
+
+async def settle():
+    """Let background refresh tasks finish"""
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+def test_fresh_entry_is_served_from_cache(clock):
+    async def scenario():
+        cache, load = QueryCache(ttl=10, stale_ttl=5), Loader()
+        first = await cache.get_or_load('key', load)
+        clock.now += 9
+        second = await cache.get_or_load('key', load)
+        return first, second, load.calls, cache.hits
+
+    first, second, calls, hits = asyncio.run(scenario())
+    assert first == second == {'version': 1}
+    assert calls == 1
+    assert hits == 1
+
+def test_stale_entry_is_served_while_refreshed(clock):
+    async def scenario():
+        cache, load = QueryCache(ttl=10, stale_ttl=5), Loader()
+        await cache.get_or_load('key', load)
+        clock.now += 12
+        stale = await cache.get_or_load('key', load)
+        await settle()
+        fresh = await cache.get_or_load('key', load)
+        return stale, fresh, load.calls, cache.stale_hits
+
+    stale, fresh, calls, stale_hits = asyncio.run(scenario())
+    assert stale == {'version': 1}
+    assert fresh == {'version': 2}
+    assert calls == 2
+    assert stale_hits == 1
+
+def test_one_background_refresh_per_key(clock):
+    async def scenario():
+        cache, load = QueryCache(ttl=10, stale_ttl=5), Loader(delay=0.01)
+        await cache.get_or_load('key', load)
+        clock.now += 12
+        for _ in range(3):
+            await cache.get_or_load('key', load)
+        await asyncio.sleep(0.05)
+        return load.calls
+
+    assert asyncio.run(scenario()) == 2
+
+def test_entry_past_stale_window_is_reloaded(clock):
+    async def scenario():
+        cache, load = QueryCache(ttl=10, stale_ttl=5), Loader()
+        await cache.get_or_load('key', load)
+        clock.now += 16
+        return await cache.get_or_load('key', load), cache.misses
+
+    value, misses = asyncio.run(scenario())
+    assert value == {'version': 2}
+    assert misses == 2
+
+def test_invalidate_drops_entries(clock):
+    async def scenario():
+        cache, load = QueryCache(), Loader()
+        await cache.get_or_load('key', load)
+        await cache.invalidate()
+        return await cache.get_or_load('key', load)
+
+    assert asyncio.run(scenario()) == {'version': 2}
+
+def test_load_racing_an_invalidation_is_not_stored(clock):
+    async def scenario():
+        cache, load = QueryCache(), Loader(delay=0.01)
+        loading = asyncio.create_task(cache.get_or_load('key', load))
+        await asyncio.sleep(0)
+        # Запись в базу во время чтения: результат чтения уже устарел
+        await cache.invalidate()
+        raced = await loading
+        return raced, await cache.peek('key')
+
+    raced, cached = asyncio.run(scenario())
+    assert raced == {'version': 1}
+    assert cached is None
+
+def test_invalidation_reaches_caches_sharing_a_backend(clock):
+    async def scenario():
+        backend = MemoryStateBackend()
+        first, second = QueryCache(backend=backend), QueryCache(backend=backend)
+        load = Loader()
+        await first.get_or_load('key', load)
+        # Второй воркер получает результат из общего хранилища
+        shared = await second.get_or_load('key', load)
+        await first.invalidate()
+        # Второй воркер видит новое поколение при следующей проверке счётчика
+        clock.now += cache_module.GENERATION_CHECK_INTERVAL
+        reloaded = await second.get_or_load('key', load)
+        return shared, second.shared_hits, reloaded, load.calls
+
+    shared, shared_hits, reloaded, calls = asyncio.run(scenario())
+    assert shared == {'version': 1}
+    assert shared_hits == 1
+    assert reloaded == {'version': 2}
+    assert calls == 2
+
+def test_generation_is_read_at_most_once_per_interval(clock):
+    class CountingBackend(MemoryStateBackend):
+        def __init__(self):
+            super().__init__()
+            self.reads = 0
+
+        def get(self, namespace, key):
+            self.reads += 1
+            return super().get(namespace, key)
+
+    async def scenario():
+        backend = CountingBackend()
+        cache = QueryCache(backend=backend)
+        await cache.get_or_load('key', Loader())
+        reads = backend.reads
+        for _ in range(10):
+            await cache.get_or_load('key', Loader())
+        hits_reads = backend.reads - reads
+        clock.now += cache_module.GENERATION_CHECK_INTERVAL
+        await cache.get_or_load('key', Loader())
+        return hits_reads, backend.reads - reads
+
+    hits_reads, after_interval = asyncio.run(scenario())
+    # Попадания в L1 не ходят в backend
+    assert hits_reads == 0
+    assert after_interval == 1
+
+def test_lru_entries_are_evicted_over_budget(clock):
+    async def scenario():
+        cache = QueryCache(max_bytes=30, sizeof=lambda value: 10)
+        for key in ('a', 'b', 'c'):
+            await cache.set(key, key)
+        await cache.get_or_load('a', Loader())
+        await cache.set('d', 'd')
+        return [await cache.peek(key) for key in ('a', 'b', 'c', 'd')], cache.evictions
+
+    values, evictions = asyncio.run(scenario())
+    assert values == ['a', None, 'c', 'd']
+    assert evictions == 1
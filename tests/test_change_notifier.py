@@ -0,0 +1,108 @@
+"""Change detection and batched assignee notifications"""
+
+import asyncio
+from typing import List, Tuple
+
+import pytest
+
+from src.config import AssigneeMap
+from src.models.task import Task
+from src.services import change_notifier
+from src.services.change_notifier import ChangeNotifier, TaskChange, diff_tasks
+
+def task(task_id: str, status: str = 'Todo', assignee: str = 'alice', title: str = '') -> Task:
+    return Task(id=task_id, title=title or f"Task {task_id}", status=status, assignee=assignee)
+
+class FakeAdmission:
+    def __init__(self, allow: bool):
+        self.allow = allow
+        self.shed_kinds: List[str] = []
+
+    def allow_notifications(self) -> bool:
+        return self.allow
+
+    def shed(self, kind: str):
+        self.shed_kinds.append(kind)
+
+@pytest.fixture
+def assignees(tmp_path):
+    assignees = AssigneeMap(str(tmp_path / 'assignees.json'))
+    assignees.link('alice', 100)
+    assignees.link('bob', 200)
+    return assignees
+
+def make_notifier(assignees, admission=None) -> Tuple[ChangeNotifier, List[Tuple[int, str]]]:
+    sent: List[Tuple[int, str]] = []
+
+    async def send(chat_id: int, text: str):
+        sent.append((chat_id, text))
+
+    return ChangeNotifier(assignees, send, admission=admission), sent
+
+def test_diff_reports_assignments_and_status_changes_only():
+    previous = {'1': task('1'), '2': task('2'), '3': task('3', assignee='bob')}
+    current = [
+        task('1'),  # без изменений
+        task('2', status='Done'),  # смена статуса
+        task('3'),  # переназначение
+        task('4'),  # новая задача
+        task('5', assignee=None),  # без исполнителя
+        Task(id='1', title='Renamed', status='Todo', assignee='alice')  # правка названия
+    ]
+    changes = diff_tasks(previous, current)
+    assert [(change.task.id, change.previous) for change in changes] == [
+        ('2', previous['2']), ('3', previous['3']), ('4', None)
+    ]
+
+def test_change_descriptions():
+    assert TaskChange(task('1', 'Done'), task('1')).describe() == "• Task 1: Todo → Done"
+    assert TaskChange(task('1'), None).describe() == "• Task 1 [Todo] — назначена вам"
+    long_title = TaskChange(task('1', title='x' * 500), None).describe()
+    assert len(long_title) < 150
+
+def test_one_message_per_assignee(assignees):
+    notifier, sent = make_notifier(assignees)
+    changes = [
+        TaskChange(task('1', 'Done'), task('1')),
+        TaskChange(task('2'), None),
+        TaskChange(task('3', assignee='bob'), None),
+        TaskChange(task('4', assignee='carol'), None)  # не привязан к Telegram
+    ]
+    asyncio.run(notifier.notify(changes))
+    messages = dict(sent)
+    assert sorted(messages) == [100, 200]
+    assert messages[100].splitlines()[1:] == ["• Task 1: Todo → Done", "• Task 2 [Todo] — назначена вам"]
+    assert notifier.sent == 2
+
+def test_long_batches_are_folded(assignees, monkeypatch):
+    monkeypatch.setattr(change_notifier, 'MAX_CHANGES_PER_MESSAGE', 2)
+    notifier, sent = make_notifier(assignees)
+    asyncio.run(notifier.notify([TaskChange(task(str(index)), None) for index in range(5)]))
+    assert sent[0][1].splitlines()[-1] == "…и ещё 3"
+
+def test_changes_are_postponed_under_load_and_merged(assignees):
+    admission = FakeAdmission(allow=False)
+    notifier, sent = make_notifier(assignees, admission)
+    original = task('1')
+    asyncio.run(notifier.notify([TaskChange(task('1', 'In progress'), original)]))
+    assert sent == []
+    assert admission.shed_kinds == ['notification']
+
+    admission.allow = True
+    asyncio.run(notifier.notify([TaskChange(task('1', 'Done'), task('1', 'In progress'))]))
+    # Одно сообщение: от состояния до отсрочки к последнему
+    assert sent == [(100, "🔔 Изменения в ваших задачах:\n• Task 1: Todo → Done")]
+    assert notifier.deferred == {}
+
+def test_failed_send_does_not_stop_other_chats(assignees):
+    sent: List[int] = []
+
+    async def send(chat_id: int, text: str):
+        if chat_id == 100:
+            raise ConnectionError("blocked by user")
+        sent.append(chat_id)
+
+    notifier = ChangeNotifier(assignees, send)
+    asyncio.run(notifier.notify([TaskChange(task('1'), None), TaskChange(task('2', assignee='bob'), None)]))
+    assert sent == [200]
+    assert notifier.sent == 1
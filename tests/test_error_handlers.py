@@ -0,0 +1,119 @@
+"""Retry-After parsing, backoff and retries of Notion calls, AIMD concurrency"""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from typing import List
+
+import httpx
+import pytest
+from notion_client.errors import APIErrorCode, APIResponseError
+
+from src.utils import error_handlers
+from src.utils.adaptive_concurrency import AdaptiveConcurrencyLimiter
+from src.utils.error_handlers import backoff_delay, get_retry_after, handle_notion_error
+
+def api_error(status: int, code: APIErrorCode, headers=None) -> APIResponseError:
+    response = httpx.Response(status, headers=headers, request=httpx.Request('POST', 'https://api.notion.com/v1/pages'))
+    return APIResponseError(response, 'error', code)
+
+@pytest.fixture
+def sleeps(monkeypatch) -> List[float]:
+    """Record retry delays instead of sleeping, without jitter"""
+    delays: List[float] = []
+
+    async def sleep(delay):
+        delays.append(delay)
+
+    monkeypatch.setattr(error_handlers.asyncio, 'sleep', sleep)
+    monkeypatch.setattr(error_handlers.random, 'uniform', lambda low, high: high)
+    return delays
+
+def test_retry_after_in_seconds_and_as_http_date():
+    assert get_retry_after(api_error(429, APIErrorCode.RateLimited, {'Retry-After': '2.5'})) == 2.5
+    retry_at = datetime.now(timezone.utc) + timedelta(seconds=30)
+    delay = get_retry_after(api_error(429, APIErrorCode.RateLimited, {'Retry-After': format_datetime(retry_at, usegmt=True)}))
+    assert 28 <= delay <= 30
+
+def test_missing_or_invalid_retry_after():
+    assert get_retry_after(api_error(429, APIErrorCode.RateLimited)) is None
+    assert get_retry_after(api_error(429, APIErrorCode.RateLimited, {'Retry-After': 'soon'})) is None
+    assert get_retry_after(api_error(429, APIErrorCode.RateLimited, {'Retry-After': '-5'})) == 0.0
+    assert get_retry_after(ValueError()) is None
+
+def test_backoff_grows_exponentially_up_to_the_cap(monkeypatch):
+    monkeypatch.setattr(error_handlers.random, 'uniform', lambda low, high: high)
+    assert [backoff_delay(attempt) for attempt in range(4)] == [0.5, 1.0, 2.0, 4.0]
+    assert backoff_delay(20) == error_handlers.BACKOFF_CAP
+
+def failing(errors: List[Exception], **options):
+    """Notion call raising the given errors, then returning 'ok'"""
+    calls = []
+
+    @handle_notion_error(**options)
+    async def call():
+        calls.append(1)
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return 'ok'
+
+    return call, calls
+
+def test_rate_limited_call_waits_for_retry_after(sleeps):
+    call, calls = failing([api_error(429, APIErrorCode.RateLimited, {'Retry-After': '3'})], idempotent=False)
+    assert asyncio.run(call()) == 'ok'
+    assert len(calls) == 2
+    # Retry-After плюс джиттер, даже для неидемпотентного вызова
+    assert sleeps == [3 + error_handlers.BACKOFF_BASE]
+
+def test_server_errors_are_retried_only_when_idempotent(sleeps):
+    error = api_error(502, APIErrorCode.InternalServerError)
+    call, calls = failing([error, error])
+    assert asyncio.run(call()) == 'ok'
+    assert sleeps == [0.5, 1.0]
+
+    call, calls = failing([error], idempotent=False)
+    with pytest.raises(APIResponseError):
+        asyncio.run(call())
+    assert len(calls) == 1
+
+def test_retries_are_bounded(sleeps):
+    call, calls = failing([api_error(429, APIErrorCode.RateLimited)] * 5, retries=2)
+    with pytest.raises(APIResponseError):
+        asyncio.run(call())
+    assert len(calls) == 3
+
+def test_unauthorized_is_not_retried(sleeps):
+    call, calls = failing([api_error(401, APIErrorCode.Unauthorized)])
+    with pytest.raises(APIResponseError):
+        asyncio.run(call())
+    assert len(calls) == 1
+    assert sleeps == []
+
+def test_concurrency_limit_decreases_multiplicatively_and_grows_additively():
+    limiter = AdaptiveConcurrencyLimiter(initial=8, min_limit=1, max_limit=10)
+    limiter.on_overload()
+    assert limiter.limit == 4
+    for _ in range(4):
+        limiter.on_success()
+    # Около +1 за окно из limit успешных вызовов
+    assert 4.9 < limiter.limit < 5
+    for _ in range(10):
+        limiter.on_overload()
+    assert limiter.limit == 1
+
+def test_calls_over_the_limit_wait_for_a_slot():
+    async def scenario():
+        limiter = AdaptiveConcurrencyLimiter(initial=2)
+        await limiter.acquire()
+        await limiter.acquire()
+        waiting = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        blocked = not waiting.done()
+        limiter.release()
+        await waiting
+        return blocked, limiter.in_flight
+
+    blocked, in_flight = asyncio.run(scenario())
+    assert blocked
+    assert in_flight == 2
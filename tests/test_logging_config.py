@@ -0,0 +1,99 @@
+"""Queue-backed JSON logging: record format, context fields, sampling and dropping"""
+
+import json
+import logging
+import queue
+import sys
+
+import pytest
+
+from src.utils import logging_config
+from src.utils.logging_config import (
+    ContextFilter, DebugSampler, JsonFormatter, _NonBlockingQueueHandler,
+    bind_log_context, log_context, setup_logging, shutdown_logging
+)
+
+def make_record(level: int = logging.INFO, name: str = 'test', msg: str = 'hello %s', args=('world',)):
+    return logging.LogRecord(name, level, __file__, 1, msg, args, None)
+
+def test_record_is_formatted_as_one_json_line():
+    record = make_record()
+    record.user_id = 42
+    record.exc_text = 'Traceback...\nValueError'
+    line = JsonFormatter().format(record)
+    assert '\n' not in line
+    data = json.loads(line)
+    assert data['level'] == 'INFO'
+    assert data['logger'] == 'test'
+    assert data['msg'] == 'hello world'
+    assert data['user_id'] == 42
+    assert data['exc'] == 'Traceback...\nValueError'
+    assert 'chat_id' not in data
+
+def test_bound_context_is_copied_onto_records():
+    token = bind_log_context(update_id=7, chat_id=-100)
+    try:
+        record = make_record()
+        assert ContextFilter().filter(record)
+    finally:
+        log_context.reset(token)
+    assert (record.update_id, record.chat_id) == (7, -100)
+    assert not hasattr(make_record(), 'update_id')
+
+def test_debug_records_are_sampled_per_logger():
+    sampler = DebugSampler(rate=3)
+    kept = [sampler.filter(make_record(logging.DEBUG, name='a')) for _ in range(6)]
+    assert kept == [True, False, False, True, False, False]
+    # Свой счётчик у каждого логгера, остальные уровни не сэмплируются
+    assert sampler.filter(make_record(logging.DEBUG, name='b'))
+    assert all(sampler.filter(make_record(logging.WARNING, name='a')) for _ in range(5))
+
+def test_full_queue_drops_records_instead_of_blocking():
+    handler = _NonBlockingQueueHandler(queue.Queue(2))
+    for _ in range(5):
+        handler.handle(make_record())
+    assert handler.queue.qsize() == 2
+    assert handler.dropped == 3
+
+def test_records_are_prepared_for_the_writer_thread():
+    handler = _NonBlockingQueueHandler(queue.Queue())
+    try:
+        raise ValueError('boom')
+    except ValueError:
+        record = logging.LogRecord('test', logging.ERROR, __file__, 1, 'failed %d', (3,), sys.exc_info())
+    prepared = handler.prepare(record)
+    assert (prepared.msg, prepared.args, prepared.exc_info) == ('failed 3', None, None)
+    assert 'ValueError: boom' in prepared.exc_text
+    # Исходная запись не меняется
+    assert record.args == (3,)
+
+@pytest.fixture
+def pipeline():
+    """Replace the pipeline set up on import and restore the root logger afterwards"""
+    root = logging.getLogger()
+    level, handlers = root.level, root.handlers[:]
+    shutdown_logging()
+    yield
+    shutdown_logging()
+    root.setLevel(level)
+    for handler in handlers:
+        if handler not in root.handlers:
+            root.addHandler(handler)
+
+def test_pipeline_writes_json_lines_to_prefixed_files(tmp_path, pipeline):
+    setup_logging(str(tmp_path), level='INFO', file_prefix='worker-1.')
+    logging.getLogger('src.example').info('task %s created', 'abc')
+    logging.getLogger('slow_requests').warning('slow request')
+    shutdown_logging()
+
+    bot_log = [json.loads(line) for line in (tmp_path / 'worker-1.bot.log').read_text().splitlines()]
+    slow_log = [json.loads(line) for line in (tmp_path / 'worker-1.slow.log').read_text().splitlines()]
+    assert [entry['msg'] for entry in bot_log] == ['task abc created', 'slow request']
+    assert [entry['msg'] for entry in slow_log] == ['slow request']
+    assert logging_config.dropped_records() == 0
+
+def test_repeated_setup_keeps_one_pipeline(tmp_path, pipeline):
+    setup_logging(str(tmp_path))
+    setup_logging(str(tmp_path))
+    queue_handlers = [h for h in logging.getLogger().handlers if isinstance(h, _NonBlockingQueueHandler)]
+    assert len(queue_handlers) == 1
@@ -0,0 +1,58 @@
+"""MemberDirectory: paged assignee keyboard and prefix search"""
+
+import asyncio
+from typing import Dict, List
+
+from src.services import member_directory
+from src.services.member_directory import ASSIGN_PREFIX, MemberDirectory
+
+class FakeNotion:
+    def __init__(self, names: List[str]):
+        self.users = [{'id': f'id-{index}', 'name': name, 'type': 'person'} for index, name in enumerate(names)]
+        self.users.append({'id': 'bot', 'name': 'Integration', 'type': 'bot'})
+        self.calls = 0
+
+    async def get_workspace_members(self) -> List[Dict]:
+        self.calls += 1
+        return self.users
+
+def callbacks(keyboard) -> List[str]:
+    return [button.callback_data for row in keyboard.inline_keyboard for button in row]
+
+def test_every_member_is_reachable_through_pages(monkeypatch):
+    monkeypatch.setattr(member_directory, 'MEMBERS_PER_PAGE', 3)
+
+    async def scenario():
+        directory = MemberDirectory(FakeNotion([f'User {index:02}' for index in range(7)]))
+        return [callbacks(await directory.keyboard(page)) for page in range(3)], callbacks(await directory.keyboard(9))
+
+    pages, out_of_range = asyncio.run(scenario())
+    assigned = [data for page in pages for data in page if data.startswith(ASSIGN_PREFIX)]
+    assert len(assigned) == len(set(assigned)) == 7
+    assert pages[0][-2:] == ['assignees:1', 'skip_assignee']
+    assert pages[1][-3:] == ['assignees:0', 'assignees:2', 'skip_assignee']
+    assert pages[2][-2:] == ['assignees:1', 'skip_assignee']
+    assert out_of_range == pages[0]
+
+def test_search_matches_any_name_word_by_prefix():
+    async def scenario():
+        notion = FakeNotion(['Anna Petrova', 'Boris Annenkov', 'Pavel Ivanov', 'anton'])
+        directory = MemberDirectory(notion)
+        found = [member.name for member in await directory.search('  ANN ')]
+        return found, [member.name for member in await directory.search('iv')], await directory.search(' '), notion.calls
+
+    found, single, empty, calls = asyncio.run(scenario())
+    # Результаты в порядке имён, участник с двумя совпавшими словами — один раз
+    assert found == ['Anna Petrova', 'Boris Annenkov']
+    assert single == ['Pavel Ivanov']
+    assert empty == []
+    assert calls == 1
+
+def test_bots_are_not_offered():
+    async def scenario():
+        directory = MemberDirectory(FakeNotion(['Anna']))
+        return callbacks(await directory.keyboard()), directory.get('bot')
+
+    buttons, bot = asyncio.run(scenario())
+    assert buttons == [f'{ASSIGN_PREFIX}id-0', 'skip_assignee']
+    assert bot is None
@@ -0,0 +1,88 @@
+"""Outbox: merging of repeated edits of one message"""
+
+import asyncio
+from typing import Any, Dict, List
+
+from src.services.outbox import Outbox
+
+class FakeBotApi:
+    """Records calls; the first call can be held to build a backlog"""
+
+    def __init__(self):
+        self.calls: List[Dict[str, Any]] = []
+        self.release = asyncio.Event()
+
+    async def send(self, **kwargs):
+        self.calls.append(kwargs)
+        if len(self.calls) == 1:
+            await self.release.wait()
+        return {'ok': len(self.calls)}
+
+def request(outbox: Outbox, api: FakeBotApi, endpoint: str, **data):
+    return asyncio.create_task(outbox.process_request(api.send, (), data, endpoint, data, None))
+
+async def backlog(outbox: Outbox, api: FakeBotApi):
+    """Occupy chat 1 so later requests wait in the queue"""
+    first = request(outbox, api, 'sendMessage', chat_id=1, text='first')
+    await asyncio.sleep(0)
+    return first
+
+def test_pending_edits_of_a_message_are_merged():
+    async def scenario():
+        outbox, api = Outbox(chat_rate=100), FakeBotApi()
+        first = await backlog(outbox, api)
+        edits = [
+            request(outbox, api, 'editMessageText', chat_id=1, message_id=7, text=text)
+            for text in ('a', 'b', 'c')
+        ]
+        await asyncio.sleep(0)
+        api.release.set()
+        await first
+        return [await edit for edit in edits], api.calls, outbox.merged
+
+    results, calls, merged = asyncio.run(scenario())
+    # Один запрос с последним текстом, все вызовы получают его результат
+    assert [call['text'] for call in calls] == ['first', 'c']
+    assert results == [{'ok': 2}] * 3
+    assert merged == 2
+
+def test_edits_of_different_messages_are_not_merged():
+    async def scenario():
+        outbox, api = Outbox(chat_rate=100), FakeBotApi()
+        first = await backlog(outbox, api)
+        edits = [
+            request(outbox, api, 'editMessageText', chat_id=1, message_id=message_id, text=str(message_id))
+            for message_id in (7, 8)
+        ]
+        await asyncio.sleep(0)
+        api.release.set()
+        await asyncio.gather(first, *edits)
+        return api.calls, outbox.merged
+
+    calls, merged = asyncio.run(scenario())
+    assert [call.get('message_id') for call in calls] == [None, 7, 8]
+    assert merged == 0
+
+def test_edit_after_send_goes_as_a_new_request():
+    async def scenario():
+        outbox, api = Outbox(chat_rate=100), FakeBotApi()
+        api.release.set()
+        await request(outbox, api, 'editMessageText', chat_id=1, message_id=7, text='a')
+        await request(outbox, api, 'editMessageText', chat_id=1, message_id=7, text='b')
+        return api.calls, outbox.merged
+
+    calls, merged = asyncio.run(scenario())
+    assert [call['text'] for call in calls] == ['a', 'b']
+    assert merged == 0
+
+def test_messages_are_not_merged():
+    async def scenario():
+        outbox, api = Outbox(chat_rate=100), FakeBotApi()
+        first = await backlog(outbox, api)
+        sends = [request(outbox, api, 'sendMessage', chat_id=1, text=text) for text in ('a', 'a')]
+        await asyncio.sleep(0)
+        api.release.set()
+        await asyncio.gather(first, *sends)
+        return api.calls
+
+    assert [call['text'] for call in asyncio.run(scenario())] == ['first', 'a', 'a']
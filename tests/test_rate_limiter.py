@@ -0,0 +1,218 @@
+"""GCRA rate limiter: allow/deny, burst, idle key eviction and shared state"""
+
+import asyncio
+
+import pytest
+
+from src.services import state_backend
+from src.services.state_backend import MemoryStateBackend
+from src.utils import rate_limiter
+from src.utils.rate_limiter import HierarchicalRateLimiter, RateLimiter
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def time(self) -> float:
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiter, 'time', clock)
+    monkeypatch.setattr(state_backend, 'time', clock)
+    return clock
+
+def test_allows_up_to_the_limit_then_denies(clock):
+    limiter = RateLimiter(max_requests=3, time_window=1)
+    assert [limiter.can_make_request('user') for _ in range(4)] == [True, True, True, False]
+
+def test_denied_request_is_not_counted(clock):
+    limiter = RateLimiter(max_requests=2, time_window=1)
+    limiter.can_make_request('user')
+    limiter.can_make_request('user')
+    for _ in range(5):
+        assert not limiter.can_make_request('user')
+    # Одна ячейка восстанавливается за interval, несмотря на отказы
+    clock.now += limiter.interval
+    assert limiter.can_make_request('user')
+
+def test_refills_one_request_per_interval(clock):
+    limiter = RateLimiter(max_requests=4, time_window=2)
+    for _ in range(4):
+        assert limiter.can_make_request('user')
+    clock.now += 0.4
+    assert not limiter.can_make_request('user')
+    clock.now += 0.1
+    assert limiter.can_make_request('user')
+    assert not limiter.can_make_request('user')
+
+def test_keys_are_independent(clock):
+    limiter = RateLimiter(max_requests=1, time_window=1)
+    assert limiter.can_make_request('a')
+    assert not limiter.can_make_request('a')
+    assert limiter.can_make_request('b')
+
+def test_burst_smaller_than_rate_spaces_requests(clock):
+    limiter = RateLimiter(max_requests=20, time_window=60, burst=1)
+    assert limiter.can_make_request('group')
+    assert not limiter.can_make_request('group')
+    assert limiter.delay('group') == pytest.approx(3.0)
+    clock.now += 3.0
+    assert limiter.can_make_request('group')
+
+def test_delay_and_commit(clock):
+    limiter = RateLimiter(max_requests=2, time_window=1)
+    assert limiter.delay() == 0
+    limiter.commit()
+    limiter.commit()
+    assert limiter.delay() == pytest.approx(0.5)
+
+def test_block_denies_for_the_given_time(clock):
+    limiter = RateLimiter(max_requests=5, time_window=1)
+    limiter.block('chat', 10)
+    assert not limiter.can_make_request('chat')
+    clock.now += 9.9
+    assert not limiter.can_make_request('chat')
+    clock.now += 0.1
+    assert limiter.can_make_request('chat')
+
+def test_evicts_only_fully_refilled_keys(clock):
+    limiter = RateLimiter(max_requests=2, time_window=1)
+    limiter.can_make_request('old')
+    clock.now += 0.4
+    limiter.can_make_request('recent')
+    clock.now += 0.2
+    assert limiter.evict_idle() == 1
+    assert len(limiter) == 1
+    clock.now += 1
+    assert limiter.evict_idle() == 1
+    assert len(limiter) == 0
+
+def test_eviction_is_bounded_per_call(clock):
+    limiter = RateLimiter(max_requests=1, time_window=1)
+    for key in range(10):
+        limiter.commit(key)
+    clock.now += 2
+    assert limiter.evict_idle(limit=3) == 3
+    assert len(limiter) == 7
+
+def test_evicted_key_starts_with_full_burst(clock):
+    limiter = RateLimiter(max_requests=3, time_window=1)
+    for _ in range(3):
+        limiter.can_make_request('user')
+    clock.now += 1.01
+    limiter.evict_idle()
+    assert len(limiter) == 0
+    assert [limiter.can_make_request('user') for _ in range(4)] == [True, True, True, False]
+
+def test_blocked_key_does_not_hold_up_eviction(clock):
+    limiter = RateLimiter(max_requests=1, time_window=1)
+    limiter.block('flooded', 600)
+    for key in range(5):
+        limiter.commit(key)
+    # Заблокированный ключ первый в порядке обновления, за ним простаивающие
+    limiter._tat.move_to_end('flooded', last=False)
+    clock.now += 2
+    assert limiter.evict_idle(limit=10) == 5
+    assert len(limiter) == 1
+    assert not limiter.can_make_request('flooded')
+
+def hierarchy():
+    return HierarchicalRateLimiter({
+        'user': RateLimiter(max_requests=2, time_window=1),
+        'chat': RateLimiter(max_requests=3, time_window=1),
+        'global': RateLimiter(max_requests=4, time_window=1)
+    })
+
+def test_hierarchy_denies_when_any_level_is_exhausted(clock):
+    limiter = hierarchy()
+    assert limiter.can_make_request(user=1, chat=10)
+    assert limiter.can_make_request(user=1, chat=10)
+    # Лимит пользователя исчерпан, хотя чат и бот ещё свободны
+    assert not limiter.can_make_request(user=1, chat=10)
+    assert limiter.can_make_request(user=2, chat=10)
+    # Теперь исчерпан чат
+    assert not limiter.can_make_request(user=3, chat=10)
+    assert limiter.can_make_request(user=3, chat=20)
+    # И весь бот: global без ключа общий для всех запросов
+    assert not limiter.can_make_request(user=4, chat=30)
+
+def test_hierarchy_denial_consumes_nothing(clock):
+    limiter = hierarchy()
+    limiter.can_make_request(user=1, chat=10)
+    limiter.can_make_request(user=1, chat=10)
+    for _ in range(5):
+        assert not limiter.can_make_request(user=1, chat=10)
+    # Отказы не списали ячейки с уровней чата и бота
+    assert limiter.can_make_request(user=2, chat=10)
+    assert limiter.can_make_request(user=3, chat=20)
+
+def test_hierarchy_delay_is_the_longest_level(clock):
+    limiter = hierarchy()
+    limiter.can_make_request(user=1, chat=10)
+    limiter.can_make_request(user=1, chat=10)
+    assert limiter.delay(user=1, chat=10) == pytest.approx(0.5)
+    assert limiter.delay(user=2, chat=10) == 0
+    clock.now += 0.5
+    assert limiter.can_make_request(user=1, chat=10)
+
+def test_hierarchy_evicts_idle_keys_on_every_level(clock):
+    limiter = hierarchy()
+    limiter.can_make_request(user=1, chat=10)
+    clock.now += 2
+    assert limiter.evict_idle() == 3
+
+def workers(backend, count=2, **kwargs):
+    """Limiters of several worker processes sharing one backend"""
+    return [RateLimiter(backend=backend, namespace='test', **kwargs) for _ in range(count)]
+
+def test_bucket_is_shared_through_the_backend(clock):
+    async def scenario():
+        first, second = workers(MemoryStateBackend(), max_requests=3, time_window=1)
+        # Запросы одного пользователя приходят в разные воркеры
+        allowed = [await limiter.allow('user') for limiter in (first, second, first, second)]
+        clock.now += first.interval
+        return allowed, await second.allow('user')
+
+    allowed, refilled = asyncio.run(scenario())
+    assert allowed == [True, True, True, False]
+    assert refilled
+
+def test_allow_without_backend_is_local(clock):
+    async def scenario():
+        first, second = workers(None, max_requests=1, time_window=1)
+        return [await first.allow('user'), await first.allow('user'), await second.allow('user')]
+
+    assert asyncio.run(scenario()) == [True, False, True]
+
+def test_retry_after_block_reaches_other_workers(clock):
+    async def scenario():
+        first, second = workers(MemoryStateBackend(), max_requests=5, time_window=1)
+        await first.block_shared('chat', 10)
+        await second.sync_blocks()
+        blocked = [first.can_make_request('chat'), second.can_make_request('chat'), second.can_make_request('other')]
+        clock.now += 10
+        return blocked, second.can_make_request('chat')
+
+    blocked, unblocked = asyncio.run(scenario())
+    assert blocked == [False, False, True]
+    assert unblocked
+
+def test_blocks_are_read_at_most_once_per_interval(clock):
+    async def scenario():
+        first, second = workers(MemoryStateBackend(), max_requests=5, time_window=1)
+        await second.sync_blocks()
+        await first.block_shared(None, 30)
+        await second.sync_blocks()
+        before = second.can_make_request()
+        clock.now += rate_limiter.BLOCK_SYNC_INTERVAL
+        await second.sync_blocks()
+        return before, second.can_make_request()
+
+    before, after = asyncio.run(scenario())
+    assert before
+    assert not after
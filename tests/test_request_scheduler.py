@@ -0,0 +1,49 @@
+"""RequestScheduler: fair round-robin request slots"""
+
+import asyncio
+import time
+from typing import Hashable, List
+
+from src.utils.request_scheduler import RequestScheduler
+
+async def acquire_all(scheduler: RequestScheduler, keys: List[Hashable]) -> List[str]:
+    served: List[str] = []
+
+    async def request(key: Hashable, index: int):
+        await scheduler.acquire(key)
+        served.append(f"{key}{index}")
+
+    tasks = []
+    for index, key in enumerate(keys):
+        tasks.append(asyncio.create_task(request(key, index)))
+        # Запросы встают в очередь в порядке создания
+        await asyncio.sleep(0)
+    await asyncio.gather(*tasks)
+    return served
+
+def test_keys_are_served_round_robin():
+    scheduler = RequestScheduler(rate=200, burst=1)
+    served = asyncio.run(acquire_all(scheduler, ['a', 'a', 'a', 'a', 'b', 'b']))
+    # Пользователь с длинной очередью не задерживает второго дольше, чем на один слот
+    assert served == ['a0', 'a1', 'b4', 'a2', 'b5', 'a3']
+    assert scheduler.pending == 0
+
+def test_cancelled_request_does_not_use_a_slot():
+    async def scenario():
+        scheduler = RequestScheduler(rate=20, burst=1)
+        await scheduler.acquire('a')
+        cancelled = asyncio.create_task(scheduler.acquire('a'))
+        waiting = asyncio.create_task(scheduler.acquire('b'))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        started = time.monotonic()
+        await waiting
+        return time.monotonic() - started
+
+    # Слот отменённого запроса достаётся следующему через один интервал, а не два
+    assert asyncio.run(scenario()) < 0.09
+
+def test_rate_and_burst_are_split_between_workers():
+    scheduler = RequestScheduler(rate=3.0, burst=3, workers=3)
+    assert scheduler.rate == 1.0
+    assert scheduler.burst == 1
@@ -0,0 +1,134 @@
+"""State backends shared by worker processes and PTB persistence on top of them"""
+
+import asyncio
+import time
+
+import pytest
+
+from src.services import state_backend
+from src.services.state_backend import MemoryStateBackend, SQLiteStateBackend, create_state_backend
+from src.services.state_persistence import StatePersistence
+from src.utils.request_scheduler import RequestScheduler
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self) -> float:
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(state_backend, 'time', clock)
+    return clock
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def backend(request, tmp_path):
+    backend = create_state_backend(request.param, str(tmp_path / 'state.db'))
+    yield backend
+    backend.close()
+
+def test_values_are_namespaced(backend):
+    backend.set('a', 'key', {'value': 1})
+    backend.set('b', 'key', [1, 2])
+    assert backend.get('a', 'key') == {'value': 1}
+    assert backend.items('b') == {'key': [1, 2]}
+    backend.clear('a')
+    assert backend.get('a', 'key') is None
+    assert backend.get('b', 'key') == [1, 2]
+    backend.delete('b', 'key')
+    assert backend.items('b') == {}
+
+def test_values_expire_after_ttl(backend, clock):
+    backend.set('ns', 'short', 1, ttl=10)
+    backend.set('ns', 'forever', 2)
+    clock.now += 10
+    assert backend.get('ns', 'short') is None
+    assert backend.items('ns') == {'forever': 2}
+
+def test_update_computes_the_new_value_and_ttl(backend, clock):
+    assert backend.update('ns', 'counter', lambda value: (value or 0) + 1) == 1
+    assert backend.update('ns', 'counter', lambda value: value + 1, ttl=lambda value: value * 10) == 2
+    clock.now += 19
+    assert backend.get('ns', 'counter') == 2
+    clock.now += 1
+    assert backend.get('ns', 'counter') is None
+
+def test_purge_is_bounded(backend, clock):
+    for index in range(5):
+        backend.set('ns', str(index), index, ttl=1)
+    backend.set('ns', 'kept', 0)
+    clock.now += 2
+    assert backend.purge_expired(limit=3) == 3
+    assert backend.purge_expired(limit=3) == 2
+    assert backend.items('ns') == {'kept': 0}
+
+def test_sqlite_backend_is_shared_between_connections(tmp_path):
+    path = str(tmp_path / 'state.db')
+    first, second = SQLiteStateBackend(path), SQLiteStateBackend(path)
+    try:
+        first.set('ns', 'key', 'value')
+        assert second.get('ns', 'key') == 'value'
+        second.update('ns', 'key', lambda value: value + '!')
+        assert first.get('ns', 'key') == 'value!'
+    finally:
+        first.close()
+        second.close()
+
+def test_only_sqlite_backend_is_shared(tmp_path):
+    assert not MemoryStateBackend().shared
+    sqlite = create_state_backend('sqlite', str(tmp_path / 'state.db'))
+    assert sqlite.shared
+    sqlite.close()
+    with pytest.raises(ValueError):
+        create_state_backend('sqlite')
+    with pytest.raises(ValueError):
+        create_state_backend('redis')
+
+def test_user_data_changed_by_another_worker_is_picked_up():
+    async def scenario():
+        backend = MemoryStateBackend()
+        first, second = StatePersistence(backend), StatePersistence(backend)
+        await first.get_user_data()
+        await second.get_user_data()
+        await first.update_user_data(1, {'lang': 'en'})
+        user_data = {}
+        await second.refresh_user_data(1, user_data)
+        return user_data
+
+    assert asyncio.run(scenario()) == {'lang': 'en'}
+
+def test_unsaved_local_changes_are_not_overwritten():
+    async def scenario():
+        backend = MemoryStateBackend()
+        first, second = StatePersistence(backend), StatePersistence(backend)
+        await first.update_user_data(1, {'lang': 'en'})
+        # Второй воркер изменил данные и ещё не сохранил их
+        user_data = {'lang': 'ru'}
+        await second.refresh_user_data(1, user_data)
+        return user_data
+
+    assert asyncio.run(scenario()) == {'lang': 'ru'}
+
+def test_conversation_states_round_trip():
+    async def scenario():
+        persistence = StatePersistence(MemoryStateBackend())
+        await persistence.update_conversation('new_task', (1, 2), 3)
+        await persistence.update_conversation('new_task', (1, 5), 1)
+        await persistence.update_conversation('new_task', (1, 5), None)
+        return await persistence.get_conversations('new_task')
+
+    assert asyncio.run(scenario()) == {(1, 2): 3}
+
+def test_notion_pause_holds_requests_in_every_worker():
+    async def scenario():
+        backend = MemoryStateBackend()
+        first, second = RequestScheduler(rate=100, backend=backend), RequestScheduler(rate=100, backend=backend)
+        # Retry-After получил первый воркер, второй ждёт так же
+        await first.pause(0.2)
+        started = time.monotonic()
+        await second.acquire('user')
+        return time.monotonic() - started
+
+    assert asyncio.run(scenario()) >= 0.15
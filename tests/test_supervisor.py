@@ -0,0 +1,36 @@
+"""Sharding of updates between worker processes"""
+
+from collections import Counter
+
+from src.services.supervisor import jump_hash
+
+KEYS = [*range(-2000, 2000), 2**40, -1001234567890, 987654321012]
+
+def test_known_buckets_do_not_change():
+    # Смена алгоритма перекинет чаты на другие воркеры посреди диалога
+    keys = (0, 1, 2, 12345, -1001234567890, 2**40)
+    assert [jump_hash(key, 10) for key in keys] == [0, 6, 6, 1, 1, 9]
+    assert [jump_hash(key, 3) for key in keys] == [0, 0, 0, 1, 1, 1]
+
+def test_bucket_is_in_range_and_deterministic():
+    for buckets in (1, 2, 7, 64):
+        for key in KEYS:
+            bucket = jump_hash(key, buckets)
+            assert 0 <= bucket < buckets
+            assert jump_hash(key, buckets) == bucket
+
+def test_adding_a_worker_only_moves_keys_to_it():
+    for buckets in range(1, 12):
+        moved = 0
+        for key in KEYS:
+            before, after = jump_hash(key, buckets), jump_hash(key, buckets + 1)
+            if before != after:
+                assert after == buckets
+                moved += 1
+        # Переезжает примерно 1/(n+1) чатов
+        assert abs(moved / len(KEYS) - 1 / (buckets + 1)) < 0.05
+
+def test_keys_are_spread_evenly():
+    counts = Counter(jump_hash(key, 4) for key in range(100000, 110000))
+    assert set(counts) == {0, 1, 2, 3}
+    assert all(abs(count - 2500) < 250 for count in counts.values())
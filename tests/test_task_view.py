@@ -0,0 +1,73 @@
+"""TaskListView: pagination, memoized rendering and message-size-aware chunking"""
+
+from src.handlers import task_view
+from src.handlers.task_view import MAX_MESSAGE_LENGTH, TaskListView, split_message
+from src.models.task import Task
+
+def test_long_page_is_split_without_cutting_titles():
+    tasks = [Task(id=str(index), title=f"{index} " + "x" * 1000, status='Done') for index in range(20)]
+    chunks, markup, _ = TaskListView().render(tasks, 0, has_next=False)
+    assert len(chunks) > 1
+    assert all(len(chunk) <= MAX_MESSAGE_LENGTH for chunk in chunks)
+    # Все строки целиком и по порядку
+    assert "\n".join(chunks).split("\n") == [TaskListView.format_task(task) for task in tasks]
+
+def test_short_page_is_one_message():
+    chunks, _, _ = TaskListView().render([Task(id='1', title='Short')], 0, has_next=False)
+    assert chunks == ['• Short']
+
+def test_line_longer_than_a_message_is_cut_into_pieces():
+    chunks = split_message(['a', 'b' * 10, 'c'], limit=4)
+    assert chunks == ['a', 'bbbb', 'bbbb', 'bb\nc']
+    assert split_message([], limit=4) == ['']
+
+def buttons(markup):
+    return [(button.text, button.callback_data) for row in markup.inline_keyboard for button in row]
+
+def tasks(count: int, status: str = 'Todo'):
+    return [Task(id=str(index), title=f"Task {index}", status=status) for index in range(count)]
+
+def test_keyboard_links_to_neighbour_pages():
+    view = TaskListView()
+    _, first, _ = view.render(tasks(3), 0, has_next=True)
+    _, middle, _ = view.render(tasks(3), 1, has_next=True)
+    _, last, _ = view.render(tasks(3), 2, has_next=False)
+    assert buttons(first) == [("Стр. 1", "tasks:0"), ("▶️", "tasks:1")]
+    assert buttons(middle) == [("◀️", "tasks:0"), ("Стр. 2", "tasks:1"), ("▶️", "tasks:2")]
+    assert buttons(last) == [("◀️", "tasks:1"), ("Стр. 3", "tasks:2")]
+
+def test_callback_data_is_parsed_back_to_a_page():
+    assert TaskListView.parse_callback("tasks:4") == 4
+    assert TaskListView.parse_callback("tasks:-1") == 0
+    assert TaskListView.parse_callback("tasks:x") is None
+    assert TaskListView.parse_callback("show_tasks") is None
+
+def test_same_content_is_rendered_once():
+    view = TaskListView()
+    first = view.render(tasks(3), 0, has_next=False)
+    assert view.render(tasks(3), 0, has_next=False)[0] is first[0]
+    # Изменение статуса меняет хэш страницы
+    changed = view.render(tasks(3, status='Done'), 0, has_next=False)
+    assert changed[2] != first[2]
+
+def test_render_cache_is_bounded(monkeypatch):
+    monkeypatch.setattr(task_view, 'RENDER_CACHE_SIZE', 2)
+    view = TaskListView()
+    for page in range(5):
+        view.render(tasks(1), page, has_next=True)
+    assert len(view._rendered) == 2
+
+def test_unchanged_message_is_not_edited_again(monkeypatch):
+    monkeypatch.setattr(task_view, 'SHOWN_CACHE_SIZE', 2)
+    view = TaskListView()
+    _, _, digest = view.render(tasks(2), 0, has_next=False)
+    _, _, other = view.render(tasks(2), 1, has_next=False)
+    assert not view.is_shown((1, 10), digest)
+    view.mark_shown((1, 10), digest)
+    assert view.is_shown((1, 10), digest)
+    assert not view.is_shown((1, 10), other)
+    assert not view.is_shown((1, 11), digest)
+    # Старые сообщения забываются: их правка просто не будет пропущена
+    view.mark_shown((1, 11), digest)
+    view.mark_shown((1, 12), digest)
+    assert not view.is_shown((1, 10), digest)
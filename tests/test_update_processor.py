@@ -0,0 +1,101 @@
+"""Per-chat ordering of ChatOrderedUpdateProcessor"""
+
+import asyncio
+import random
+from typing import List, Tuple
+
+from telegram import Update
+
+from src.handlers.update_processor import ChatOrderedUpdateProcessor
+
+def make_update(update_id: int, chat_id: int) -> Update:
+    return Update.de_json({
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id,
+            'date': 0,
+            'chat': {'id': chat_id, 'type': 'private'},
+            'from': {'id': chat_id, 'is_bot': False, 'first_name': 'User'},
+            'text': str(update_id)
+        }
+    }, None)
+
+async def handle(log: List[Tuple[str, int, int]], chat_id: int, update_id: int, delay: float):
+    log.append(('start', chat_id, update_id))
+    await asyncio.sleep(delay)
+    log.append(('end', chat_id, update_id))
+
+def test_updates_of_one_chat_run_in_order():
+    async def scenario():
+        processor = ChatOrderedUpdateProcessor(max_workers=4)
+        log: List[Tuple[str, int, int]] = []
+        # Первое обновление самое долгое: без упорядочивания оно завершилось бы последним
+        delays = [0.05, 0.01, 0.0, 0.02]
+        await asyncio.gather(*(
+            processor.do_process_update(make_update(update_id, 1), handle(log, 1, update_id, delay))
+            for update_id, delay in enumerate(delays)
+        ))
+        return log
+
+    log = asyncio.run(scenario())
+    expected = []
+    for update_id in range(4):
+        expected += [('start', 1, update_id), ('end', 1, update_id)]
+    assert log == expected
+
+def test_chats_are_processed_concurrently():
+    async def scenario():
+        processor = ChatOrderedUpdateProcessor(max_workers=4)
+        log: List[Tuple[str, int, int]] = []
+        await asyncio.gather(
+            processor.do_process_update(make_update(1, 1), handle(log, 1, 1, 0.05)),
+            processor.do_process_update(make_update(2, 2), handle(log, 2, 2, 0.0))
+        )
+        return log
+
+    log = asyncio.run(scenario())
+    # Второй чат не ждёт долгого обновления первого
+    assert log.index(('end', 2, 2)) < log.index(('end', 1, 1))
+
+def test_order_per_chat_is_kept_under_interleaving():
+    async def scenario():
+        processor = ChatOrderedUpdateProcessor(max_workers=3)
+        log: List[Tuple[str, int, int]] = []
+        rng = random.Random(7)
+        updates = [(update_id, rng.choice((1, 2, 3))) for update_id in range(30)]
+        await asyncio.gather(*(
+            processor.do_process_update(
+                make_update(update_id, chat_id),
+                handle(log, chat_id, update_id, rng.random() / 100)
+            )
+            for update_id, chat_id in updates
+        ))
+        return updates, log, processor
+
+    updates, log, processor = asyncio.run(scenario())
+    for chat_id in (1, 2, 3):
+        sent = [update_id for update_id, chat in updates if chat == chat_id]
+        finished = [update_id for event, chat, update_id in log if chat == chat_id and event == 'end']
+        assert finished == sent
+    # Записи чатов удаляются, когда их обновления обработаны
+    assert processor.active_chats == 0
+
+def test_worker_limit_is_respected():
+    async def scenario():
+        processor = ChatOrderedUpdateProcessor(max_workers=2)
+        running = peak = 0
+
+        async def work():
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+        await asyncio.gather(*(
+            processor.do_process_update(make_update(chat_id, chat_id), work())
+            for chat_id in range(6)
+        ))
+        return peak
+
+    assert asyncio.run(scenario()) == 2
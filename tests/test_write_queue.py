@@ -0,0 +1,132 @@
+"""WriteQueue: deduplication, delivery, retries and recovery after a crash"""
+
+import asyncio
+from typing import List, Optional
+
+import pytest
+
+from src.models.task import Task
+from src.services import write_queue as write_queue_module
+from src.services.write_queue import MAX_ATTEMPTS, WriteQueue
+
+def page(task_id: str, title: str):
+    return {
+        'id': task_id,
+        'properties': {'Title': {'type': 'title', 'title': [{'plain_text': title}]}},
+        'last_edited_time': '2024-01-01T00:00:00.000Z'
+    }
+
+class FakeNotion:
+    def __init__(self, existing: Optional[Task] = None, failures: int = 0):
+        self.created: List[tuple] = []
+        self.searched: List[str] = []
+        self.existing = existing
+        self.failures = failures
+
+    async def create_task(self, user_id, title, status="Not Started", assignee_id=None):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("Notion unavailable")
+        self.created.append((user_id, title, status, assignee_id))
+        return page(f'page-{len(self.created)}', title)
+
+    async def find_task(self, title, since):
+        self.searched.append(title)
+        return self.existing
+
+@pytest.fixture
+def make_queue(tmp_path):
+    queues = []
+
+    def make(notion: FakeNotion) -> WriteQueue:
+        queue = WriteQueue(str(tmp_path / 'bot.db'), notion)
+        queues.append(queue)
+        return queue
+
+    yield make
+    for queue in queues:
+        queue.close()
+
+async def drain(queue: WriteQueue):
+    """Deliver everything due now, as one pass of run() would"""
+    queue._load_pending()
+    await asyncio.gather(*(queue._deliver(row) for row in queue._due_batch()))
+
+def test_repeated_submission_is_queued_once(make_queue):
+    queue = make_queue(FakeNotion())
+    first = queue.enqueue_task(1, 'Report')
+    assert queue.enqueue_task(1, 'Report') == first
+    # Другой пользователь или другое название — отдельные записи
+    assert queue.enqueue_task(2, 'Report') != first
+    assert queue.enqueue_task(1, 'Other') != first
+
+def test_delivered_write_is_recorded_and_frees_the_dedup_key(make_queue):
+    notion = FakeNotion()
+    queue = make_queue(notion)
+    local_id = queue.enqueue_task(1, 'Report', assignee_id='member-1')
+    asyncio.run(drain(queue))
+    assert notion.created == [(1, 'Report', 'Not Started', 'member-1')]
+    assert queue.get_status(local_id)['status'] == 'done'
+    assert queue.get_status(local_id)['notion_id'] == 'page-1'
+    # Та же задача после доставки — новая запись
+    assert queue.enqueue_task(1, 'Report') != local_id
+
+def test_write_attempted_before_a_crash_is_looked_up_not_recreated(make_queue):
+    existing = Task(id='page-existing', title='Report')
+    notion = FakeNotion(existing=existing)
+    queue = make_queue(notion)
+    local_id = queue.enqueue_task(1, 'Report')
+    # Попытка записана, но процесс упал, не узнав ответа Notion
+    with queue._conn:
+        queue._conn.execute("UPDATE pending_writes SET attempts = 1 WHERE id = ?", (local_id,))
+    asyncio.run(drain(queue))
+    assert notion.searched == ['Report']
+    assert notion.created == []
+    assert queue.get_status(local_id)['notion_id'] == 'page-existing'
+
+def test_failed_delivery_is_retried_later(make_queue):
+    notion = FakeNotion(failures=1)
+    queue = make_queue(notion)
+    local_id = queue.enqueue_task(1, 'Report')
+    asyncio.run(drain(queue))
+    status = queue.get_status(local_id)
+    assert status['status'] == 'pending'
+    assert status['attempts'] == 1
+    assert 'unavailable' in status['error']
+    # Повтор отложен с backoff, сейчас отправлять нечего
+    assert queue._due_batch() == []
+
+def test_write_fails_permanently_after_max_attempts(make_queue, monkeypatch):
+    monkeypatch.setattr(write_queue_module, 'backoff_delay', lambda attempt: -10.0)
+    notion = FakeNotion(failures=MAX_ATTEMPTS)
+    queue = make_queue(notion)
+    local_id = queue.enqueue_task(1, 'Report')
+
+    async def scenario():
+        for _ in range(MAX_ATTEMPTS):
+            await drain(queue)
+        return queue.pending
+
+    assert asyncio.run(scenario()) == 0
+    assert queue.get_status(local_id)['status'] == 'failed'
+    assert notion.created == []
+
+def test_pending_count_is_tracked_in_memory(make_queue):
+    notion = FakeNotion()
+    queue = make_queue(notion)
+    queue.enqueue_task(1, 'First')
+    queue._load_pending()
+    queue.enqueue_task(1, 'Second')
+    queue.enqueue_task(1, 'Second')
+    assert queue.pending == 2
+    # Запись другого воркера учитывается, когда подходит её очередь
+    other = make_queue(notion)
+    other.enqueue_task(2, 'Third')
+    rows = queue._due_batch()
+    assert queue.pending == 3
+
+    async def deliver():
+        await asyncio.gather(*(queue._deliver(row) for row in rows))
+
+    asyncio.run(deliver())
+    assert queue.pending == 0